@@ -0,0 +1,83 @@
+"""
+Measures the memory used by each Photo object, for a realistic
+/photos/list.json payload.
+"""
+from __future__ import print_function, unicode_literals
+import copy
+import gc
+import sys
+try:
+    import tracemalloc
+except ImportError: # Python2
+    tracemalloc = None
+
+import trovebox
+from trovebox.objects.photo import Photo
+
+NUM_PHOTOS = 10000
+
+def photo_dict(index):
+    """ Returns a photo dict, similar to those returned by the API """
+    photo_id = "%x" % index
+    path = "http://example.trovebox.com/photo/%s" % photo_id
+    return {"id": photo_id,
+            "appId": "example.trovebox.com",
+            "owner": "user@example.com",
+            "actor": "user@example.com",
+            "title": "Photo %d" % index,
+            "description": "A photo that was uploaded for testing",
+            "tags": ["holiday", "beach", "2013"],
+            "albums": ["1", "4"],
+            "groups": [],
+            "permission": "1",
+            "license": "CC BY-SA",
+            "hash": "4d7e3c0c5a2a7f1e5f0b7d2c8a3e7b9f1d6c4a2e",
+            "size": "2048",
+            "width": "3264",
+            "height": "2448",
+            "exifCameraMake": "Canon",
+            "exifCameraModel": "Canon EOS 5D",
+            "exifFocalLength": "50",
+            "exifISOSpeed": "100",
+            "dateTaken": "1357041600",
+            "dateUploaded": "1357128000",
+            "dateUpdated": "1357128000",
+            "filenameOriginal": "IMG_%04d.JPG" % index,
+            "pathOriginal": path + "/original.jpg",
+            "pathBase": path + "/base.jpg",
+            "url": path + "/view",
+            "totalRows": NUM_PHOTOS,
+            "totalPages": 1,
+            "currentPage": 1,
+            "currentRows": NUM_PHOTOS,
+            }
+
+def allocated(func):
+    """ Returns the number of bytes allocated (and retained) by func() """
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.take_snapshot()
+    result = func()
+    end = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    del result
+    return sum(stat.size_diff for stat in end.compare_to(start, "filename"))
+
+def main():
+    """ Run the benchmark """
+    if tracemalloc is None:
+        print("This benchmark requires Python 3.4 or newer")
+        sys.exit(1)
+
+    client = trovebox.Trovebox(host="example.trovebox.com")
+    json_dicts = [photo_dict(i) for i in range(NUM_PHOTOS)]
+
+    # Each Photo retains its JSON payload, so measure that separately
+    payload = allocated(lambda: copy.deepcopy(json_dicts))
+    objects = allocated(lambda: [Photo(client, json_dict)
+                                 for json_dict in json_dicts])
+    print("JSON payload:  %6d bytes per photo" % (payload // NUM_PHOTOS))
+    print("Photo object:  %6d bytes per photo" % (objects // NUM_PHOTOS))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Measures the per-call overhead of building endpoint URLs and
+option strings.
+"""
+from __future__ import print_function, unicode_literals
+import timeit
+
+import trovebox
+from trovebox.api import api_base
+
+NUMBER = 100000
+OPTIONS = {"album": "1a", "tags": "holiday,beach", "pageSize": 100}
+
+def per_call(func):
+    """ Returns the time taken by each call to func, in microseconds """
+    return min(timeit.repeat(func, number=NUMBER, repeat=3)) * 1e6 / NUMBER
+
+def main():
+    """ Run the benchmark """
+    client = trovebox.Trovebox(host="https://example.trovebox.com")
+    client.configure(api_version=2)
+    api = client.photos
+
+    def uncached_option_string():
+        """ Build the option string, without memoization """
+        api_base._OPTION_STRINGS.clear()
+        return api._build_option_string(OPTIONS)
+
+    def uncached_url():
+        """ Build the URL, without the cached prefix """
+        client._cached_url_prefix = None
+        return client._construct_url("/photos/list.json")
+
+    print("Option string (memoized):  %6.2f us" %
+          per_call(lambda: api._build_option_string(OPTIONS)))
+    print("Option string (uncached):  %6.2f us" %
+          per_call(uncached_option_string))
+    print("URL (cached prefix):       %6.2f us" %
+          per_call(lambda: client._construct_url("/photos/list.json")))
+    print("URL (uncached prefix):     %6.2f us" % per_call(uncached_url))
+
+if __name__ == "__main__":
+    main()
@@ -81,6 +81,51 @@ class TestActionCreate(TestActions):
         with self.assertRaises(NotImplementedError):
             self.client.action.create(target=self.test_photos[0])
 
+class TestActionCreateMany(TestActions):
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_action_create_many(self, mock_post):
+        """Check that many actions can be created concurrently"""
+        def post(endpoint, **kwds):
+            target_id = endpoint.split("/")[2]
+            return self._return_value(dict(self.test_actions_dict[0],
+                                           target={"id": target_id},
+                                           value=kwds["value"]))
+        mock_post.side_effect = post
+        records = ((photo, None, {"type": "comment", "value": photo.id})
+                   for photo in self.test_photos)
+        results = list(self.client.action.create_many(records, workers=2))
+        self.assertEqual(len(results), 2)
+        for record, action, error in results:
+            self.assertIsNone(error)
+            self.assertEqual(action.target.id, record[0].id)
+            self.assertEqual(action.value, record[0].id)
+
+    @mock.patch("time.sleep")
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_action_create_many_retry(self, mock_post, mock_sleep):
+        """Check that transient failures are retried"""
+        mock_post.side_effect = [trovebox.TroveboxError("Code 503: Busy"),
+                                 self._return_value(self.test_actions_dict[0])]
+        results = list(self.client.action.create_many(
+            [("photo1", "photo", {"type": "comment"})], workers=1))
+        self.assertEqual(results[0][1].id, "1")
+        self.assertIsNone(results[0][2])
+        self.assertEqual(mock_post.call_count, 2)
+        mock_sleep.assert_called_once_with(1.0)
+
+    @mock.patch("time.sleep")
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_action_create_many_errors(self, mock_post, mock_sleep):
+        """Check that permanent failures are reported without retrying"""
+        error = trovebox.TroveboxError("Code 400: Bad request")
+        mock_post.side_effect = error
+        results = list(self.client.action.create_many(
+            [("photo1", "photo", {"type": "comment"})], workers=1))
+        self.assertEqual(results, [(("photo1", "photo", {"type": "comment"}),
+                                    None, error)])
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertFalse(mock_sleep.called)
+
 class TestActionDelete(TestActions):
     @mock.patch.object(trovebox.Trovebox, 'post')
     def test_action_delete(self, mock_post):
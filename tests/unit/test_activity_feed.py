@@ -0,0 +1,100 @@
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import mock
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+
+def activity(activity_id, date_created, total_pages=1):
+    return {"id": activity_id, "dateCreated": str(date_created),
+            "type": "photo-upload", "data": {"id": "p" + activity_id},
+            "totalPages": total_pages}
+
+class TestActivityFeed(unittest.TestCase):
+    test_host = "test.example.com"
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host)
+        self.temp_dir = tempfile.mkdtemp()
+        self.cursor_file = os.path.join(self.temp_dir, "cursor.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def _return_value(result, message="", code=200):
+        return {"message": message, "code": code, "result": result}
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_first_poll(self, mock_get):
+        """Check that the first poll returns every activity, oldest first"""
+        mock_get.side_effect = [
+            self._return_value([activity("3", 300, 2), activity("2", 200, 2)]),
+            self._return_value([activity("1", 100, 2)])]
+        feed = self.client.activities.feed(options={"type": "photo-upload"})
+        result = feed.poll()
+        self.assertEqual([item.id for item in result], ["1", "2", "3"])
+        self.assertEqual(result[0].data.id, "p1")
+        mock_get.assert_called_with("/activities/type-photo-upload/list.json",
+                                    page=2)
+        self.assertEqual(feed.cursor, {"dateCreated": 300, "ids": ["3"]})
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_incremental_poll(self, mock_get):
+        """Check that paging stops once a seen activity is reached"""
+        feed = self.client.activities.feed()
+        feed.cursor = {"dateCreated": 200, "ids": ["2"]}
+        mock_get.return_value = self._return_value(
+            [activity("4", 300, 5), activity("3", 200, 5),
+             activity("2", 200, 5)])
+        result = feed.poll()
+        self.assertEqual([item.id for item in result], ["3", "4"])
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(feed.cursor, {"dateCreated": 300, "ids": ["4"]})
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_shifted_pages(self, mock_get):
+        """Check that activities repeated on a shifted page are returned once"""
+        feed = self.client.activities.feed()
+        feed.cursor = {"dateCreated": 100, "ids": ["1"]}
+        # A new activity pushed "4" onto the second page while paging
+        mock_get.side_effect = [
+            self._return_value([activity("5", 500, 3), activity("4", 400, 3)]),
+            self._return_value([activity("4", 400, 3), activity("3", 300, 3)]),
+            self._return_value([activity("2", 200, 3), activity("1", 100, 3)])]
+        result = feed.poll()
+        self.assertEqual([item.id for item in result], ["2", "3", "4", "5"])
+        self.assertEqual(feed.cursor, {"dateCreated": 500, "ids": ["5"]})
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_irregular_timestamps(self, mock_get):
+        """Check that empty and float timestamps don't abort the poll"""
+        mock_get.return_value = self._return_value(
+            [activity("3", "300.5"), activity("2", ""), activity("1", 100)])
+        result = self.client.activities.feed().poll()
+        self.assertEqual([item.id for item in result], ["2", "1", "3"])
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_no_new_activities(self, mock_get):
+        """Check that an empty list is returned if nothing has changed"""
+        feed = self.client.activities.feed()
+        feed.cursor = {"dateCreated": 300, "ids": ["3"]}
+        mock_get.return_value = self._return_value([activity("3", 300, 5)])
+        self.assertEqual(feed.poll(), [])
+        self.assertEqual(feed.cursor, {"dateCreated": 300, "ids": ["3"]})
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_cursor_file(self, mock_get):
+        """Check that the cursor is persisted between feeds"""
+        mock_get.return_value = self._return_value([activity("1", 100)])
+        feed = self.client.activities.feed(cursor_file=self.cursor_file)
+        self.assertEqual(len(feed.poll()), 1)
+
+        feed = self.client.activities.feed(cursor_file=self.cursor_file)
+        self.assertEqual(feed.cursor, {"dateCreated": 100, "ids": ["1"]})
+        self.assertEqual(feed.poll(), [])
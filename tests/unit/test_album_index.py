@@ -0,0 +1,109 @@
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import mock
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox.album_index import AlbumIndex
+
+class TestAlbumIndex(unittest.TestCase):
+    test_host = "test.example.com"
+    test_oauth = {"consumer_key": "dummy",
+                  "consumer_secret": "dummy",
+                  "token": "dummy",
+                  "token_secret": "dummy"}
+    test_albums = [{"id": "1", "totalPages": 1}, {"id": "2", "totalPages": 1}]
+    test_album_photos = {"1": [{"id": "a", "totalPages": 1},
+                               {"id": "b", "totalPages": 1}],
+                         "2": [{"id": "b", "totalPages": 1}]}
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host,
+                                        **self.test_oauth)
+        self.index = AlbumIndex(self.client, workers=2)
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def _return_value(result, message="", code=200):
+        return {"message": message, "code": code, "result": result}
+
+    def _mock_get(self, endpoint, **kwds):
+        if endpoint == "/albums/list.json":
+            return self._return_value(self.test_albums)
+        album_id = endpoint.split("/")[2].split("-")[1]
+        return self._return_value(self.test_album_photos[album_id])
+
+    def _build(self):
+        with mock.patch.object(trovebox.Trovebox, "get",
+                               side_effect=self._mock_get):
+            self.index.build()
+
+    def test_build(self):
+        """Check that the album and photo maps are built"""
+        self._build()
+        self.assertEqual(self.index.album_ids(), set(["1", "2"]))
+        self.assertEqual(self.index.photos_in("1"), set(["a", "b"]))
+        self.assertEqual(self.index.albums_for("b"), set(["1", "2"]))
+        self.assertEqual(self.index.albums_for("missing"), set())
+
+    def test_build_error(self):
+        """Check that errors listing album photos are raised"""
+        with mock.patch.object(trovebox.Trovebox, "get",
+                               side_effect=[self._return_value(self.test_albums),
+                                            trovebox.TroveboxError("fail"),
+                                            trovebox.TroveboxError("fail")]):
+            with self.assertRaises(trovebox.TroveboxError):
+                self.index.build()
+
+    def test_object_lookup(self):
+        """Check that lookups accept Trovebox objects"""
+        self._build()
+        photo = trovebox.objects.photo.Photo(self.client, {"id": "a"})
+        self.assertEqual(self.index.albums_for(photo), set(["1"]))
+
+    def test_attached_add_remove(self):
+        """Check that the attached index tracks mutations via the client"""
+        self._build()
+        self.index.attach()
+        self.client._notify_mutation("/album/2/photo/add.json",
+                                     {"ids": ["a", "c"]})
+        self.assertEqual(self.index.albums_for("a"), set(["1", "2"]))
+        self.assertEqual(self.index.albums_for("c"), set(["2"]))
+
+        self.client._notify_mutation("/album/1/photo/remove.json",
+                                     {"ids": "a,b"})
+        self.assertEqual(self.index.photos_in("1"), set())
+        self.assertEqual(self.index.albums_for("a"), set(["2"]))
+
+        self.index.detach()
+        self.client._notify_mutation("/album/1/photo/add.json", {"ids": ["a"]})
+        self.assertEqual(self.index.photos_in("1"), set())
+
+    def test_attached_deletes(self):
+        """Check that deleted albums and photos are removed from the index"""
+        self._build()
+        self.index.attach()
+        self.client._notify_mutation("/photo/a/delete.json", {})
+        self.assertEqual(self.index.photos_in("1"), set(["b"]))
+        self.client._notify_mutation("/album/2/delete.json", {})
+        self.assertEqual(self.index.albums_for("b"), set(["1"]))
+        self.client._notify_mutation("/photos/delete.json", {"ids": ["b"]})
+        self.assertEqual(self.index.photos_in("1"), set())
+
+    def test_save_load(self):
+        """Check that the index can be persisted"""
+        self._build()
+        path = os.path.join(self.temp_dir, "albums.json")
+        self.index.save(path)
+        index = AlbumIndex(self.client, path=path)
+        index.load()
+        self.assertEqual(index.photos_in("1"), set(["a", "b"]))
+        self.assertEqual(index.albums_for("b"), set(["1", "2"]))
@@ -221,6 +221,77 @@ class TestAlbumAdd(TestAlbums):
         with self.assertRaises(ValueError):
             self.test_albums[0].add(self.test_photos+self.test_albums)
 
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_add_unmodified(self, mock_post):
+        """ Check that the list of objects isn't modified """
+        mock_post.return_value = self._return_value(self.test_albums_dict[1])
+        photos = list(self.test_photos)
+        self.client.album.add(self.test_albums[0], photos)
+        self.assertEqual(photos, self.test_photos)
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_add_generator(self, mock_post):
+        """ Check that photos can be added from a generator """
+        mock_post.return_value = self._return_value(self.test_albums_dict[1])
+        photos = (photo for photo in self.test_photos)
+        self.client.album.add(self.test_albums[0], photos, foo="bar")
+        mock_post.assert_called_with("/album/1/photo/add.json",
+                                     ids=["1a", "2b"], foo="bar")
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_add_single_id(self, mock_post):
+        """ Check that a single ID string isn't split into characters """
+        mock_post.return_value = self._return_value(self.test_albums_dict[1])
+        self.client.album.add("1", "1a", object_type="photo")
+        mock_post.assert_called_with("/album/1/photo/add.json", ids=["1a"])
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_add_chunked(self, mock_post, mock_get):
+        """
+        Check that long lists are added in chunks, with a single
+        view request once all the chunks have been submitted
+        """
+        mock_post.return_value = self._return_value(True)
+        mock_get.return_value = self._return_value(self.test_albums_dict[1])
+        ids = ("%d" % i for i in range(5))
+        result = self.client.album.add("1", ids, object_type="photo",
+                                       chunk_size=2, workers=2, foo="bar")
+        submitted = sorted(call[1]["ids"] for call in mock_post.call_args_list)
+        self.assertEqual(submitted, [["0", "1"], ["2", "3"], ["4"]])
+        for call in mock_post.call_args_list:
+            self.assertEqual(call[0], ("/album/1/photo/add.json",))
+        mock_get.assert_called_once_with("/album/1/view.json")
+        self.assertEqual(result.id, "2")
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_add_chunk_failure(self, mock_post, mock_get):
+        """ Check that failed chunks raise a TroveboxBulkError """
+        mock_post.side_effect = [self._return_value(True),
+                                 trovebox.TroveboxError("Failed")]
+        with self.assertRaises(trovebox.TroveboxBulkError) as context:
+            self.client.album.add("1", ["1a", "2b"], object_type="photo",
+                                  chunk_size=1, workers=1)
+        self.assertEqual(context.exception.result.failed, ["2b"])
+        self.assertFalse(mock_get.called)
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_add_empty(self, _):
+        """ Check that an exception is raised if no objects are added """
+        with self.assertRaises(ValueError):
+            self.test_albums[0].add([])
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_plan_add(self, mock_post):
+        """Check that adding photos can be planned without requests"""
+        photos = (photo for photo in self.test_photos)
+        plan = self.client.album.plan_add(self.test_albums[0], photos,
+                                          max_bytes=2)
+        self.assertEqual(plan.endpoint, "/album/1/photo/add.json")
+        self.assertEqual(plan.chunk_sizes, [1, 1])
+        self.assertFalse(mock_post.called)
+
 class TestAlbumRemovePhotos(TestAlbums):
     @mock.patch.object(trovebox.Trovebox, 'post')
     def test_album_remove(self, mock_post):
@@ -283,6 +354,13 @@ class TestAlbumRemovePhotos(TestAlbums):
         with self.assertRaises(ValueError):
             self.test_albums[0].remove(self.test_photos+self.test_albums)
 
+    def test_album_plan_remove(self):
+        """Check that removing photos can be planned"""
+        plan = self.client.album.plan_remove("1", ["1a", "2b"],
+                                             object_type="photo")
+        self.assertEqual(plan.endpoint, "/album/1/photo/remove.json")
+        self.assertEqual(plan.requests, 1)
+
 class TestAlbumUpdate(TestAlbums):
     @mock.patch.object(trovebox.Trovebox, 'post')
     def test_album_update(self, mock_post):
@@ -318,6 +396,83 @@ class TestAlbumUpdate(TestAlbums):
         self.assertEqual(album.cover.id, "2b")
         self.assertEqual(album.cover.tags, ["tag3", "tag4"])
 
+class TestAlbumFallback(TestAlbums):
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_update_view(self, mock_post, mock_get):
+        """Check that the album is requested if it isn't returned"""
+        mock_post.return_value = self._return_value(True)
+        mock_get.return_value = self._return_value(self.test_albums_dict[1])
+        result = self.client.album.update("1", name="Test")
+        mock_get.assert_called_once_with("/album/1/view.json")
+        self.assertEqual(result.name, "Album 2")
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_update_lazy(self, mock_post, mock_get):
+        """Check that the album can be requested when it is first used"""
+        mock_post.return_value = self._return_value(True)
+        mock_get.return_value = self._return_value(self.test_albums_dict[0])
+        result = self.client.album.update("1", fallback="lazy", name="Test")
+        mock_post.assert_called_with("/album/1/update.json", name="Test")
+        self.assertEqual(result.id, "1")
+        self.assertFalse(mock_get.called)
+        self.assertEqual(result.cover.id, "1a")
+        mock_get.assert_called_once_with("/album/1/view.json")
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_add_none(self, mock_post, mock_get):
+        """Check that the album request can be skipped for the client"""
+        self.client.configure(mutation_fallback="none")
+        mock_post.return_value = self._return_value(True)
+        self.assertIsNone(self.client.album.add("1", ["1a", "2b"],
+                                                object_type="photo"))
+        self.assertIsNone(self.client.album.cover_update("1", "1a"))
+        self.assertFalse(mock_get.called)
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_object_update_lazy(self, mock_post, mock_get):
+        """Check that an album object can be refreshed lazily"""
+        self.client.configure(mutation_fallback="lazy")
+        mock_post.return_value = self._return_value(True)
+        mock_get.return_value = self._return_value(self.test_albums_dict[1])
+        album = self.test_albums[0]
+        album.update(name="Test")
+        self.assertFalse(mock_get.called)
+        self.assertEqual(album.name, "Album 2")
+        self.assertEqual(album.cover.tags, ["tag3", "tag4"])
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_object_update_none(self, mock_post):
+        """Check that the sent fields are applied if the album isn't returned"""
+        mock_post.return_value = self._return_value(True)
+        album = self.test_albums[0]
+        album.update(fallback="none", name="Test")
+        self.assertEqual(album.name, "Test")
+        self.assertEqual(album.cover.id, "1a")
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_album_save_none(self, mock_post):
+        """Check that saved changes are recorded if the album isn't returned"""
+        self.client.configure(mutation_fallback="none")
+        mock_post.return_value = self._return_value(True)
+        album = self.test_albums[0]
+        album.name = "New"
+        self.assertTrue(album.save())
+        self.assertEqual(album.name, "New")
+        self.assertEqual(album.get_changes(), {})
+        self.assertFalse(album.save())
+        mock_post.assert_called_once_with("/album/1/update.json", name="New")
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_invalid_fallback(self, mock_post):
+        """Check that an invalid fallback mode raises an exception"""
+        mock_post.return_value = self._return_value(True)
+        with self.assertRaises(ValueError):
+            self.client.album.update("1", fallback="invalid", name="Test")
+
 class TestAlbumView(TestAlbums):
     @mock.patch.object(trovebox.Trovebox, 'get')
     def test_album_view(self, mock_get):
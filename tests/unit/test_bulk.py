@@ -0,0 +1,95 @@
+from __future__ import unicode_literals
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox.bulk import chunk_ids, ChunkResult, BulkResult, BulkPlan
+
+def encode(item):
+    return ("%s" % item).encode("utf-8")
+
+class TestChunkIds(unittest.TestCase):
+    def test_chunk_size(self):
+        """Check that chunks contain at most chunk_size ids"""
+        self.assertEqual(list(chunk_ids(range(5), encode, chunk_size=2)),
+                         [[0, 1], [2, 3], [4]])
+
+    def test_max_bytes(self):
+        """Check that the encoded chunks are at most max_bytes long"""
+        ids = ["aaa", "bbb", "ccc", "\xfc\xfc"]
+        # "aaa,bbb" is 7 bytes, "ccc,\xfc\xfc" is 8 bytes
+        self.assertEqual(list(chunk_ids(ids, encode, max_bytes=7)),
+                         [["aaa", "bbb"], ["ccc"], ["\xfc\xfc"]])
+        self.assertEqual(list(chunk_ids(ids, encode, max_bytes=8)),
+                         [["aaa", "bbb"], ["ccc", "\xfc\xfc"]])
+
+    def test_oversized_id(self):
+        """Check that an id longer than max_bytes gets its own chunk"""
+        self.assertEqual(list(chunk_ids(["a", "bbbbbb", "c"], encode,
+                                        max_bytes=3)),
+                         [["a"], ["bbbbbb"], ["c"]])
+
+    def test_lazy(self):
+        """Check that the ids are consumed lazily"""
+        def ids():
+            yield "a"
+            yield "b"
+            raise AssertionError("Consumed too far")
+        chunks = chunk_ids(ids(), encode, chunk_size=1)
+        self.assertEqual(next(chunks), ["a"])
+
+    def test_empty(self):
+        """Check that no ids produce no chunks"""
+        self.assertEqual(list(chunk_ids([], encode)), [])
+        with self.assertRaises(ValueError):
+            list(chunk_ids(["a"], encode, chunk_size=0))
+
+class TestBulkResult(unittest.TestCase):
+    def test_result(self):
+        """Check the aggregate result of successful/failed chunks"""
+        error = trovebox.TroveboxError("Failed")
+        result = BulkResult([ChunkResult(["1a", "2b"], True),
+                             ChunkResult(["3c"], error=error)])
+        self.assertFalse(result.ok)
+        self.assertEqual(result.succeeded, ["1a", "2b"])
+        self.assertEqual(result.failed, ["3c"])
+        self.assertEqual(result.errors, [error])
+        self.assertEqual(result.to_dict(),
+                         {"succeeded": ["1a", "2b"], "failed": ["3c"],
+                          "errors": ["Failed"]})
+        with self.assertRaises(trovebox.TroveboxBulkError) as context:
+            result.raise_for_errors("Test")
+        self.assertIs(context.exception.result, result)
+        self.assertIn("Test failed for 1 of 3 ids", str(context.exception))
+
+    def test_ok(self):
+        """Check that a successful result doesn't raise"""
+        result = BulkResult()
+        result.add(ChunkResult(["1a"], True))
+        self.assertTrue(result.ok)
+        result.raise_for_errors()
+
+class TestBulkPlan(unittest.TestCase):
+    def test_plan(self):
+        """Check that the requests, items and bytes are totalled"""
+        plan = BulkPlan("/photos/update.json", workers=2, latency=0.5)
+        for items in (3, 3, 1):
+            plan.add(items, 10 * items)
+        self.assertEqual(plan.requests, 3)
+        self.assertEqual(plan.items, 7)
+        self.assertEqual(plan.payload_bytes, 70)
+        # Two rounds of concurrent requests
+        self.assertEqual(plan.estimated_seconds, 1.0)
+        self.assertEqual(plan.to_dict(),
+                         {"endpoint": "/photos/update.json", "requests": 3,
+                          "items": 7, "chunk_sizes": [3, 3, 1],
+                          "payload_bytes": 70, "workers": 2,
+                          "estimated_seconds": 1.0})
+
+    def test_no_latency(self):
+        """Check that there is no estimate without a recent latency"""
+        plan = BulkPlan("/photos/update.json")
+        plan.add(1, 10)
+        self.assertIsNone(plan.estimated_seconds)
@@ -0,0 +1,483 @@
+from __future__ import unicode_literals
+import json
+import mock
+import httpretty
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox.cache import (ResponseCache, CacheEntry, CacheStats,
+                            endpoint_group, summarise)
+from trovebox.invalidation import ALL
+
+class TestResponseCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        """Check that the least recently used entry is evicted"""
+        cache = ResponseCache(max_entries=2)
+        for key in ("a", "b"):
+            cache.set(key, CacheEntry("/test.json", key, float("inf")))
+        cache.get("a")
+        cache.set("c", CacheEntry("/test.json", "c", float("inf")))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a").body, "a")
+
+    def test_lru_eviction_after_repeated_use(self):
+        """Check the eviction order after many gets and overwrites"""
+        cache = ResponseCache(max_entries=3)
+        for key in ("a", "b", "c"):
+            cache.set(key, CacheEntry("/test.json", key, float("inf")))
+        for _ in range(100):
+            cache.get("a")
+            cache.set("c", CacheEntry("/test.json", "c", float("inf")))
+        self.assertLess(len(cache._use_heap), 30)
+        cache.set("d", CacheEntry("/test.json", "d", float("inf")))
+        self.assertIsNone(cache.get("b"))
+        cache.delete("a")
+        cache.set("e", CacheEntry("/test.json", "e", float("inf")))
+        cache.set("f", CacheEntry("/test.json", "f", float("inf")))
+        self.assertIsNone(cache.get("c"))
+        self.assertEqual(sorted(cache._entries), ["d", "e", "f"])
+
+    @mock.patch("time.time")
+    def test_expiry_with_validators(self, mock_time):
+        """Check that expired entries with validators are retained"""
+        mock_time.return_value = 100
+        cache = ResponseCache()
+        cache.set("a", CacheEntry("/test.json", "a", 110, etag='"abc"'))
+        mock_time.return_value = 200
+        entry = cache.get("a")
+        self.assertFalse(entry.is_fresh())
+        self.assertEqual(entry.conditional_headers(),
+                         {"If-None-Match": '"abc"'})
+
+    @mock.patch("time.time")
+    def test_expiry(self, mock_time):
+        """Check that expired entries aren't returned"""
+        mock_time.return_value = 100
+        cache = ResponseCache()
+        cache.set("a", CacheEntry("/test.json", "a", 110))
+        self.assertEqual(cache.get("a").body, "a")
+        mock_time.return_value = 110
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_endpoint_ttls(self):
+        """Check that endpoint ttls override the default"""
+        cache = ResponseCache(ttl=60,
+                              endpoint_ttls=[(r"^/photo/", 300),
+                                             (r"^/system/", 0)])
+        self.assertEqual(cache.ttl_for("/photo/1a/view.json"), 300)
+        self.assertEqual(cache.ttl_for("/system/version.json"), 0)
+        self.assertEqual(cache.ttl_for("/tags/list.json"), 60)
+
+    def test_delete_object(self):
+        """Check that entries can be deleted by object type and id"""
+        cache = ResponseCache()
+        cache.set("a", CacheEntry("/photo/1a/view.json", "a", float("inf")))
+        cache.set("b", CacheEntry("/photo/2b/view.json", "b", float("inf")))
+        cache.set("c", CacheEntry("/photos/list.json", "c", float("inf")))
+        cache.delete_object("photo", "1a")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 2)
+
+    def test_invalidate(self):
+        """Check that entries are invalidated by dependency tag"""
+        cache = ResponseCache()
+        cache.set("a", CacheEntry("/photo/1a/view.json", "a", float("inf"),
+                                  tags=["photo:1a"]))
+        cache.set("b", CacheEntry("/albums/list.json", "b", float("inf"),
+                                  tags=["albums", "photos"]))
+        cache.set("c", CacheEntry("/tags/list.json", "c", float("inf"),
+                                  tags=["tags"]))
+        cache.invalidate(set(["photos"]))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache), 2)
+        cache.invalidate(set(["photo:1a", "unknown"]))
+        self.assertEqual(len(cache), 1)
+        cache.invalidate(set([ALL]))
+        self.assertEqual(len(cache), 0)
+
+    def test_delete_clear(self):
+        """Check that entries can be deleted"""
+        cache = ResponseCache()
+        cache.set("a", CacheEntry("/test.json", "a", float("inf")))
+        cache.set("b", CacheEntry("/test.json", "b", float("inf")))
+        cache.delete("a")
+        self.assertIsNone(cache.get("a"))
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+class TestCacheStats(unittest.TestCase):
+    def test_endpoint_group(self):
+        """Check that ids and options are removed from endpoints"""
+        self.assertEqual(endpoint_group("/photo/1a/view.json"),
+                         "/photo/*/view.json")
+        self.assertEqual(endpoint_group("/photo/1a/token-x/view.json"),
+                         "/photo/*/view.json")
+        self.assertEqual(endpoint_group("/photos/album-1/tags-a/list.json"),
+                         "/photos/*/list.json")
+        self.assertEqual(endpoint_group("/photo/1a/nextprevious.json"),
+                         "/photo/*/nextprevious.json")
+        self.assertEqual(endpoint_group("/tags/list.json"), "/tags/list.json")
+
+    def test_record(self):
+        """Check that events are counted by endpoint group"""
+        stats = CacheStats()
+        stats.record("hits", "/photo/1a/view.json")
+        stats.record("hits", "/photo/2b/view.json")
+        stats.record("misses", "/tags/list.json", 3)
+        self.assertEqual(stats.counts(),
+                         {("/photo/*/view.json", "hits"): 2,
+                          ("/tags/list.json", "misses"): 3})
+        self.assertEqual(len(stats.pop_counts()), 2)
+        self.assertEqual(stats.counts(), {})
+        with self.assertRaises(ValueError):
+            stats.record("unknown", "/tags/list.json")
+
+    def test_summarise(self):
+        """Check that the statistics are totalled"""
+        stats = summarise({("/photo/*/view.json", "hits"): 3,
+                           ("/photo/*/view.json", "misses"): 1,
+                           ("/tags/list.json", "evictions"): 2},
+                          [("/photo/1a/view.json", 10),
+                           ("/photo/2b/view.json", 20)])
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["bytes"], 30)
+        self.assertEqual(stats["hits"], 3)
+        self.assertEqual(stats["evictions"], 2)
+        self.assertEqual(stats["hit_ratio"], 0.75)
+        photo_stats = stats["endpoints"]["/photo/*/view.json"]
+        self.assertEqual(photo_stats["entries"], 2)
+        self.assertEqual(photo_stats["bytes"], 30)
+        self.assertIsNone(stats["endpoints"]["/tags/list.json"]["hit_ratio"])
+
+    def test_cache_statistics(self):
+        """Check that the cache records its events"""
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", CacheEntry("/photo/1a/view.json", "\xe9", float("inf"),
+                                  tags=["photo:1a"]))
+        cache.set("b", CacheEntry("/photo/2b/view.json", "b", float("inf")))
+        cache.set("c", CacheEntry("/tags/list.json", "c", 0))
+        self.assertIsNone(cache.get("c"))
+        cache.set("d", CacheEntry("/photo/1a/view.json", "d", float("inf"),
+                                  tags=["photo:1a"]))
+        cache.invalidate(set(["photo:1a"]))
+
+        stats = cache.statistics()
+        self.assertEqual(stats["stores"], 4)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["expirations"], 1)
+        self.assertEqual(stats["invalidations"], 1)
+        self.assertEqual(stats["entries"], 1)
+
+        cache.set("a", CacheEntry("/photo/1a/view.json", "\xe9", float("inf")))
+        self.assertEqual(cache.statistics()["bytes"], 3)
+        cache.reset_statistics()
+        self.assertEqual(cache.statistics()["stores"], 0)
+
+class TestHttpCache(unittest.TestCase):
+    test_host = "test.example.com"
+    test_oauth = {"consumer_key": "dummy",
+                  "consumer_secret": "dummy",
+                  "token": "dummy",
+                  "token_secret": "dummy"}
+    test_endpoint = "test.json"
+    test_uri = "http://%s/%s" % (test_host, test_endpoint)
+    test_data = {"message": "Test Message",
+                 "code": 200,
+                 "result": {"id": "1a"}}
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host)
+        self.cache = ResponseCache(endpoint_ttls=[(r"^/nocache", 0)])
+        self.client.configure(cache=self.cache)
+
+    def _register_uri(self, uri=test_uri, data=None, **kwds):
+        if data is None:
+            data = self.test_data
+        httpretty.register_uri(httpretty.GET, uri=uri, body=json.dumps(data),
+                               **kwds)
+
+    @staticmethod
+    def _last_request():
+        return httpretty.httpretty.last_request
+
+    @httpretty.activate
+    def test_cache_hit(self):
+        """Check that a repeated GET is served from the cache"""
+        self._register_uri()
+        self.assertEqual(self.client.get(self.test_endpoint, foo="bar"),
+                         self.test_data)
+        httpretty.reset()
+        result = self.client.get(self.test_endpoint, foo="bar")
+        self.assertEqual(result, self.test_data)
+        self.assertEqual(self.client.last_url, self.test_uri)
+
+        # Cached results can be modified without affecting the cache
+        result["result"]["id"] = "modified"
+        self.assertEqual(self.client.get(self.test_endpoint, foo="bar"),
+                         self.test_data)
+
+    @httpretty.activate
+    def test_different_params(self):
+        """Check that different parameters are cached separately"""
+        self._register_uri()
+        self.client.get(self.test_endpoint, foo="bar")
+        self.client.get(self.test_endpoint, foo="baz")
+        self.assertEqual(len(self.cache), 2)
+
+    @httpretty.activate
+    def test_credentials_identity(self):
+        """Check that different credentials don't share cache entries"""
+        self._register_uri()
+        self.client.get(self.test_endpoint)
+        client = trovebox.Trovebox(host=self.test_host, consumer_key="key",
+                                   consumer_secret="secret", token="token",
+                                   token_secret="secret")
+        client.configure(cache=self.cache)
+        client.get(self.test_endpoint)
+        self.assertEqual(len(self.cache), 2)
+
+    @httpretty.activate
+    def test_bypass(self):
+        """Check that use_cache=False refreshes the cached response"""
+        self._register_uri()
+        self.client.get(self.test_endpoint)
+        new_data = dict(self.test_data, result={"id": "2b"})
+        self._register_uri(data=new_data)
+        self.assertEqual(self.client.get(self.test_endpoint), self.test_data)
+        self.assertEqual(self.client.get(self.test_endpoint, use_cache=False),
+                         new_data)
+        self.assertEqual(self.client.get(self.test_endpoint), new_data)
+
+    @httpretty.activate
+    def test_uncached_endpoint(self):
+        """Check that endpoints with a ttl of 0 aren't cached"""
+        self._register_uri(uri="http://%s/nocache.json" % self.test_host)
+        self.client.get("nocache.json")
+        self.assertEqual(len(self.cache), 0)
+
+    @httpretty.activate
+    def test_unprocessed_response(self):
+        """Check that unprocessed responses aren't cached"""
+        self._register_uri()
+        self.client.get(self.test_endpoint, process_response=False)
+        self.assertEqual(len(self.cache), 0)
+
+    @httpretty.activate
+    def test_errors_not_cached(self):
+        """Check that error responses aren't cached"""
+        self._register_uri(data={"message": "Error", "code": 500})
+        with self.assertRaises(trovebox.TroveboxError):
+            self.client.get(self.test_endpoint)
+        self.assertEqual(len(self.cache), 0)
+
+    @httpretty.activate
+    def test_api_call(self):
+        """Check that API calls use the cache"""
+        self._register_uri(uri="http://%s/photo/1a/view.json" % self.test_host)
+        self.client.photo.view("1a")
+        httpretty.reset()
+        self.assertEqual(self.client.photo.view("1a").id, "1a")
+
+    @httpretty.activate
+    @mock.patch("time.time")
+    def test_revalidation(self, mock_time):
+        """Check that expired entries are revalidated using validators"""
+        mock_time.return_value = 1000
+        self._register_uri(adding_headers={
+            "ETag": '"abc"', "Last-Modified": "Tue, 01 Jan 2013 00:00:00 GMT"})
+        self.client.get(self.test_endpoint)
+        self.assertNotIn("If-None-Match", self._last_request().headers)
+
+        mock_time.return_value = 2000
+        httpretty.register_uri(httpretty.GET, uri=self.test_uri, body="",
+                               status=304)
+        self.assertEqual(self.client.get(self.test_endpoint), self.test_data)
+        self.assertEqual(self._last_request().headers["If-None-Match"],
+                         '"abc"')
+        self.assertEqual(self._last_request().headers["If-Modified-Since"],
+                         "Tue, 01 Jan 2013 00:00:00 GMT")
+
+        # The entry is fresh again
+        httpretty.reset()
+        self.assertEqual(self.client.get(self.test_endpoint), self.test_data)
+
+    @httpretty.activate
+    @mock.patch("time.time")
+    def test_revalidation_modified(self, mock_time):
+        """Check that a modified response replaces the cached entry"""
+        mock_time.return_value = 1000
+        self._register_uri(adding_headers={"ETag": '"abc"'})
+        self.client.get(self.test_endpoint)
+
+        mock_time.return_value = 2000
+        new_data = dict(self.test_data, result={"id": "2b"})
+        self._register_uri(data=new_data, adding_headers={"ETag": '"def"'})
+        self.assertEqual(self.client.get(self.test_endpoint), new_data)
+        self.assertEqual(self._last_request().headers["If-None-Match"],
+                         '"abc"')
+
+    @httpretty.activate
+    @mock.patch("time.time")
+    def test_no_validators(self, mock_time):
+        """Check that expired entries without validators are refetched"""
+        mock_time.return_value = 1000
+        self._register_uri()
+        self.client.get(self.test_endpoint)
+        mock_time.return_value = 2000
+        self.client.get(self.test_endpoint)
+        self.assertNotIn("If-None-Match", self._last_request().headers)
+        self.assertNotIn("If-Modified-Since", self._last_request().headers)
+
+    @httpretty.activate
+    def test_invalidation(self):
+        """Check that mutations invalidate the affected cache entries"""
+        self.client = trovebox.Trovebox(host=self.test_host, **self.test_oauth)
+        self.client.configure(cache=self.cache)
+        for uri in ("photo/1a/view.json", "photo/2b/view.json",
+                    "tags/list.json", "system/version.json"):
+            self._register_uri(uri="http://%s/%s" % (self.test_host, uri))
+            self.client.get(uri)
+        self.assertEqual(len(self.cache), 4)
+
+        httpretty.register_uri(httpretty.POST,
+                               uri="http://%s/photo/1a/update.json" %
+                               self.test_host,
+                               body=json.dumps(self.test_data))
+        self.client.photo.update("1a", title="New")
+        # photo/2b and system/version remain
+        self.assertEqual(len(self.cache), 2)
+
+    @httpretty.activate
+    def test_photo_view_invalidation(self):
+        """Check that tag/album changes invalidate all the photo views"""
+        self.client = trovebox.Trovebox(host=self.test_host, **self.test_oauth)
+        self.client.configure(cache=self.cache)
+        for endpoint in ("tag/t1/delete.json", "tag/t1/update.json",
+                         "album/1/delete.json"):
+            self.cache.clear()
+            for uri in ("photo/1a/view.json", "photo/2b/view.json",
+                        "system/version.json"):
+                self._register_uri(uri="http://%s/%s" % (self.test_host,
+                                                         uri))
+                self.client.get(uri)
+            httpretty.register_uri(httpretty.POST,
+                                   uri="http://%s/%s" % (self.test_host,
+                                                         endpoint),
+                                   body=json.dumps(self.test_data))
+            self.client.post(endpoint)
+            # Only system/version remains
+            self.assertEqual(len(self.cache), 1, endpoint)
+
+    def _register_404(self, uri):
+        httpretty.register_uri(httpretty.GET,
+                               uri="http://%s/%s" % (self.test_host, uri),
+                               body=json.dumps({"message": "Not found",
+                                                "code": 404}),
+                               status=404)
+
+    @httpretty.activate
+    def test_404_not_cached(self):
+        """Check that 404 responses aren't cached by default"""
+        self._register_404("photo/1a/view.json")
+        with self.assertRaises(trovebox.Trovebox404Error):
+            self.client.photo.view("1a")
+        self.assertEqual(len(self.cache), 0)
+
+    @httpretty.activate
+    def test_negative_cache(self):
+        """Check that 404s from view endpoints are cached if enabled"""
+        self.cache.negative_ttl = 10
+        self._register_404("photo/1a/view.json")
+        self._register_404("photos/list.json")
+        with self.assertRaises(trovebox.Trovebox404Error):
+            self.client.photo.view("1a")
+        with self.assertRaises(trovebox.Trovebox404Error):
+            self.client.photos.list()
+        # Only the view endpoint is cached
+        self.assertEqual(len(self.cache), 1)
+
+        httpretty.reset()
+        with self.assertRaises(trovebox.Trovebox404Error):
+            self.client.photo.view("1a")
+
+    @httpretty.activate
+    @mock.patch("time.time")
+    def test_negative_cache_expiry(self, mock_time):
+        """Check that negative entries use the negative_ttl"""
+        mock_time.return_value = 1000
+        self.cache.negative_ttl = 10
+        self._register_404("photo/1a/view.json")
+        with self.assertRaises(trovebox.Trovebox404Error):
+            self.client.photo.view("1a")
+
+        mock_time.return_value = 1011
+        self._register_uri(uri="http://%s/photo/1a/view.json" % self.test_host)
+        self.assertEqual(self.client.photo.view("1a").id, "1a")
+
+    @httpretty.activate
+    def test_negative_cache_invalidation(self):
+        """Check that creating an object discards negative entries"""
+        self.client = trovebox.Trovebox(host=self.test_host, **self.test_oauth)
+        self.cache.negative_ttl = 10
+        self.client.configure(cache=self.cache)
+        self._register_404("photo/1a/view.json")
+        self._register_404("album/1/view.json")
+        for call in (lambda: self.client.photo.view("1a"),
+                     lambda: self.client.album.view("1")):
+            with self.assertRaises(trovebox.Trovebox404Error):
+                call()
+        self.assertEqual(len(self.cache), 2)
+
+        httpretty.register_uri(httpretty.POST,
+                               uri="http://%s/album/create.json" %
+                               self.test_host,
+                               body=json.dumps(self.test_data))
+        self.client.album.create("Album")
+        # Only the photo entry remains
+        self.assertEqual(len(self.cache), 1)
+        self._register_uri(uri="http://%s/album/1/view.json" % self.test_host)
+        self.assertEqual(self.client.album.view("1").id, "1a")
+
+    @httpretty.activate
+    @mock.patch("time.time")
+    def test_statistics(self, mock_time):
+        """Check that the client records cache hits/misses/revalidations"""
+        mock_time.return_value = 1000
+        self.cache.negative_ttl = 10
+        self._register_uri(adding_headers={"ETag": '"abc"'})
+        self.client.get(self.test_endpoint)
+        self.client.get(self.test_endpoint)
+        self.client.get(self.test_endpoint, use_cache=False)
+        self._register_404("photo/1a/view.json")
+        for _ in range(2):
+            with self.assertRaises(trovebox.Trovebox404Error):
+                self.client.photo.view("1a")
+
+        mock_time.return_value = 2000
+        httpretty.register_uri(httpretty.GET, uri=self.test_uri, body="",
+                               status=304)
+        self.client.get(self.test_endpoint)
+
+        stats = self.client.cache_stats()["responses"]
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["negative_hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["bypasses"], 1)
+        self.assertEqual(stats["revalidations"], 1)
+        self.assertEqual(stats["endpoints"]["/photo/*/view.json"]["hits"], 1)
+
+    def test_client_statistics(self):
+        """Check the statistics for caches that aren't enabled"""
+        client = trovebox.Trovebox(host=self.test_host)
+        self.assertEqual(client.cache_stats(),
+                         {"responses": None, "identity_map": None,
+                          "coalesced_requests": 0})
+        client.configure(identity_map=True)
+        photo = trovebox.objects.photo.Photo(client, {"id": "1a"})
+        self.assertEqual(client.cache_stats()["identity_map"],
+                         {"objects": 1})
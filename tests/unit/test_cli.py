@@ -1,7 +1,10 @@
 from __future__ import unicode_literals
 import os
 import sys
+import json
 import shutil
+import sqlite3
+import tempfile
 import mock
 try:
     import StringIO as io # Python2
@@ -14,6 +17,7 @@ except ImportError:
 
 import trovebox
 from trovebox.main import main
+from trovebox.sqlite_cache import SQLiteCache
 
 class TestException(Exception):
     pass
@@ -213,3 +217,36 @@ class TestCli(unittest.TestCase):
         """Check that the help string is correctly printed"""
         main(["--help"])
         self.assertIn("show this help message", mock_stdout.getvalue())
+
+    @mock.patch('sys.stdout', new_callable=io.StringIO)
+    def test_cache_stats(self, mock_stdout):
+        """Check that SQLite cache statistics can be displayed"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "cache.db")
+            cache = SQLiteCache(path)
+            cache.record("hits", "/photo/1a/view.json")
+            cache.close()
+            connection = sqlite3.connect(path)
+            connection.execute("PRAGMA journal_mode=DELETE")
+            connection.close()
+            with open(path, "rb") as cache_file:
+                contents = cache_file.read()
+            main(["--cache-stats", path])
+            # The database is opened read-only, so it isn't switched
+            # back to write-ahead logging
+            with open(path, "rb") as cache_file:
+                self.assertEqual(cache_file.read(), contents)
+        finally:
+            shutil.rmtree(temp_dir)
+        stats = json.loads(mock_stdout.getvalue())
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["endpoints"]["/photo/*/view.json"]["hits"], 1)
+
+    @mock.patch.object(sys, "exit", raise_exception)
+    @mock.patch('sys.stderr', new_callable=io.StringIO)
+    def test_cache_stats_missing(self, mock_stderr):
+        """Check that a missing cache file produces an error"""
+        with self.assertRaises(TestException):
+            main(["--cache-stats", "this_cache_doesnt_exist"])
+        self.assertIn("Cache file not found", mock_stderr.getvalue())
@@ -0,0 +1,39 @@
+from __future__ import unicode_literals
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+from trovebox.objects.photo import Photo
+from trovebox.fields import extract_id, to_list, split_ids, to_int
+
+class TestFields(unittest.TestCase):
+    def test_extract_id(self):
+        """Check that ids are extracted from objects"""
+        self.assertEqual(extract_id(Photo(None, {"id": "1a"})), "1a")
+        self.assertEqual(extract_id("2b"), "2b")
+
+    def test_to_list(self):
+        """Check that lists are created from lists and strings"""
+        self.assertEqual(to_list(None), [])
+        self.assertEqual(to_list(""), [])
+        self.assertEqual(to_list("tag1,,tag2"), ["tag1", "tag2"])
+        self.assertEqual(to_list(("tag1", Photo(None, {"id": "1a"}))),
+                         ["tag1", "1a"])
+
+    def test_split_ids(self):
+        """Check that ids can be extracted from lists and strings"""
+        self.assertEqual(split_ids(None), [])
+        self.assertEqual(split_ids("1a,2b"), ["1a", "2b"])
+        self.assertEqual(split_ids([Photo(None, {"id": "1a"}), 2]),
+                         ["1a", "2"])
+
+    def test_to_int(self):
+        """Check that field values are converted to integers"""
+        self.assertEqual(to_int("123"), 123)
+        self.assertEqual(to_int("1.5"), 1)
+        self.assertEqual(to_int(None), 0)
+        self.assertEqual(to_int(""), 0)
+        with self.assertRaises(ValueError):
+            to_int("invalid")
+        self.assertEqual(to_int("invalid", default=0), 0)
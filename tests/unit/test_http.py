@@ -218,6 +218,28 @@ class TestHttp(unittest.TestCase):
                                                     self.test_endpoint))
         GetOrPost(self.client, method).call(self.test_endpoint)
 
+    def test_url_prefix_updated(self):
+        """Check that URLs change when the API version or host changes"""
+        self.assertEqual(self.client._construct_url("test.json"),
+                         "http://test.example.com/test.json")
+        self.client.configure(api_version=2)
+        self.assertEqual(self.client._construct_url("/test.json"),
+                         "http://test.example.com/v2/test.json")
+        self.client.host = "https://other.example.com"
+        self.assertEqual(self.client._construct_url("/test.json"),
+                         "https://other.example.com/v2/test.json")
+
+    @httpretty.activate
+    @data(GET, POST)
+    def test_recent_latency(self, method):
+        """Check that the latency of recent requests is recorded"""
+        self._register_uri(method)
+        self.assertIsNone(self.client.recent_latency(method))
+        GetOrPost(self.client, method).call(self.test_endpoint)
+        GetOrPost(self.client, method).call(self.test_endpoint)
+        self.assertEqual(len(self.client._latencies[method]), 2)
+        self.assertGreaterEqual(self.client.recent_latency(method), 0)
+
     @mock.patch.object(trovebox.http.requests, 'Session')
     @data(GET, POST)
     def test_ssl_verify_disabled(self, method, mock_session):
@@ -260,3 +282,28 @@ class TestHttp(unittest.TestCase):
                                         files={"file": in_file})
         self.assertEqual(response, self.test_data)
         self.assertEqual(self._last_request().querystring["foo"], ["bar"])
+
+    @httpretty.activate
+    def test_mutation_listener(self):
+        """Check that mutation listeners are notified after a POST"""
+        self._register_uri(httpretty.POST)
+        listener = mock.Mock()
+        self.client.add_mutation_listener(listener)
+        self.client.post(self.test_endpoint, ids=["1a", "2b"])
+        listener.assert_called_once_with("/%s" % self.test_endpoint,
+                                         {"ids": ["1a", "2b"]})
+
+        self.client.remove_mutation_listener(listener)
+        self.client.post(self.test_endpoint)
+        self.assertEqual(listener.call_count, 1)
+
+    @httpretty.activate
+    def test_mutation_listener_not_called_on_error(self):
+        """Check that mutation listeners aren't notified of failed POSTs"""
+        self._register_uri(httpretty.POST, status=500,
+                           data={"message": "Error", "code": 500})
+        listener = mock.Mock()
+        self.client.add_mutation_listener(listener)
+        with self.assertRaises(trovebox.TroveboxError):
+            self.client.post(self.test_endpoint)
+        self.assertFalse(listener.called)
@@ -0,0 +1,102 @@
+from __future__ import unicode_literals
+import mock
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox.objects.photo import Photo
+from trovebox.hydrate import Hydrator
+
+class TestHydrate(unittest.TestCase):
+    test_host = "test.example.com"
+    test_photos_dict = [{"id": "1a", "title": "Photo 1"},
+                        {"id": "2b", "title": "Photo 2"},
+                        {"id": "3c", "title": "Photo 3"}]
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host)
+        self.photos = [Photo(self.client, dict(photo))
+                       for photo in self.test_photos_dict]
+
+    @staticmethod
+    def _return_value(result, message="", code=200):
+        return {"message": message, "code": code, "result": result}
+
+    def _mock_get(self, endpoint, **kwds):
+        photo_id = endpoint.split("/")[2]
+        return self._return_value({"id": photo_id,
+                                   "path1024x1024": "%s.jpg" % photo_id})
+
+    @mock.patch.object(trovebox.Trovebox, "get")
+    def test_existing_fields(self, mock_get):
+        """Check that existing fields don't trigger a request"""
+        photos = self.client.photo.hydrate(self.photos)
+        self.assertEqual([photo.title for photo in photos],
+                         ["Photo 1", "Photo 2", "Photo 3"])
+        self.assertFalse(mock_get.called)
+
+    @mock.patch.object(trovebox.Trovebox, "get")
+    def test_batches(self, mock_get):
+        """Check that missing fields are requested in batches"""
+        mock_get.side_effect = self._mock_get
+        photos = self.client.photo.hydrate(self.photos, batch_size=2,
+                                           options={"token": "x"},
+                                           returnSizes="1024x1024")
+        self.assertEqual(photos[1].path1024x1024, "2b.jpg")
+        self.assertEqual(sorted(call[0][0] for call in
+                                mock_get.call_args_list),
+                         ["/photo/1a/token-x/view.json",
+                          "/photo/2b/token-x/view.json"])
+        for call in mock_get.call_args_list:
+            self.assertEqual(call[1], {"returnSizes": "1024x1024"})
+
+        self.assertEqual(photos[0].path1024x1024, "1a.jpg")
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(photos[2].path1024x1024, "3c.jpg")
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertFalse(hasattr(photos[2], "missing"))
+        self.assertEqual(mock_get.call_count, 3)
+
+    def test_failures(self):
+        """Check that failed requests are retried on the next access"""
+        fetched = []
+        def fetch(photo_id):
+            fetched.append(photo_id)
+            if fetched.count(photo_id) == 1:
+                raise trovebox.TroveboxError("Failed")
+            return {"id": photo_id, "extra": photo_id}
+        hydrator = Hydrator(fetch, workers=1)
+        photos = hydrator.add(self.photos)
+        with self.assertRaises(trovebox.TroveboxError):
+            photos[0].extra
+        self.assertEqual(hydrator.pending(), 3)
+        self.assertEqual(photos[0].extra, "1a")
+        self.assertEqual(photos[1].extra, "2b")
+        self.assertEqual(hydrator.pending(), 0)
+        self.assertEqual(hydrator.requests_sent, 6)
+
+    def test_no_id(self):
+        """Check that objects must have an id"""
+        with self.assertRaises(ValueError):
+            Hydrator(lambda photo_id: {}).add([Photo(self.client, {})])
+
+    def test_lazy_objects(self):
+        """Check that adding a lazy object doesn't load it"""
+        loader = mock.Mock(return_value={"id": "1a"})
+        self.photos[0]._set_loader(loader)
+        Hydrator(lambda photo_id: {}).add([self.photos[0]])
+        self.assertFalse(loader.called)
+
+    def test_invalid_batch_size(self):
+        """Check that the batch size must be at least 1"""
+        with self.assertRaises(ValueError):
+            Hydrator(lambda photo_id: {}, batch_size=0)
+
+    @mock.patch.object(trovebox.Trovebox, "get")
+    def test_repr(self, mock_get):
+        """Check that repr() doesn't hydrate the photo"""
+        photo = self.client.photo.hydrate([self.photos[0]])[0]
+        self.assertEqual(repr(photo), "<Photo id='1a'>")
+        self.assertFalse(mock_get.called)
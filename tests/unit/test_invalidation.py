@@ -0,0 +1,111 @@
+from __future__ import unicode_literals
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+from trovebox.objects.photo import Photo
+from trovebox.invalidation import (dependency_tags, dirtied_tags,
+                                   negative_tags, ALL)
+
+class TestDependencyTags(unittest.TestCase):
+    def test_object_views(self):
+        """Check the tags for object view endpoints"""
+        self.assertEqual(dependency_tags("/photo/1a/view.json"),
+                         set(["photo:1a", "photo-views"]))
+        self.assertEqual(dependency_tags("/photo/1a/token-x/view.json"),
+                         set(["photo:1a", "photo-views"]))
+        self.assertEqual(dependency_tags("/album/1/view.json"),
+                         set(["album:1", "albums", "photos"]))
+        self.assertEqual(dependency_tags("/action/5/view.json"),
+                         set(["action:5"]))
+
+    def test_lists(self):
+        """Check the tags for list endpoints"""
+        self.assertEqual(dependency_tags("/photos/album-1/list.json"),
+                         set(["photos"]))
+        self.assertEqual(dependency_tags("/albums/list.json"),
+                         set(["albums", "photos"]))
+        self.assertEqual(dependency_tags("/tags/list.json"), set(["tags"]))
+        self.assertEqual(dependency_tags("/photo/1a/nextprevious.json"),
+                         set(["photo:1a", "photo-views", "photos"]))
+
+    def test_untracked(self):
+        """Check that unrelated endpoints have no tags"""
+        self.assertEqual(dependency_tags("/system/version.json"), set())
+
+class TestNegativeTags(unittest.TestCase):
+    def test_view_endpoints(self):
+        """Check the tags for negatively cached view endpoints"""
+        self.assertEqual(negative_tags("/photo/1a/view.json"),
+                         set(["photo:1a", "404:photo"]))
+        self.assertEqual(negative_tags("/album/1/view.json"),
+                         set(["album:1", "404:album"]))
+        self.assertEqual(negative_tags("/tag/t1/view.json"),
+                         set(["tag:t1", "404:tag"]))
+
+    def test_other_endpoints(self):
+        """Check that 404s from other endpoints aren't cached"""
+        self.assertIsNone(negative_tags("/photos/list.json"))
+        self.assertIsNone(negative_tags("/photo/1a/nextprevious.json"))
+        self.assertIsNone(negative_tags("/action/5/view.json"))
+
+class TestDirtiedTags(unittest.TestCase):
+    def test_photo_mutations(self):
+        """Check the tags dirtied by photo mutations"""
+        for action in ("update", "delete", "transform", "source/delete"):
+            self.assertEqual(dirtied_tags("/photo/1a/%s.json" % action, {}),
+                             set(["photo:1a", "photos", "tags",
+                                  "activities"]))
+        self.assertEqual(dirtied_tags("/photos/update.json",
+                                      {"ids": ["1a", Photo(None,
+                                                           {"id": "2b"})]}),
+                         set(["photo:1a", "photo:2b", "photos", "albums",
+                              "tags", "activities"]))
+        self.assertIn("albums", dirtied_tags("/photo/upload.json", {}))
+
+    def test_negative_mutations(self):
+        """Check the mutations that can resolve a cached 404"""
+        self.assertIn("404:photo", dirtied_tags("/photo/upload.json", {}))
+        self.assertIn("404:tag", dirtied_tags("/photo/upload.json", {}))
+        self.assertIn("404:tag", dirtied_tags("/photo/1a/update.json",
+                                              {"tagsAdd": "t1"}))
+        self.assertIn("404:tag", dirtied_tags("/photos/update.json",
+                                              {"ids": "1a", "tags": ["t1"]}))
+        self.assertNotIn("404:tag", dirtied_tags("/photo/1a/update.json",
+                                                 {"title": "Title"}))
+
+    def test_album_mutations(self):
+        """Check the tags dirtied by album mutations"""
+        self.assertEqual(dirtied_tags("/album/1/photo/add.json",
+                                      {"ids": "1a,2b"}),
+                         set(["album:1", "albums", "photos",
+                              "photo:1a", "photo:2b"]))
+        self.assertEqual(dirtied_tags("/album/1/cover/1a/update.json", {}),
+                         set(["album:1", "albums", "photos"]))
+        self.assertEqual(dirtied_tags("/album/create.json", {}),
+                         set(["albums", "404:album"]))
+        self.assertEqual(dirtied_tags("/album/1/delete.json", {}),
+                         set(["album:1", "albums", "photos", "photo-views"]))
+        self.assertNotIn("photo-views",
+                         dirtied_tags("/album/1/update.json", {}))
+
+    def test_tag_mutations(self):
+        """Check the tags dirtied by tag mutations"""
+        for action in ("update", "delete"):
+            self.assertEqual(dirtied_tags("/tag/t1/%s.json" % action, {}),
+                             set(["tag:t1", "tags", "photos",
+                                  "photo-views"]))
+        self.assertEqual(dirtied_tags("/tag/create.json", {"tag": "t1"}),
+                         set(["tags", "404:tag"]))
+
+    def test_action_mutations(self):
+        """Check the tags dirtied by action mutations"""
+        self.assertEqual(dirtied_tags("/action/1a/photo/create.json", {}),
+                         set(["photo:1a", "activities"]))
+        self.assertEqual(dirtied_tags("/action/5/delete.json", {}),
+                         set(["action:5", "activities"]))
+
+    def test_unknown(self):
+        """Check that unknown endpoints invalidate everything"""
+        self.assertEqual(dirtied_tags("/unknown.json", {}), set([ALL]))
@@ -0,0 +1,151 @@
+from __future__ import unicode_literals
+import os
+import json
+import shutil
+import tempfile
+import mock
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox.mirror import Mirror
+
+class TestMirror(unittest.TestCase):
+    test_host = "test.example.com"
+    test_oauth = {"consumer_key": "dummy",
+                  "consumer_secret": "dummy",
+                  "token": "dummy",
+                  "token_secret": "dummy"}
+    test_photos = [{"id": "1a", "tags": ["tag1", "tag2"], "albums": ["1"],
+                    "dateTaken": "30", "totalPages": 1, "totalRows": 3},
+                   {"id": "2b", "tags": ["tag2"], "albums": [],
+                    "dateTaken": "10", "totalPages": 1, "totalRows": 3},
+                   {"id": "3c", "tags": [], "albums": ["1"],
+                    "dateTaken": "20", "totalPages": 1, "totalRows": 3}]
+    test_albums = [{"id": "1", "name": "Album 1", "totalPages": 1}]
+    test_tags = [{"id": "tag1", "count": 1}, {"id": "tag2", "count": 2}]
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host,
+                                        **self.test_oauth)
+        self.mirror = Mirror(self.client)
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def _return_value(result, message="", code=200):
+        return {"message": message, "code": code, "result": result}
+
+    def _mock_get(self, endpoint, **kwds):
+        if endpoint == "/photos/list.json":
+            return self._return_value(self.test_photos)
+        if endpoint == "/albums/list.json":
+            return self._return_value(self.test_albums)
+        if endpoint == "/tags/list.json":
+            return self._return_value(self.test_tags)
+        raise AssertionError("Unexpected endpoint: %s" % endpoint)
+
+    def _sync(self):
+        with mock.patch.object(trovebox.Trovebox, "get",
+                               side_effect=self._mock_get):
+            self.mirror.sync()
+        self.client.configure(offline=self.mirror)
+
+    def test_sync(self):
+        """Check that sync stores the photos, albums and tags"""
+        self._sync()
+        self.assertEqual(len(self.mirror), 3)
+        self.assertIsNotNone(self.mirror.synced)
+
+    @mock.patch.object(trovebox.http.requests, "Session")
+    def test_offline_views(self, mock_session):
+        """Check that view calls are answered from the mirror"""
+        self._sync()
+        photo = self.client.photo.view("1a")
+        self.assertIsInstance(photo, trovebox.objects.photo.Photo)
+        self.assertEqual(photo.tags, ["tag1", "tag2"])
+        self.assertFalse(hasattr(photo, "totalPages"))
+        album = self.client.album.view("1", includeElements=True)
+        self.assertEqual(album.name, "Album 1")
+        self.assertEqual([photo.id for photo in album.photos], ["1a", "3c"])
+        with self.assertRaises(trovebox.Trovebox404Error):
+            self.client.photo.view("missing")
+        self.assertFalse(mock_session.called)
+
+    @mock.patch.object(trovebox.http.requests, "Session")
+    def test_offline_lists(self, mock_session):
+        """Check that list calls are answered from the mirror"""
+        self._sync()
+        self.assertEqual([photo.id for photo in self.client.photos.list()],
+                         ["1a", "2b", "3c"])
+        self.assertEqual([album.id for album in self.client.albums.list()],
+                         ["1"])
+        self.assertEqual([tag.id for tag in self.client.tags.list()],
+                         ["tag1", "tag2"])
+        self.assertFalse(mock_session.called)
+
+    def test_photo_list_options(self):
+        """Check that photo lists can be filtered, sorted and paginated"""
+        self._sync()
+        photos = self.client.photos.list(options={"album": "1"})
+        self.assertEqual([photo.id for photo in photos], ["1a", "3c"])
+        photos = self.client.photos.list(options={"tags": "tag1,tag2"})
+        self.assertEqual([photo.id for photo in photos], ["1a"])
+        photos = self.client.photos.list(sortBy="dateTaken,asc")
+        self.assertEqual([photo.id for photo in photos], ["2b", "3c", "1a"])
+
+        photos = self.client.photos.list(page=2, pageSize=2)
+        self.assertEqual([photo.id for photo in photos], ["3c"])
+        self.assertEqual(photos[0].totalPages, 2)
+        pages = list(self.client.photos.list_pages(page_size=2))
+        self.assertEqual([len(page) for page in pages], [2, 1])
+
+    def test_empty_list(self):
+        """Check that an empty list is handled"""
+        self._sync()
+        self.assertEqual(self.client.photos.list(options={"album": "2"}), [])
+
+    def test_mutations(self):
+        """Check that mutations raise TroveboxOfflineError"""
+        self._sync()
+        with self.assertRaises(trovebox.TroveboxOfflineError):
+            self.client.photo.update("1a", title="Title")
+
+    def test_unsupported(self):
+        """Check that unsupported endpoints raise TroveboxOfflineError"""
+        self._sync()
+        with self.assertRaises(trovebox.TroveboxOfflineError):
+            self.client.activities.list()
+
+    def test_unprocessed_response(self):
+        """Check that the raw JSON can be requested"""
+        self._sync()
+        result = json.loads(self.client.get("/photo/2b/view.json",
+                                            process_response=False))
+        self.assertEqual(result["result"]["id"], "2b")
+
+    def test_save_load(self):
+        """Check that the mirror can be saved and reloaded"""
+        self._sync()
+        path = os.path.join(self.temp_dir, "mirror.json")
+        self.mirror.save(path)
+        mirror = Mirror(path=path)
+        mirror.load()
+        self.assertEqual(mirror.synced, self.mirror.synced)
+        self.client.configure(offline=mirror)
+        self.assertEqual(self.client.photo.view("3c").dateTaken, "20")
+
+    def test_online(self):
+        """Check that clearing the offline option restores online mode"""
+        self._sync()
+        self.client.configure(offline=None)
+        with mock.patch.object(trovebox.http.requests,
+                               "Session") as mock_session:
+            mock_session.return_value.__enter__.return_value.get \
+                .side_effect = RuntimeError("online")
+            with self.assertRaises(RuntimeError):
+                self.client.photo.view("1a")
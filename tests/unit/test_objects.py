@@ -0,0 +1,278 @@
+from __future__ import unicode_literals
+import gc
+import copy
+import threading
+import mock
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox.objects.photo import Photo
+from trovebox.objects.album import Album
+
+class TestTroveboxObject(unittest.TestCase):
+    test_host = "test.example.com"
+    test_photo_dict = {"id": "1a", "title": "Test", "tags": ["tag1", "tag2"],
+                       "_private": "hidden"}
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host)
+
+    def test_fields_not_copied(self):
+        """Check that fields are served from the JSON dict, not copied"""
+        photo = Photo(self.client, dict(self.test_photo_dict))
+        self.assertEqual(photo.id, "1a")
+        self.assertEqual(photo.tags, ["tag1", "tag2"])
+        self.assertNotIn("id", photo.__dict__)
+        self.assertNotIn("tags", photo.__dict__)
+
+    def test_underscore_fields_ignored(self):
+        """Check that fields starting with an underscore aren't exposed"""
+        photo = Photo(self.client, dict(self.test_photo_dict))
+        self.assertFalse(hasattr(photo, "_private"))
+
+    def test_missing_field(self):
+        """Check that missing fields raise AttributeError"""
+        photo = Photo(self.client, {"id": "1a"})
+        self.assertEqual(photo.name, None)
+        self.assertFalse(hasattr(photo, "title"))
+        with self.assertRaises(AttributeError):
+            photo.title
+
+    def test_assigned_attribute_overrides_field(self):
+        """Check that assigned attributes take precedence until replaced"""
+        photo = Photo(self.client, dict(self.test_photo_dict))
+        photo.title = "Changed"
+        self.assertEqual(photo.title, "Changed")
+        self.assertEqual(photo.get_fields()["title"], "Test")
+        photo._replace_fields({"id": "2b", "title": "New"})
+        self.assertEqual(photo.id, "2b")
+        self.assertEqual(photo.title, "New")
+        self.assertFalse(hasattr(photo, "tags"))
+
+    def test_delete_fields(self):
+        """Check that deleting the fields resets id and name"""
+        photo = Photo(self.client, dict(self.test_photo_dict))
+        photo._delete_fields()
+        self.assertEqual(photo.id, None)
+        self.assertEqual(photo.name, None)
+        self.assertFalse(hasattr(photo, "title"))
+        self.assertEqual(photo.get_fields(), {})
+
+    def test_class_defaults(self):
+        """Check that subclass default fields are returned when missing"""
+        album = Album(self.client, {"id": "1"})
+        self.assertEqual(album.photos, None)
+        self.assertEqual(album.cover, None)
+
+    def test_dir(self):
+        """Check that the JSON fields are listed by dir()"""
+        photo = Photo(self.client, dict(self.test_photo_dict))
+        self.assertIn("title", dir(photo))
+        self.assertIn("update", dir(photo))
+        self.assertNotIn("_private", dir(photo))
+
+class TestChanges(unittest.TestCase):
+    test_host = "test.example.com"
+    test_photo_dict = {"id": "1a", "title": "Test", "tags": ["tag1", "tag2"],
+                       "description": "A long description"}
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host)
+        self.photo = Photo(self.client, dict(self.test_photo_dict))
+
+    def test_no_changes(self):
+        """Check that new objects have no changes"""
+        self.assertEqual(self.photo.get_changes(), {})
+        album = Album(self.client, {"id": "1", "cover": {"id": "1a"}})
+        self.assertEqual(album.get_changes(), {})
+
+    def test_changes(self):
+        """Check that assigned attributes are recorded as changes"""
+        self.photo.title = "New"
+        self.photo.permission = 1
+        self.assertEqual(self.photo.get_changes(),
+                         {"title": "New", "permission": 1})
+
+    def test_unchanged_value(self):
+        """Check that assigning the original value isn't a change"""
+        self.photo.title = "Test"
+        self.photo.tags = ["tag1", "tag2"]
+        self.assertEqual(self.photo.get_changes(), {})
+
+    def test_delete_attribute(self):
+        """Check that deleting an assigned attribute reverts the change"""
+        self.photo.title = "New"
+        del self.photo.title
+        self.assertEqual(self.photo.title, "Test")
+        self.assertEqual(self.photo.get_changes(), {})
+
+    def test_discard_changes(self):
+        """Check that changes can be discarded"""
+        self.photo.title = "New"
+        self.photo.discard_changes()
+        self.assertEqual(self.photo.title, "Test")
+        self.assertEqual(self.photo.get_changes(), {})
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_save(self, mock_post):
+        """Check that save() only sends the changed fields"""
+        updated = dict(self.test_photo_dict, title="New")
+        mock_post.return_value = {"message": "", "code": 200,
+                                  "result": updated}
+        self.photo.title = "New"
+        self.assertTrue(self.photo.save(foo="bar"))
+        mock_post.assert_called_with("/photo/1a/update.json", title="New",
+                                     foo="bar")
+        self.assertEqual(self.photo.title, "New")
+        self.assertNotIn("title", self.photo.__dict__)
+        self.assertEqual(self.photo.get_changes(), {})
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_save_unchanged(self, mock_post):
+        """Check that save() doesn't send a request if nothing changed"""
+        self.photo.title = "Test"
+        self.assertFalse(self.photo.save())
+        self.assertFalse(mock_post.called)
+
+class TestLazyLoading(unittest.TestCase):
+    test_host = "test.example.com"
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host)
+        self.photo = Photo(self.client, {"id": "1a", "title": "Old"})
+        self.loader = mock.Mock(return_value={"id": "1a", "title": "New"})
+
+    def test_lazy_load(self):
+        """Check that the loader is called when a field is first accessed"""
+        self.photo._set_loader(self.loader)
+        self.assertEqual(self.photo.id, "1a")
+        self.assertFalse(self.loader.called)
+        self.assertEqual(self.photo.title, "New")
+        self.assertFalse(hasattr(self.photo, "description"))
+        self.assertEqual(self.loader.call_count, 1)
+
+    def test_lazy_get_fields(self):
+        """Check that get_fields loads the fields"""
+        self.photo._set_loader(self.loader)
+        self.assertEqual(self.photo.get_fields(), {"id": "1a", "title": "New"})
+
+    def test_lazy_load_failure(self):
+        """Check that a failed load is retried on the next access"""
+        self.loader.side_effect = [trovebox.TroveboxError("Failed"),
+                                   {"id": "1a", "title": "New"}]
+        self.photo._set_loader(self.loader)
+        with self.assertRaises(trovebox.TroveboxError):
+            self.photo.title
+        self.assertEqual(self.photo.title, "New")
+
+    def test_lazy_load_threads(self):
+        """Check that concurrent readers wait for a single load"""
+        started = threading.Event()
+        release = threading.Event()
+        def loader():
+            started.set()
+            release.wait(5)
+            return {"id": "1a", "title": "New"}
+        self.loader.side_effect = loader
+        self.photo._set_loader(self.loader)
+        results = []
+        def read():
+            results.append(self.photo.title)
+        threads = [threading.Thread(target=read) for _ in range(2)]
+        threads[0].start()
+        started.wait(5)
+        threads[1].start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["New", "New"])
+        self.assertEqual(self.loader.call_count, 1)
+
+    def test_lazy_load_keeps_changes(self):
+        """Check that loading the fields keeps unsaved changes"""
+        self.photo._set_loader(self.loader, keep_fields=True)
+        self.photo.title = "Edited"
+        self.assertFalse(hasattr(self.photo, "description"))
+        self.assertEqual(self.loader.call_count, 1)
+        self.assertEqual(self.photo.get_changes(), {"title": "Edited"})
+
+    def test_lazy_album(self):
+        """Check that lazily loaded album fields are converted to objects"""
+        album = Album(self.client, {"id": "1"})
+        album._set_loader(lambda: {"id": "1", "cover": {"id": "1a"}})
+        self.assertIsInstance(album.cover, Photo)
+
+class TestIdentityMap(unittest.TestCase):
+    test_host = "test.example.com"
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host)
+        self.client.configure(identity_map=True)
+
+    def test_disabled_by_default(self):
+        """Check that objects aren't shared unless enabled"""
+        client = trovebox.Trovebox(host=self.test_host)
+        self.assertIsNot(Photo(client, {"id": "1a"}),
+                         Photo(client, {"id": "1a"}))
+
+    def test_same_instance(self):
+        """Check that objects with the same id are the same instance"""
+        photo = Photo(self.client, {"id": "1a", "title": "Old",
+                                    "tags": ["tag1"]})
+        other = Photo(self.client, {"id": "1a", "title": "New"})
+        self.assertIs(other, photo)
+        self.assertEqual(photo.title, "New")
+        # Fields missing from the new dict are retained
+        self.assertEqual(photo.tags, ["tag1"])
+
+    def test_refresh_keeps_changes(self):
+        """Check that refreshing an object keeps its unsaved changes"""
+        photo = Photo(self.client, {"id": "1a", "title": "Old"})
+        photo.title = "Edited"
+        Photo(self.client, {"id": "1a", "title": "New"})
+        self.assertEqual(photo.title, "Edited")
+        self.assertEqual(photo.get_changes(), {"title": "Edited"})
+        photo.discard_changes()
+        self.assertEqual(photo.title, "New")
+
+    def test_types_are_separate(self):
+        """Check that objects of different types don't collide"""
+        photo = Photo(self.client, {"id": "1"})
+        album = Album(self.client, {"id": "1"})
+        self.assertIsNot(photo, album)
+        self.assertIs(Album(self.client, {"id": "1"}), album)
+
+    def test_album_photos(self):
+        """Check that photos within albums share the identity map"""
+        photo = Photo(self.client, {"id": "1a"})
+        album = Album(self.client, {"id": "1", "cover": {"id": "1a"},
+                                    "photos": [{"id": "1a", "title": "T"}]})
+        self.assertIs(album.cover, photo)
+        self.assertIs(album.photos[0], photo)
+        self.assertEqual(photo.title, "T")
+
+    def test_weak_references(self):
+        """Check that unreferenced objects are removed from the map"""
+        Photo(self.client, {"id": "1a"})
+        gc.collect()
+        self.assertEqual(len(self.client._identity_map), 0)
+
+    def test_deleted_objects_removed(self):
+        """Check that deleted objects are removed from the map"""
+        photo = Photo(self.client, {"id": "1a"})
+        photo._delete_fields()
+        self.assertIsNot(Photo(self.client, {"id": "1a"}), photo)
+
+    def test_disable(self):
+        """Check that the identity map can be disabled again"""
+        photo = Photo(self.client, {"id": "1a"})
+        self.client.configure(identity_map=False)
+        self.assertIsNot(Photo(self.client, {"id": "1a"}), photo)
+
+    def test_copy(self):
+        """Check that objects can still be copied"""
+        photo = Photo(self.client, {"id": "1a", "title": "T"})
+        self.assertEqual(copy.copy(photo).title, "T")
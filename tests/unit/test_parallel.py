@@ -0,0 +1,65 @@
+from __future__ import unicode_literals
+import threading
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+from trovebox.parallel import run_parallel
+
+class TestRunParallel(unittest.TestCase):
+    def test_results(self):
+        """Check that a result is yielded for every item"""
+        result = run_parallel(lambda item: item * 2, range(20), workers=4)
+        self.assertEqual(sorted((item, value) for item, value, _ in result),
+                         [(i, i * 2) for i in range(20)])
+
+    def test_serial(self):
+        """Check that items are processed in order by a single worker"""
+        result = list(run_parallel(lambda item: item, range(5), workers=1))
+        self.assertEqual(result, [(i, i, None) for i in range(5)])
+
+    def test_errors(self):
+        """Check that exceptions are returned, not raised"""
+        def func(item):
+            if item == 3:
+                raise ValueError(item)
+            return item
+        for workers in (1, 4):
+            errors = [(item, error) for item, _, error
+                      in run_parallel(func, range(5), workers)
+                      if error is not None]
+            self.assertEqual(len(errors), 1)
+            self.assertEqual(errors[0][0], 3)
+            self.assertIsInstance(errors[0][1], ValueError)
+
+    def test_concurrency(self):
+        """Check that items are processed concurrently"""
+        started = dict((item, threading.Event()) for item in (1, 2))
+        def func(item):
+            # Each item waits until the other has started
+            started[item].set()
+            started[3 - item].wait(5)
+            return started[3 - item].is_set()
+        result = list(run_parallel(func, [1, 2], workers=2))
+        self.assertEqual([value for _, value, _ in result], [True, True])
+
+    def test_generator(self):
+        """Check that generators are consumed lazily"""
+        consumed = []
+        def generate():
+            for i in range(100):
+                consumed.append(i)
+                yield i
+        results = run_parallel(lambda item: item, generate(), workers=2)
+        next(results)
+        results.close()
+        self.assertLess(len(consumed), 100)
+
+    def test_iterator_error(self):
+        """Check that an exception raised by the iterable is re-raised"""
+        def generate():
+            yield 1
+            raise KeyError("broken")
+        with self.assertRaises(KeyError):
+            list(run_parallel(lambda item: item, generate(), workers=2))
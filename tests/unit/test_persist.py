@@ -0,0 +1,31 @@
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+from trovebox.persist import save_json, load_json
+
+class TestPersist(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "state.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_save_load(self):
+        """Check that non-ASCII data survives a round trip"""
+        save_json(self.path, {"title": "\xfcber", "ids": ["1a"]})
+        self.assertEqual(load_json(self.path),
+                         {"title": "\xfcber", "ids": ["1a"]})
+
+    def test_replace(self):
+        """Check that an existing file is replaced"""
+        save_json(self.path, {"version": 1})
+        save_json(self.path, {"version": 2})
+        self.assertEqual(load_json(self.path), {"version": 2})
+        self.assertEqual(os.listdir(self.temp_dir), ["state.json"])
@@ -0,0 +1,95 @@
+from __future__ import unicode_literals
+import math
+import mock
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox import photo_table
+from trovebox.photo_table import PhotoTable
+
+class TestPhotoTable(unittest.TestCase):
+    test_host = "test.example.com"
+    column_types = {"id": "str", "size": "int", "width": "float",
+                    "tags": "list"}
+    test_pages = [[{"id": "1a", "size": "100", "width": "640",
+                    "tags": ["tag1", "tag2"], "totalPages": 2},
+                   {"id": "2b", "size": "300", "tags": ["tag2"],
+                    "totalPages": 2}],
+                  [{"id": "3c", "size": "", "width": "1024.5",
+                    "tags": "tag3,tag1", "totalPages": 2}]]
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host)
+        self.table = PhotoTable.from_pages(self.test_pages, self.column_types)
+
+    @staticmethod
+    def _return_value(result, message="", code=200):
+        return {"message": message, "code": code, "result": result}
+
+    def test_columns(self):
+        """Check that each field is converted into its column type"""
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(self.table.column("id"), ["1a", "2b", "3c"])
+        self.assertEqual(list(self.table.column("size")), [100, 300, 0])
+        self.assertEqual(self.table.column("size").typecode, "l")
+        width = self.table.column("width")
+        self.assertEqual(width[0], 640.0)
+        self.assertTrue(math.isnan(width[1]))
+        self.assertEqual(self.table.column("tags"),
+                         [("tag1", "tag2"), ("tag2",), ("tag3", "tag1")])
+
+    def test_unknown_column_type(self):
+        """Check that an unknown column type raises an exception"""
+        with self.assertRaises(ValueError):
+            PhotoTable({"id": "object"})
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_from_client(self, mock_get):
+        """Check that a table can be populated directly from the API"""
+        mock_get.side_effect = [self._return_value(page)
+                                for page in self.test_pages]
+        table = PhotoTable.from_client(self.client, options={"album": "1"},
+                                       columns=self.column_types)
+        mock_get.assert_called_with("/photos/album-1/list.json", page=2)
+        self.assertEqual(table.column("id"), ["1a", "2b", "3c"])
+
+    def test_filter(self):
+        """Check that rows can be filtered by column value"""
+        table = self.table.filter("size", lambda size: size >= 100)
+        self.assertEqual(table.column("id"), ["1a", "2b"])
+        self.assertEqual(list(table.column("size")), [100, 300])
+
+    def test_select_length_mismatch(self):
+        """Check that a mask of the wrong length raises an exception"""
+        with self.assertRaises(ValueError):
+            self.table.select([True])
+
+    def test_take(self):
+        """Check that rows can be selected by index"""
+        table = self.table.take([2, 0])
+        self.assertEqual(table.column("id"), ["3c", "1a"])
+
+    def test_group_by(self):
+        """Check that rows can be grouped by a list column"""
+        self.assertEqual(self.table.group_by("tags"),
+                         {"tag1": [0, 2], "tag2": [0, 1], "tag3": [2]})
+        self.assertEqual(self.table.count_by("size"), {100: 1, 300: 1, 0: 1})
+
+    def test_lengths(self):
+        """Check that the number of tags per photo can be calculated"""
+        self.assertEqual(list(self.table.lengths("tags")), [2, 1, 2])
+
+    def test_to_dict(self):
+        """Check that the table can be converted to a dict of lists"""
+        result = self.table.to_dict()
+        self.assertEqual(result["size"], [100, 300, 0])
+        self.assertEqual(result["id"], ["1a", "2b", "3c"])
+
+    @mock.patch.object(photo_table, "numpy", None)
+    def test_numpy_missing(self):
+        """Check that as_numpy raises an exception if NumPy is missing"""
+        with self.assertRaises(ImportError):
+            self.table.column("size", as_numpy=True)
@@ -1,6 +1,8 @@
 from __future__ import unicode_literals
 import os
 import base64
+import shutil
+import tempfile
 import mock
 try:
     import unittest2 as unittest # Python2.6
@@ -8,6 +10,7 @@ except ImportError:
     import unittest
 
 import trovebox
+from trovebox.bulk import BulkResult
 
 class TestPhotos(unittest.TestCase):
     test_host = "test.example.com"
@@ -68,6 +71,69 @@ class TestPhotosList(TestPhotos):
                        ("/photos/test1-%C3%BCmlaut/foo-bar/list.json",)])
         self.assertEqual(mock_get.call_args[1], {"foo": "bar"})
 
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_options_canonical_order(self, mock_get):
+        """Check that equal options always produce the same endpoint"""
+        mock_get.return_value = self._return_value(self.test_photos_dict)
+        options = {"tags": "t1", "album": "1", "page": 2}
+        self.client.photos.list(options=options)
+        mock_get.assert_called_with("/photos/album-1/page-2/tags-t1/list.json")
+        # Memoized option strings must not be affected by later changes
+        options["tags"] = "t2"
+        self.client.photos.list(options=options)
+        mock_get.assert_called_with("/photos/album-1/page-2/tags-t2/list.json")
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_options_equal_values(self, mock_get):
+        """Check that equal values of different types aren't confused"""
+        mock_get.return_value = self._return_value(self.test_photos_dict)
+        self.client.photos.list(options={"a": 1})
+        mock_get.assert_called_with("/photos/a-1/list.json")
+        self.client.photos.list(options={"a": True})
+        mock_get.assert_called_with("/photos/a-True/list.json")
+        self.client.photos.list(options={"a": 1.0})
+        mock_get.assert_called_with("/photos/a-1.0/list.json")
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_options_unhashable(self, mock_get):
+        """Check that unhashable option values are supported"""
+        mock_get.return_value = self._return_value(self.test_photos_dict)
+        self.client.photos.list(options={"tags": ["t1"]})
+        mock_get.assert_called_with("/photos/tags-%5B%27t1%27%5D/list.json")
+
+class TestPhotosListPages(TestPhotos):
+    test_pages = [[{"id": "1a", "totalPages": 2}, {"id": "2b", "totalPages": 2}],
+                  [{"id": "3c", "totalPages": 2}]]
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_list_pages(self, mock_get):
+        """Check that each page of the photo list is requested in turn"""
+        mock_get.side_effect = [self._return_value(page)
+                                for page in self.test_pages]
+        result = list(self.client.photos.list_pages(options={"tags": "t1"},
+                                                    page_size=2, foo="bar"))
+        self.assertEqual(result, self.test_pages)
+        self.assertEqual(mock_get.call_args_list,
+                         [mock.call("/photos/tags-t1/list.json", page=1,
+                                    pageSize=2, foo="bar"),
+                          mock.call("/photos/tags-t1/list.json", page=2,
+                                    pageSize=2, foo="bar")])
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_list_pages_empty(self, mock_get):
+        """Check that an empty photo list yields no pages"""
+        mock_get.return_value = self._return_value([{"totalRows": 0}])
+        self.assertEqual(list(self.client.photos.list_pages()), [])
+        mock_get.assert_called_once_with("/photos/list.json", page=1)
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    def test_iterate(self, mock_get):
+        """Check that Photo objects are yielded for every page"""
+        mock_get.side_effect = [self._return_value(page)
+                                for page in self.test_pages]
+        result = list(self.client.photos.iterate())
+        self.assertEqual([photo.id for photo in result], ["1a", "2b", "3c"])
+
 class TestPhotosShare(TestPhotos):
     @mock.patch.object(trovebox.Trovebox, 'post')
     def test_photos_share(self, mock_post):
@@ -99,6 +165,70 @@ class TestPhotosUpdate(TestPhotos):
                                      ids=["1a", "2b"], title="Test")
         self.assertEqual(result, True)
 
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_update_chunked(self, mock_post):
+        """Check that long lists of photos are updated in chunks"""
+        mock_post.return_value = self._return_value(True)
+        ids = ["%d" % i for i in range(5)]
+        result = self.client.photos.update(ids, chunk_size=2, title="Test")
+        self.assertEqual(result, True)
+        self.assertEqual(mock_post.call_count, 3)
+        submitted = sorted(call[1]["ids"] for call in mock_post.call_args_list)
+        self.assertEqual(submitted, [["0", "1"], ["2", "3"], ["4"]])
+        for call in mock_post.call_args_list:
+            self.assertEqual(call[0], ("/photos/update.json",))
+            self.assertEqual(call[1]["title"], "Test")
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_update_max_bytes(self, mock_post):
+        """Check that chunks are limited by their encoded size"""
+        mock_post.return_value = self._return_value(True)
+        self.client.photos.update(self.test_photos + ["3c"], max_bytes=5,
+                                  workers=1, title="Test")
+        self.assertEqual([call[1]["ids"] for call in mock_post.call_args_list],
+                         [["1a", "2b"], ["3c"]])
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_update_partial_failure(self, mock_post):
+        """Check that failed chunks raise a TroveboxBulkError"""
+        def post(endpoint, ids, **kwds):
+            if "2b" in ids:
+                raise trovebox.TroveboxError("Failed")
+            return self._return_value(True)
+        mock_post.side_effect = post
+        with self.assertRaises(trovebox.TroveboxBulkError) as context:
+            self.client.photos.update(["1a", "2b", "3c"], chunk_size=1,
+                                      title="Test")
+        result = context.exception.result
+        self.assertEqual(sorted(result.succeeded), ["1a", "3c"])
+        self.assertEqual(result.failed, ["2b"])
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_update_chunked_report(self, mock_post):
+        """Check that update_chunked reports the outcome of each chunk"""
+        mock_post.side_effect = [self._return_value(True),
+                                 self._return_value(False)]
+        result = self.client.photos.update_chunked(iter(["1a", "2b"]),
+                                                   chunk_size=1, workers=1,
+                                                   title="Test")
+        self.assertEqual([chunk.ok for chunk in result.chunks], [True, False])
+        self.assertEqual(result.succeeded, ["1a"])
+        self.assertEqual(result.failed, ["2b"])
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_plan_update(self, mock_post):
+        """Check that a bulk update can be planned without requests"""
+        self.client._latencies["POST"].extend([0.2, 0.4])
+        plan = self.client.photos.plan_update(iter(["1a", "2b", "3c"]),
+                                              chunk_size=2, workers=1,
+                                              title="Test")
+        self.assertEqual(plan.endpoint, "/photos/update.json")
+        self.assertEqual(plan.chunk_sizes, [2, 1])
+        # "ids=1a%2C2b&title=Test" and "ids=3c&title=Test"
+        self.assertEqual(plan.payload_bytes, 22 + 17)
+        self.assertAlmostEqual(plan.estimated_seconds, 0.6)
+        self.assertFalse(mock_post.called)
+
 class TestPhotosDelete(TestPhotos):
     @mock.patch.object(trovebox.Trovebox, 'post')
     def test_photos_delete(self, mock_post):
@@ -118,6 +248,84 @@ class TestPhotosDelete(TestPhotos):
                                      ids=["1a", "2b"], foo="bar")
         self.assertEqual(result, True)
 
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_delete_chunked(self, mock_post):
+        """Check that long lists of photos are deleted in chunks"""
+        mock_post.return_value = self._return_value(True)
+        result = self.client.photos.delete(["1a", "2b", "3c"], chunk_size=2,
+                                           foo="bar")
+        self.assertEqual(result, True)
+        submitted = sorted(call[1]["ids"] for call in mock_post.call_args_list)
+        self.assertEqual(submitted, [["1a", "2b"], ["3c"]])
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_delete_partial_failure(self, mock_post):
+        """Check that failed chunks raise a TroveboxBulkError"""
+        def post(endpoint, ids, **kwds):
+            if "3c" in ids:
+                raise trovebox.TroveboxError("Failed")
+            return self._return_value(True)
+        mock_post.side_effect = post
+        with self.assertRaises(trovebox.TroveboxBulkError) as context:
+            self.client.photos.delete(["1a", "2b", "3c", "4d"], chunk_size=2)
+        self.assertEqual(context.exception.result.failed, ["3c", "4d"])
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_delete_report(self, mock_post):
+        """Check that delete_chunked isolates the ids that failed"""
+        def post(endpoint, ids, **kwds):
+            if "3c" in ids:
+                raise trovebox.TroveboxError("Failed")
+            return self._return_value(True)
+        mock_post.side_effect = post
+        ids = (photo_id for photo_id in ["1a", "2b", "3c", "4d", "5e"])
+        result = self.client.photos.delete_chunked(ids, chunk_size=4)
+        self.assertEqual(sorted(result.succeeded), ["1a", "2b", "4d", "5e"])
+        self.assertEqual(result.failed, ["3c"])
+        self.assertEqual(len(result.errors), 1)
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_delete_transient(self, mock_post):
+        """Check that chunks with transient failures aren't split"""
+        def post(endpoint, ids, **kwds):
+            if "3c" in ids:
+                raise trovebox.TroveboxError("HTTP Error 503: Unavailable")
+            return self._return_value(True)
+        mock_post.side_effect = post
+        result = self.client.photos.delete_chunked(
+            ["1a", "2b", "3c", "4d", "5e"], chunk_size=4)
+        self.assertEqual(result.succeeded, ["5e"])
+        self.assertEqual(result.failed, ["1a", "2b", "3c", "4d"])
+        self.assertEqual(mock_post.call_count, 2)
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_delete_resume(self, mock_post):
+        """Check that a saved report can be used to resume a delete"""
+        mock_post.side_effect = [trovebox.TroveboxError("Failed"),
+                                 self._return_value(True)]
+        result = self.client.photos.delete_chunked(["1a"], split_failed=False)
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "report.json")
+            result.save(path)
+            result = BulkResult.load(path)
+        finally:
+            shutil.rmtree(temp_dir)
+        self.assertEqual(result.failed, ["1a"])
+        self.assertEqual(result.to_dict()["errors"], ["Failed"])
+
+        result = self.client.photos.delete_chunked(result.failed)
+        self.assertEqual(result.succeeded, ["1a"])
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_plan_delete(self, mock_post):
+        """Check that a bulk delete can be planned without requests"""
+        plan = self.client.photos.plan_delete(self.test_photos, chunk_size=1)
+        self.assertEqual(plan.endpoint, "/photos/delete.json")
+        self.assertEqual(plan.requests, 2)
+        self.assertIsNone(plan.estimated_seconds)
+        self.assertFalse(mock_post.called)
+
 class TestPhotoDelete(TestPhotos):
     @mock.patch.object(trovebox.Trovebox, 'post')
     def test_photo_delete(self, mock_post):
@@ -422,6 +630,18 @@ class TestPhotoUpload(TestPhotos):
         self.assertEqual(files["photo"].name, self.test_file)
         self.assertEqual(result.get_fields(), self.test_photos_dict[0])
 
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photo_plan_upload(self, mock_post):
+        """Check that uploads can be planned without requests"""
+        plan = self.client.photo.plan_upload([self.test_file] * 3,
+                                             workers=2, title="Test")
+        self.assertEqual(plan.endpoint, "/photo/upload.json")
+        self.assertEqual(plan.requests, 3)
+        # "title=Test" is 10 bytes
+        self.assertEqual(plan.payload_bytes,
+                         3 * (os.path.getsize(self.test_file) + 10))
+        self.assertFalse(mock_post.called)
+
 class TestPhotoUploadEncoded(TestPhotos):
     @mock.patch.object(trovebox.Trovebox, 'post')
     def test_photo_upload_encoded(self, mock_post):
@@ -586,6 +806,74 @@ class TestPhotoTransform(TestPhotos):
         mock_post.assert_called_with("/photo/1a/transform.json", rotate="90")
         self.assertEqual(photo.get_fields(), self.test_photos_dict[1])
 
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photo_transform_view(self, mock_post, mock_get):
+        """Check that the photo is requested if it isn't returned"""
+        mock_post.return_value = self._return_value(True)
+        mock_get.return_value = self._return_value(self.test_photos_dict[1])
+        result = self.client.photo.transform("1a", rotate="90")
+        mock_get.assert_called_with("/photo/1a/view.json")
+        self.assertEqual(result.get_fields(), self.test_photos_dict[1])
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photo_transform_lazy(self, mock_post, mock_get):
+        """Check that the photo can be requested when it is first used"""
+        mock_post.return_value = self._return_value(True)
+        mock_get.return_value = self._return_value(self.test_photos_dict[0])
+        result = self.client.photo.transform("1a", fallback="lazy",
+                                             rotate="90")
+        mock_post.assert_called_with("/photo/1a/transform.json", rotate="90")
+        self.assertFalse(mock_get.called)
+        self.assertEqual(result.tags, ["tag1", "tag2"])
+        mock_get.assert_called_once_with("/photo/1a/view.json")
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photo_transform_none(self, mock_post, mock_get):
+        """Check that the photo request can be skipped"""
+        mock_post.return_value = self._return_value(True)
+        self.assertIsNone(self.client.photo.transform("1a", fallback="none",
+                                                      rotate="90"))
+        photo = self.test_photos[0]
+        photo.transform(fallback="none", rotate="90")
+        self.assertEqual(photo.get_fields(), self.test_photos_dict[0])
+        self.assertFalse(mock_get.called)
+
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_transform_many(self, mock_post):
+        """Check that many photos can be transformed concurrently"""
+        def post(endpoint, **kwds):
+            if endpoint == "/photo/3c/transform.json":
+                raise trovebox.TroveboxError("Failed")
+            photo_id = endpoint.split("/")[2]
+            return self._return_value({"id": photo_id})
+        mock_post.side_effect = post
+        photos = iter(self.test_photos + ["3c"])
+        result = self.client.photo.transform_many(photos, workers=2,
+                                                  rotate="90")
+        self.assertEqual(sorted(result.succeeded), ["1a", "2b"])
+        self.assertEqual(result.failed, ["3c"])
+        for chunk in result.chunks:
+            if chunk.ok:
+                self.assertEqual(chunk.result.id, chunk.ids[0])
+        for call in mock_post.call_args_list:
+            self.assertEqual(call[1], {"rotate": "90"})
+
+    @mock.patch.object(trovebox.Trovebox, 'get')
+    @mock.patch.object(trovebox.Trovebox, 'post')
+    def test_photos_transform_many_no_view(self, mock_post, mock_get):
+        """Check that the follow-up view request can be skipped"""
+        mock_post.return_value = self._return_value(True)
+        result = self.client.photo.transform_many(["1a", "2b"],
+                                                  fetch_view=False,
+                                                  rotate="90")
+        self.assertTrue(result.ok)
+        self.assertEqual([chunk.result for chunk in result.chunks],
+                         [True, True])
+        self.assertFalse(mock_get.called)
+
 class TestPhotoObject(TestPhotos):
     def test_photo_object_repr_without_id_or_name(self):
         """
@@ -0,0 +1,39 @@
+from __future__ import unicode_literals
+import mock
+import requests
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox.retry import is_transient, call_with_retries
+
+class TestRetry(unittest.TestCase):
+    def test_is_transient(self):
+        """Check which errors are considered transient"""
+        self.assertTrue(is_transient(requests.exceptions.ConnectionError()))
+        self.assertTrue(is_transient(requests.exceptions.Timeout()))
+        self.assertTrue(is_transient(trovebox.TroveboxError(
+            "HTTP Error 502: Bad Gateway")))
+        self.assertTrue(is_transient(trovebox.TroveboxError("Code 429: Slow")))
+        self.assertFalse(is_transient(trovebox.TroveboxError("Code 409: Dup")))
+        self.assertFalse(is_transient(trovebox.Trovebox404Error("404")))
+        self.assertFalse(is_transient(ValueError()))
+
+    @mock.patch("time.sleep")
+    def test_retries(self, mock_sleep):
+        """Check that transient errors are retried with backoff"""
+        error = trovebox.TroveboxError("Code 500: Error")
+        func = mock.Mock(side_effect=[error, error, "result"])
+        self.assertEqual(call_with_retries(func, retries=2, delay=1), "result")
+        self.assertEqual([call[0][0] for call in mock_sleep.call_args_list],
+                         [1, 2])
+
+    @mock.patch("time.sleep")
+    def test_retries_exhausted(self, _):
+        """Check that the final transient error is raised"""
+        func = mock.Mock(side_effect=trovebox.TroveboxError("Code 500: Error"))
+        with self.assertRaises(trovebox.TroveboxError):
+            call_with_retries(func, retries=2)
+        self.assertEqual(func.call_count, 3)
@@ -0,0 +1,122 @@
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import mock
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox.search_index import SearchIndex
+
+class TestSearchIndex(unittest.TestCase):
+    test_host = "test.example.com"
+    test_photos_dict = [{"id": "1a", "title": "Beach holiday",
+                         "description": "Sunset", "tags": ["beach", "Sun"],
+                         "dateTaken": "100", "dateUpdated": "1000",
+                         "totalPages": 1},
+                        {"id": "2b", "title": "Mountain hike",
+                         "tags": ["mountain", "sun"],
+                         "dateTaken": "200", "dateUpdated": "2000",
+                         "totalPages": 1},
+                        {"id": "3c", "title": "Holidays at home",
+                         "tags": "home,beach",
+                         "dateTaken": "300", "dateUpdated": "3000",
+                         "totalPages": 1}]
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host)
+        self.index = SearchIndex(self.client)
+        with mock.patch.object(trovebox.Trovebox, "get") as mock_get:
+            mock_get.return_value = self._return_value(self.test_photos_dict)
+            self.index.build()
+
+    @staticmethod
+    def _return_value(result, message="", code=200):
+        return {"message": message, "code": code, "result": result}
+
+    def test_build(self):
+        """Check that every photo is indexed"""
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.high_water, 3000)
+        self.assertEqual(self.index.search(), ["1a", "2b", "3c"])
+
+    @mock.patch.object(trovebox.Trovebox, "get")
+    def test_search_during_build(self, mock_get):
+        """Check that searches use the old index while rebuilding"""
+        results = []
+        def get(*args, **kwds):
+            # Searching during the request mustn't block
+            results.append(self.index.search(tags=["mountain"]))
+            return self._return_value([self.test_photos_dict[0]])
+        mock_get.side_effect = get
+        self.index.build()
+        self.assertEqual(results, [["2b"]])
+        self.assertEqual(self.index.search(), ["1a"])
+        self.assertEqual(self.index.high_water, 1000)
+
+    def test_tags(self):
+        """Check searching by tag combinations"""
+        self.assertEqual(self.index.search(tags=["sun"]), ["1a", "2b"])
+        self.assertEqual(self.index.search(tags=["sun", "beach"]), ["1a"])
+        self.assertEqual(self.index.search(any_tags=["mountain", "home"]),
+                         ["2b", "3c"])
+        self.assertEqual(self.index.search(tags=["missing"]), [])
+
+    def test_text(self):
+        """Check searching by title/description words"""
+        self.assertEqual(self.index.search(text="sunset"), ["1a"])
+        self.assertEqual(self.index.search(text="holi"), ["1a", "3c"])
+        self.assertEqual(self.index.search(text="Beach holi"), ["1a"])
+
+    def test_dates(self):
+        """Check searching by date range"""
+        self.assertEqual(self.index.search(date_from=150), ["2b", "3c"])
+        self.assertEqual(self.index.search(date_from=100, date_to=200),
+                         ["1a", "2b"])
+        with self.assertRaises(ValueError):
+            self.index.search(date_field="dateUpdated", date_from=1)
+
+    def test_as_objects(self):
+        """Check that Photo objects can be returned"""
+        result = self.index.search(tags=["mountain"], as_objects=True)
+        self.assertEqual(result[0].id, "2b")
+        self.assertEqual(result[0].title, "Mountain hike")
+
+    @mock.patch.object(trovebox.Trovebox, "get")
+    def test_refresh(self, mock_get):
+        """Check that only recently updated photos are re-indexed"""
+        updated = dict(self.test_photos_dict[0], dateUpdated="4000",
+                       tags=["forest"], totalPages=3)
+        mock_get.return_value = self._return_value(
+            [updated, dict(self.test_photos_dict[2], totalPages=3),
+             dict(self.test_photos_dict[1], totalPages=3)])
+        self.assertEqual(self.index.refresh(), 2)
+        mock_get.assert_called_once_with("/photos/list.json", page=1,
+                                         sortBy="dateUpdated,desc")
+        self.assertEqual(self.index.search(tags=["beach"]), ["3c"])
+        self.assertEqual(self.index.search(tags=["forest"]), ["1a"])
+        self.assertEqual(self.index.high_water, 4000)
+
+    def test_attached_delete(self):
+        """Check that photos deleted through the client are removed"""
+        self.index.attach()
+        self.client._notify_mutation("/photo/1a/delete.json", {})
+        self.client._notify_mutation("/photos/delete.json", {"ids": ["2b"]})
+        self.assertEqual(self.index.search(), ["3c"])
+        self.assertEqual(self.index.search(text="sunset"), [])
+
+    def test_save_load(self):
+        """Check that the index can be persisted"""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, "search.json")
+            self.index.save(path)
+            index = SearchIndex(self.client, path=path)
+            index.load()
+        finally:
+            shutil.rmtree(temp_dir)
+        self.assertEqual(index.high_water, 3000)
+        self.assertEqual(index.search(tags=["sun"], text="hike"), ["2b"])
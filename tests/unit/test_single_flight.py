@@ -0,0 +1,169 @@
+from __future__ import unicode_literals
+import json
+import time
+import threading
+import mock
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox.cache import ResponseCache
+from trovebox.single_flight import SingleFlight
+
+class TestSingleFlight(unittest.TestCase):
+    def _run_concurrently(self, single_flight, key, func, count=5):
+        """
+        Call func via single_flight from several threads, while the
+        first call is blocked. Returns a list of results/exceptions.
+        """
+        results = []
+        def caller():
+            try:
+                results.append(single_flight.call(key, func))
+            except Exception as error:
+                results.append(error)
+        threads = [threading.Thread(target=caller) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def test_coalesced(self):
+        """Check that concurrent calls share a single result"""
+        single_flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+        def func():
+            calls.append(1)
+            release.wait(5)
+            return "result"
+
+        threads, results = self._run_concurrently(single_flight, "key", func)
+        # Wait until all the other callers are waiting on the first
+        while not calls:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["result"] * 5)
+        self.assertEqual(single_flight.in_flight(), 0)
+        self.assertLessEqual(len(calls), 5)
+
+    def test_shared_exception(self):
+        """Check that waiters receive the same exception"""
+        single_flight = SingleFlight()
+        release = threading.Event()
+        error = trovebox.TroveboxError("failed")
+        def func():
+            release.wait(5)
+            raise error
+
+        threads, results = self._run_concurrently(single_flight, "key", func,
+                                                  count=3)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [error] * 3)
+
+    def test_sequential_calls(self):
+        """Check that calls after completion aren't coalesced"""
+        single_flight = SingleFlight()
+        func = mock.Mock(return_value="result")
+        single_flight.call("key", func)
+        single_flight.call("key", func)
+        self.assertEqual(func.call_count, 2)
+
+    def test_different_keys(self):
+        """Check that calls with different keys aren't coalesced"""
+        single_flight = SingleFlight()
+        self.assertEqual(single_flight.call("a", lambda: 1), 1)
+        self.assertEqual(single_flight.call("b", lambda: 2), 2)
+
+class TestHttpCoalescing(unittest.TestCase):
+    test_host = "test.example.com"
+    test_data = {"message": "", "code": 200, "result": {"id": "1a"}}
+
+    @mock.patch.object(trovebox.http.requests, 'Session')
+    def test_coalesced_gets(self, mock_session):
+        """Check that concurrent identical GETs share one request"""
+        release = threading.Event()
+        started = threading.Event()
+        def get(*args, **kwds):
+            started.set()
+            release.wait(5)
+            response = mock.Mock(status_code=200,
+                                 text=json.dumps(self.test_data))
+            response.json.side_effect = lambda: json.loads(response.text)
+            return response
+        session = mock_session.return_value.__enter__.return_value
+        session.get.side_effect = get
+
+        client = trovebox.Trovebox(host=self.test_host)
+        client.configure(coalesce_requests=True)
+        results = []
+        threads = [threading.Thread(
+            target=lambda: results.append(client.get("/photo/1a/view.json")))
+                   for _ in range(4)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        # Give the other threads time to join the in-flight request
+        time.sleep(0.1)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, [self.test_data] * 4)
+        # Each caller has its own copy of the result
+        self.assertIsNot(results[0], results[1])
+        self.assertLess(session.get.call_count, 4)
+
+    @mock.patch.object(trovebox.http.requests, 'Session')
+    def test_no_coalescing_across_mutations(self, mock_session):
+        """
+        Check that a GET after a POST doesn't share a request that
+        started before the POST, and that its response isn't cached
+        """
+        release = threading.Event()
+        started = threading.Event()
+        def response(data):
+            result = mock.Mock(status_code=200, text=json.dumps(data),
+                               headers={})
+            result.json.side_effect = lambda: json.loads(result.text)
+            return result
+        old_data = self.test_data
+        new_data = {"message": "", "code": 200,
+                    "result": {"id": "1a", "title": "New"}}
+        def get(*args, **kwds):
+            if not started.is_set():
+                started.set()
+                release.wait(5)
+                return response(old_data)
+            return response(new_data)
+        session = mock_session.return_value.__enter__.return_value
+        session.get.side_effect = get
+        session.post.return_value = response(new_data)
+
+        cache = ResponseCache()
+        client = trovebox.Trovebox(host=self.test_host,
+                                   consumer_key="dummy",
+                                   consumer_secret="dummy",
+                                   token="dummy", token_secret="dummy")
+        client.configure(coalesce_requests=True, cache=cache)
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(client.get("/photo/1a/view.json")))
+        thread.start()
+        started.wait(5)
+        client.post("/photo/1a/update.json", title="New")
+        self.assertEqual(client.get("/photo/1a/view.json"), new_data)
+        release.set()
+        thread.join()
+
+        self.assertEqual(results, [old_data])
+        self.assertEqual(session.get.call_count, 2)
+        # The response that started before the POST wasn't cached
+        self.assertEqual(client.get("/photo/1a/view.json"), new_data)
+        self.assertEqual(session.get.call_count, 2)
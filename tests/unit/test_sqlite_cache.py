@@ -0,0 +1,224 @@
+from __future__ import unicode_literals
+import os
+import json
+import shutil
+import tempfile
+import sqlite3
+import threading
+import mock
+import httpretty
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox.cache import CacheEntry
+from trovebox.sqlite_cache import SQLiteCache
+from trovebox.invalidation import ALL
+
+class TestSQLiteCache(unittest.TestCase):
+    test_host = "test.example.com"
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "cache.db")
+        self.cache = SQLiteCache(self.path)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.temp_dir)
+
+    @staticmethod
+    def _entry(endpoint="/photo/1a/view.json", body="body",
+               expires=float("inf"), **kwds):
+        return CacheEntry(endpoint, body, expires, **kwds)
+
+    def test_get_set(self):
+        """Check that entries can be stored and retrieved"""
+        self.cache.set("a", self._entry(etag='"abc"'))
+        entry = self.cache.get("a")
+        self.assertEqual(entry.endpoint, "/photo/1a/view.json")
+        self.assertEqual(entry.body, "body")
+        self.assertEqual(entry.etag, '"abc"')
+        self.assertIsNone(entry.last_modified)
+        self.assertIsNone(self.cache.get("missing"))
+
+    def test_negative_entry(self):
+        """Check that the status of negative entries is stored"""
+        self.cache.set("a", self._entry(status=404))
+        self.assertEqual(self.cache.get("a").status, 404)
+        self.cache.set("b", self._entry())
+        self.assertEqual(self.cache.get("b").status, 200)
+
+    def test_upgrade(self):
+        """Check that databases without a status column are upgraded"""
+        self.cache.close()
+        os.remove(self.path)
+        connection = sqlite3.connect(self.path)
+        connection.execute("CREATE TABLE responses (key TEXT PRIMARY KEY, "
+                           "endpoint TEXT NOT NULL, object_type TEXT, "
+                           "object_id TEXT, body TEXT NOT NULL, "
+                           "expires REAL NOT NULL, etag TEXT, "
+                           "last_modified TEXT, stored REAL NOT NULL)")
+        connection.commit()
+        connection.close()
+        self.cache = SQLiteCache(self.path)
+        self.cache.set("a", self._entry(status=404))
+        self.assertEqual(self.cache.get("a").status, 404)
+
+    def test_statistics(self):
+        """Check that statistics are shared with other cache instances"""
+        self.cache.set("a", self._entry(tags=["photo:1a"]))
+        self.cache.set("b", self._entry(endpoint="/tags/list.json", expires=0))
+        self.assertIsNone(self.cache.get("b"))
+        self.cache.record("hits", "/photo/1a/view.json")
+        self.cache.invalidate(set(["photo:1a"]))
+        self.cache.set("c", self._entry(body="\xe9"))
+        other = SQLiteCache(self.path)
+        try:
+            other.record("hits", "/photo/2b/view.json")
+            other.close()
+            stats = self.cache.statistics()
+        finally:
+            other.close()
+        self.assertEqual(stats["entries"], 1)
+        self.assertEqual(stats["bytes"], 2)
+        self.assertEqual(stats["stores"], 3)
+        self.assertEqual(stats["expirations"], 1)
+        self.assertEqual(stats["invalidations"], 1)
+        self.assertEqual(stats["endpoints"]["/photo/*/view.json"]["hits"], 2)
+
+        self.cache.reset_statistics()
+        self.assertEqual(self.cache.statistics()["hits"], 0)
+
+    @mock.patch("time.time")
+    def test_eviction_statistics(self, mock_time):
+        """Check that evictions are counted"""
+        mock_time.return_value = 1000
+        self.cache.max_entries = 1
+        self.cache.set("a", self._entry())
+        self.cache.set("b", self._entry(expires=1000))
+        mock_time.return_value = 1001
+        self.cache.set("c", self._entry())
+        self.cache.evict()
+        stats = self.cache.statistics()
+        self.assertEqual(stats["expirations"], 1)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_shared(self):
+        """Check that entries are shared with other cache instances"""
+        self.cache.set("a", self._entry())
+        other = SQLiteCache(self.path)
+        try:
+            self.assertEqual(other.get("a").body, "body")
+        finally:
+            other.close()
+
+    @mock.patch("time.time")
+    def test_expiry(self, mock_time):
+        """Check that expired entries are only kept if they have validators"""
+        mock_time.return_value = 100
+        self.cache.set("a", self._entry(expires=110))
+        self.cache.set("b", self._entry(expires=110, last_modified="date"))
+        mock_time.return_value = 200
+        self.assertIsNone(self.cache.get("a"))
+        self.assertFalse(self.cache.get("b").is_fresh())
+        self.assertEqual(len(self.cache), 1)
+
+    def test_eviction(self):
+        """Check that the oldest entries are evicted"""
+        self.cache.max_entries = 5
+        with mock.patch("time.time") as mock_time:
+            for i in range(SQLiteCache.EVICTION_INTERVAL):
+                mock_time.return_value = i
+                self.cache.set("key%d" % i, self._entry())
+        self.assertEqual(len(self.cache), 5)
+        self.assertIsNone(self.cache.get("key0"))
+        self.assertIsNotNone(self.cache.get("key%d" %
+                                            (SQLiteCache.EVICTION_INTERVAL - 1)))
+
+    def test_delete_object(self):
+        """Check that entries can be deleted by object type and id"""
+        self.cache.set("a", self._entry("/photo/1a/view.json"))
+        self.cache.set("b", self._entry("/photo/1a/nextprevious.json"))
+        self.cache.set("c", self._entry("/photo/2b/view.json"))
+        self.cache.set("d", self._entry("/photos/list.json"))
+        self.cache.delete_object("photo", "1a")
+        self.assertEqual(len(self.cache), 2)
+        self.cache.delete("c")
+        self.assertEqual(len(self.cache), 1)
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_delete_object_tags(self):
+        """Check that deleting by object also deletes the entries' tags"""
+        self.cache.set("a", self._entry(tags=["photo:1a", "photos"]))
+        self.cache.set("b", self._entry("/photo/2b/view.json",
+                                        tags=["photo:2b", "photos"]))
+        self.cache.delete_object("photo", "1a")
+        connection = sqlite3.connect(self.path)
+        try:
+            rows = connection.execute(
+                "SELECT tag, key FROM response_tags ORDER BY tag").fetchall()
+        finally:
+            connection.close()
+        self.assertEqual(rows, [("photo:2b", "b"), ("photos", "b")])
+
+    def test_invalidate(self):
+        """Check that entries are invalidated by dependency tag"""
+        self.cache.set("a", self._entry(tags=["photo:1a"]))
+        self.cache.set("b", self._entry("/albums/list.json",
+                                        tags=["albums", "photos"]))
+        self.cache.set("c", self._entry("/tags/list.json", tags=["tags"]))
+        self.cache.invalidate(set(["photos"]))
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(len(self.cache), 2)
+
+        # Replacing an entry replaces its tags
+        self.cache.set("a", self._entry(tags=["other"]))
+        self.cache.invalidate(set(["photo:1a"]))
+        self.assertIsNotNone(self.cache.get("a"))
+
+        self.cache.invalidate(set([ALL]))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_threads(self):
+        """Check that the cache can be used from multiple threads"""
+        errors = []
+        def worker(index):
+            try:
+                for i in range(20):
+                    key = "%d-%d" % (index, i)
+                    self.cache.set(key, self._entry(body=key))
+                    self.assertEqual(self.cache.get(key).body, key)
+                self.cache.close()
+            except Exception as error:
+                errors.append(error)
+        threads = [threading.Thread(target=worker, args=(i,))
+                   for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.cache), 80)
+
+    @httpretty.activate
+    def test_client(self):
+        """Check that the client can use the SQLite cache"""
+        data = {"message": "", "code": 200, "result": {"id": "1a"}}
+        httpretty.register_uri(httpretty.GET,
+                               uri="http://%s/photo/1a/view.json" %
+                               self.test_host,
+                               body=json.dumps(data))
+        client = trovebox.Trovebox(host=self.test_host)
+        client.configure(cache=self.cache)
+        client.photo.view("1a")
+        httpretty.reset()
+
+        # A new client (eg. in another process) starts warm
+        client = trovebox.Trovebox(host=self.test_host)
+        client.configure(cache=SQLiteCache(self.path))
+        self.assertEqual(client.photo.view("1a").id, "1a")
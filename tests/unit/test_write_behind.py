@@ -0,0 +1,172 @@
+from __future__ import unicode_literals
+import threading
+import mock
+try:
+    import unittest2 as unittest # Python2.6
+except ImportError:
+    import unittest
+
+import trovebox
+from trovebox.objects.photo import Photo
+from trovebox.write_behind import UpdateQueue
+
+class TestUpdateQueue(unittest.TestCase):
+    test_host = "test.example.com"
+
+    def setUp(self):
+        self.client = trovebox.Trovebox(host=self.test_host)
+        self.queue = UpdateQueue(self.client, interval=None, workers=1)
+
+    @staticmethod
+    def _return_value(result, message="", code=200):
+        return {"message": message, "code": code, "result": result}
+
+    def test_last_write_wins(self):
+        """Check that the last value written to each field is kept"""
+        self.queue.update("1a", title="First", description="Desc")
+        self.queue.update(Photo(self.client, {"id": "1a"}), title="Second")
+        self.assertEqual(self.queue.pending(),
+                         {"1a": {"title": "Second", "description": "Desc"}})
+
+    def test_tag_operations(self):
+        """Check that added/removed tags are accumulated"""
+        self.queue.update("1a", tagsAdd="tag1,tag2")
+        self.queue.update("1a", tagsAdd=["tag3"], tagsRemove=["tag4"])
+        self.queue.update("1a", tagsRemove=["tag2"])
+        self.assertEqual(self.queue.pending(),
+                         {"1a": {"tagsAdd": ["tag1", "tag3"],
+                                 "tagsRemove": ["tag4", "tag2"]}})
+        self.queue.update("1a", tagsAdd=["tag4"])
+        self.assertEqual(self.queue.pending()["1a"]["tagsRemove"], ["tag2"])
+
+    def test_tag_replacement(self):
+        """Check that tag operations are applied to replaced tags"""
+        self.queue.update("1a", tagsAdd=["tag1"])
+        self.queue.update("1a", tags=["tag2", "tag3"])
+        self.queue.update("1a", tagsAdd=["tag4"], tagsRemove=["tag2"])
+        self.assertEqual(self.queue.pending(),
+                         {"1a": {"tags": ["tag3", "tag4"]}})
+
+    @mock.patch.object(trovebox.Trovebox, "post")
+    def test_flush(self, mock_post):
+        """Check that photos with the same fields are updated together"""
+        mock_post.return_value = self._return_value(True)
+        for photo_id in ("1a", "2b", "3c"):
+            self.queue.update(photo_id, tagsAdd=["tag1"])
+            self.queue.update(photo_id, permission=1)
+        self.queue.update("3c", title="Title")
+
+        result = self.queue.flush()
+        self.assertTrue(result.ok)
+        self.assertEqual(mock_post.call_count, 2)
+        calls = sorted((sorted(call[1]["ids"]), call[1].get("title"))
+                       for call in mock_post.call_args_list)
+        self.assertEqual(calls, [(["1a", "2b"], None), (["3c"], "Title")])
+        for call in mock_post.call_args_list:
+            self.assertEqual(call[0], ("/photos/update.json",))
+            self.assertEqual(call[1]["tagsAdd"], ["tag1"])
+            self.assertEqual(call[1]["permission"], 1)
+        self.assertEqual(self.queue.updates_received, 7)
+        self.assertEqual(self.queue.requests_sent, 2)
+        self.assertEqual(len(self.queue), 0)
+
+    @mock.patch.object(trovebox.Trovebox, "post")
+    def test_flush_failure(self, mock_post):
+        """Check that failed updates are reported"""
+        mock_post.side_effect = trovebox.TroveboxError("Failed")
+        reports = []
+        self.queue.on_flush = reports.append
+        self.queue.update("1a", title="Title")
+        with mock.patch.object(self.queue, "_logger") as logger:
+            result = self.queue.flush()
+        self.assertEqual(result.failed, ["1a"])
+        self.assertEqual(reports, [result])
+        self.assertTrue(logger.warning.called)
+
+    @mock.patch.object(trovebox.Trovebox, "post")
+    def test_flush_failure_requeued(self, mock_post):
+        """Check that failed updates are requeued beneath newer updates"""
+        mock_post.side_effect = trovebox.TroveboxError("Failed")
+        self.queue.update("1a", title="Title", tagsAdd=["tag1"])
+        with mock.patch.object(self.queue._logger, "warning") as warning:
+            self.queue.flush()
+        self.assertTrue(warning.called)
+        self.queue.update("1a", title="Newer")
+        self.assertEqual(self.queue.pending(),
+                         {"1a": {"title": "Newer", "tagsAdd": ["tag1"]}})
+
+        mock_post.side_effect = None
+        mock_post.return_value = self._return_value(True)
+        self.assertTrue(self.queue.flush().ok)
+        mock_post.assert_called_with("/photos/update.json", ids=["1a"],
+                                     title="Newer", tagsAdd=["tag1"])
+        self.assertEqual(len(self.queue), 0)
+
+    @mock.patch.object(trovebox.Trovebox, "post")
+    def test_flush_failure_max_attempts(self, mock_post):
+        """Check that updates are dropped after max_attempts failures"""
+        mock_post.side_effect = trovebox.TroveboxError("Failed")
+        self.queue.max_attempts = 2
+        self.queue.update("1a", title="Title")
+        with mock.patch.object(self.queue, "_logger") as logger:
+            self.queue.flush()
+            self.assertEqual(len(self.queue), 1)
+            self.queue.flush()
+        self.assertEqual(len(self.queue), 0)
+        self.assertTrue(logger.warning.called)
+        self.assertTrue(logger.error.called)
+        self.assertEqual(mock_post.call_count, 2)
+
+    def test_interval_errors_logged(self):
+        """Check that errors in periodic flushes don't stop the thread"""
+        flushed = threading.Event()
+        calls = []
+        def flush():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("Failed")
+            flushed.set()
+        queue = UpdateQueue(self.client, interval=0.01)
+        with mock.patch.object(queue, "flush", side_effect=flush):
+            with mock.patch.object(queue._logger, "exception") as exception:
+                queue.start()
+                flushed.wait(5)
+                self.assertTrue(flushed.is_set())
+                queue._stop.set()
+                queue._thread.join()
+        self.assertTrue(exception.called)
+
+    @mock.patch.object(trovebox.Trovebox, "post")
+    def test_max_pending(self, mock_post):
+        """Check that the queue is flushed when it's full"""
+        mock_post.return_value = self._return_value(True)
+        self.queue.max_pending = 2
+        self.queue.update("1a", title="Title")
+        self.assertFalse(mock_post.called)
+        self.queue.update("2b", title="Title")
+        mock_post.assert_called_once_with("/photos/update.json",
+                                          ids=mock.ANY, title="Title")
+
+    @mock.patch.object(trovebox.Trovebox, "post")
+    def test_interval(self, mock_post):
+        """Check that the queue is flushed periodically"""
+        flushed = threading.Event()
+        mock_post.return_value = self._return_value(True)
+        queue = UpdateQueue(self.client, interval=0.01,
+                            on_flush=lambda result: result.chunks and
+                            flushed.set())
+        with queue:
+            queue.update("1a", title="Title")
+            flushed.wait(5)
+            self.assertTrue(flushed.is_set())
+        mock_post.assert_called_once_with("/photos/update.json", ids=["1a"],
+                                          title="Title")
+
+    @mock.patch.object(trovebox.Trovebox, "post")
+    def test_stop_flushes(self, mock_post):
+        """Check that leaving the context flushes pending updates"""
+        mock_post.return_value = self._return_value(True)
+        with UpdateQueue(self.client, interval=60) as queue:
+            queue.update("1a", title="Title")
+        mock_post.assert_called_once_with("/photos/update.json", ids=["1a"],
+                                          title="Title")
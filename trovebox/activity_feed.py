@@ -0,0 +1,110 @@
+"""
+activity_feed.py : Incremental polling of the Trovebox activity list
+"""
+from __future__ import unicode_literals
+import os
+
+from trovebox.objects.activity import Activity
+from trovebox.fields import to_int
+from trovebox.persist import save_json, load_json
+
+class ActivityFeed(object):
+    """
+    Incremental feed of new activities.
+
+    The feed remembers a high-water mark (the most recent dateCreated,
+    and the ids of the activities seen with that timestamp).
+    Each poll only pages through the activity list until it reaches
+    activities that have already been seen, so the cost of a poll is
+    proportional to the number of new activities.
+
+    If cursor_file is specified, the cursor is loaded from this file
+    and saved back to it after each poll.
+    The options parameter can be used to narrow down the activities.
+    Eg: options={"type": "photo-upload"}
+    """
+    def __init__(self, client, options=None, cursor_file=None,
+                 page_size=None, **kwds):
+        self._client = client
+        self._options = options
+        self._page_size = page_size
+        self._kwds = kwds
+        self.cursor_file = cursor_file
+        self.cursor = None
+        if cursor_file is not None and os.path.exists(cursor_file):
+            self.load_cursor()
+
+    def poll(self):
+        """
+        Endpoint: /activities[/<options>]/list.json
+
+        Returns a list of the Activity objects created since the
+        last poll, oldest first, and advances the cursor past them.
+        If activities are created while the pages are being fetched,
+        the pages shift, so an activity may be listed twice - it is
+        only returned once.
+        """
+        new_activities = []
+        new_ids = set()
+        pages = self._client.activities.list_pages(self._options,
+                                                   self._page_size,
+                                                   **self._kwds)
+        for page in pages:
+            seen = False
+            for activity in page:
+                if self._is_new(activity):
+                    activity_id = str(activity["id"])
+                    if activity_id not in new_ids:
+                        new_ids.add(activity_id)
+                        new_activities.append(activity)
+                else:
+                    seen = True
+            # The list is ordered newest first, so there's no need to
+            # fetch any more pages once an old activity has been found
+            if seen:
+                break
+
+        new_activities.sort(key=_sort_key)
+        for activity in new_activities:
+            self._advance(activity)
+        if new_activities and self.cursor_file is not None:
+            self.save_cursor()
+
+        return [Activity(self._client, activity)
+                for activity in new_activities]
+
+    def _is_new(self, activity):
+        """ Returns True if the activity is newer than the cursor """
+        if self.cursor is None:
+            return True
+        date_created = _date_created(activity)
+        if date_created != self.cursor["dateCreated"]:
+            return date_created > self.cursor["dateCreated"]
+        return str(activity["id"]) not in self.cursor["ids"]
+
+    def _advance(self, activity):
+        """ Move the cursor forwards to include the activity """
+        date_created = _date_created(activity)
+        if self.cursor is None or date_created > self.cursor["dateCreated"]:
+            self.cursor = {"dateCreated": date_created, "ids": []}
+        if date_created == self.cursor["dateCreated"]:
+            self.cursor["ids"].append(str(activity["id"]))
+
+    def load_cursor(self):
+        """ Load the cursor from cursor_file """
+        self.cursor = load_json(self.cursor_file)
+
+    def save_cursor(self):
+        """ Save the cursor to cursor_file """
+        save_json(self.cursor_file, self.cursor)
+
+def _date_created(activity):
+    """
+    Returns the activity's dateCreated timestamp as an integer
+    (missing or invalid timestamps are 0)
+    """
+    return to_int(activity.get("dateCreated"), default=0)
+
+def _sort_key(activity):
+    """ Sort activities in the order they were created """
+    return (_date_created(activity), str(activity["id"]))
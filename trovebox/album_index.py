@@ -0,0 +1,179 @@
+"""
+album_index.py : Local index of album membership
+"""
+from __future__ import unicode_literals
+import re
+import threading
+
+from trovebox.parallel import run_parallel, DEFAULT_WORKERS
+from trovebox.persist import save_json, load_json
+from trovebox.fields import extract_id, split_ids
+
+_ALBUM_ADD_REMOVE = re.compile(
+    r"^/album/([^/]+)/photo/(add|remove)\.json$")
+_ALBUM_DELETE = re.compile(r"^/album/([^/]+)/delete\.json$")
+_PHOTO_DELETE = re.compile(r"^/photo/([^/]+)/delete\.json$")
+
+class AlbumIndex(object):
+    """
+    Local index of which photos are in which albums.
+
+    build() lists every album, then pages through each album's photos
+    concurrently. Once built, membership queries are local lookups.
+    If the index is attached to the client, it is kept up to date as
+    photos are added to/removed from albums through the client.
+    If path is specified, the index can be saved to/loaded from
+    this file.
+    """
+    def __init__(self, client, path=None, workers=DEFAULT_WORKERS,
+                 page_size=None):
+        self._client = client
+        self.path = path
+        self.workers = workers
+        self.page_size = page_size
+        self._album_photos = {}
+        self._photo_albums = {}
+        self._lock = threading.Lock()
+
+    def build(self):
+        """
+        Endpoints: /albums/list.json, /photos/album-<id>/list.json
+
+        (Re)build the index from the server.
+        """
+        album_ids = [album["id"]
+                     for page in self._client.albums.list_pages(self.page_size)
+                     for album in page]
+
+        album_photos = {}
+        for album_id, photo_ids, error in run_parallel(self._list_photo_ids,
+                                                       album_ids,
+                                                       self.workers):
+            if error is not None:
+                raise error
+            album_photos[album_id] = photo_ids
+
+        with self._lock:
+            self._set_albums(album_photos)
+
+    def _list_photo_ids(self, album_id):
+        """ Returns the set of all photo ids in the album """
+        pages = self._client.photos.list_pages({"album": album_id},
+                                               self.page_size)
+        return set(photo["id"] for page in pages for photo in page)
+
+    def _set_albums(self, album_photos):
+        """ Replace the index contents with the album->photos dict """
+        self._album_photos = album_photos
+        self._photo_albums = {}
+        for album_id, photo_ids in album_photos.items():
+            for photo_id in photo_ids:
+                self._photo_albums.setdefault(photo_id, set()).add(album_id)
+
+    def albums_for(self, photo):
+        """ Returns the set of album ids containing the photo """
+        with self._lock:
+            return set(self._photo_albums.get(str(extract_id(photo)), ()))
+
+    def photos_in(self, album):
+        """ Returns the set of photo ids in the album """
+        with self._lock:
+            return set(self._album_photos.get(str(extract_id(album)), ()))
+
+    def album_ids(self):
+        """ Returns the set of all indexed album ids """
+        with self._lock:
+            return set(self._album_photos)
+
+    def add(self, album, photos):
+        """ Record that the photos have been added to the album """
+        album_id = str(extract_id(album))
+        with self._lock:
+            album_photos = self._album_photos.setdefault(album_id, set())
+            for photo in photos:
+                photo_id = str(extract_id(photo))
+                album_photos.add(photo_id)
+                self._photo_albums.setdefault(photo_id, set()).add(album_id)
+
+    def remove(self, album, photos):
+        """ Record that the photos have been removed from the album """
+        album_id = str(extract_id(album))
+        with self._lock:
+            album_photos = self._album_photos.get(album_id, set())
+            for photo in photos:
+                photo_id = str(extract_id(photo))
+                album_photos.discard(photo_id)
+                self._discard_photo_album(photo_id, album_id)
+
+    def remove_album(self, album):
+        """ Record that the album has been deleted """
+        album_id = str(extract_id(album))
+        with self._lock:
+            for photo_id in self._album_photos.pop(album_id, ()):
+                self._discard_photo_album(photo_id, album_id)
+
+    def remove_photo(self, photo):
+        """ Record that the photo has been deleted """
+        photo_id = str(extract_id(photo))
+        with self._lock:
+            for album_id in self._photo_albums.pop(photo_id, ()):
+                self._album_photos[album_id].discard(photo_id)
+
+    def _discard_photo_album(self, photo_id, album_id):
+        """ Remove album_id from the photo->albums map """
+        albums = self._photo_albums.get(photo_id)
+        if albums is not None:
+            albums.discard(album_id)
+            if not albums:
+                del self._photo_albums[photo_id]
+
+    def attach(self):
+        """
+        Keep the index up to date with album/photo mutations
+        made through the client.
+        """
+        self._client.add_mutation_listener(self._on_mutation)
+
+    def detach(self):
+        """ Stop tracking mutations made through the client """
+        self._client.remove_mutation_listener(self._on_mutation)
+
+    def _on_mutation(self, endpoint, params):
+        """ Mutation listener: update the index after a successful POST """
+        match = _ALBUM_ADD_REMOVE.match(endpoint)
+        if match:
+            photo_ids = split_ids(params.get("ids"))
+            if match.group(2) == "add":
+                self.add(match.group(1), photo_ids)
+            else:
+                self.remove(match.group(1), photo_ids)
+            return
+
+        match = _ALBUM_DELETE.match(endpoint)
+        if match:
+            self.remove_album(match.group(1))
+            return
+
+        match = _PHOTO_DELETE.match(endpoint)
+        if match:
+            self.remove_photo(match.group(1))
+        elif endpoint == "/photos/delete.json":
+            for photo_id in split_ids(params.get("ids")):
+                self.remove_photo(photo_id)
+
+    def save(self, path=None):
+        """ Save the index to a JSON file """
+        path = path or self.path
+        with self._lock:
+            data = dict((album_id, sorted(photo_ids))
+                        for album_id, photo_ids in self._album_photos.items())
+        save_json(path, {"albums": data})
+
+    def load(self, path=None):
+        """ Load the index from a JSON file """
+        path = path or self.path
+        data = load_json(path)
+        album_photos = dict((album_id, set(photo_ids))
+                            for album_id, photo_ids in data["albums"].items())
+        with self._lock:
+            self._set_albums(album_photos)
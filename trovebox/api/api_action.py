@@ -2,6 +2,9 @@
 api_action.py : Trovebox Action API Classes
 """
 from trovebox.objects.action import Action
+from trovebox.parallel import run_parallel, DEFAULT_WORKERS
+from trovebox.retry import (call_with_retries, DEFAULT_RETRIES,
+                            DEFAULT_RETRY_DELAY)
 from .api_base import ApiBase
 
 class ApiAction(ApiBase):
@@ -30,6 +33,33 @@ class ApiAction(ApiBase):
                                    **kwds)["result"]
         return Action(self._client, result)
 
+    def create_many(self, records, workers=DEFAULT_WORKERS,
+                    retries=DEFAULT_RETRIES, retry_delay=DEFAULT_RETRY_DELAY):
+        """
+        Endpoint: /action/<target_id>/<target_type>/create.json
+
+        Generator which creates an action for each record in an iterable
+        of (target, target_type, fields) tuples, where fields is a dict
+        of parameters for create(). The target_type can be None if the
+        target is a Trovebox object.
+        Up to "workers" actions are created concurrently, and the records
+        are consumed lazily.
+        Requests that fail with a transient error (see
+        trovebox.retry.is_transient) are retried up to "retries" times.
+        Note that retrying after a timeout may create a duplicate action.
+        Yields a (record, action, error) tuple as each action completes,
+        where action is the created Action object (or None), and error
+        is the exception raised (or None).
+        """
+        def create(record):
+            """ Create a single action """
+            target, target_type, fields = record
+            return call_with_retries(
+                lambda: self.create(target, target_type, **fields),
+                retries, retry_delay)
+
+        return run_parallel(create, records, workers)
+
     def delete(self, action, **kwds):
         """
         Endpoint: /action/<id>/delete.json
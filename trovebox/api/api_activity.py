@@ -3,6 +3,7 @@ api_activity.py : Trovebox Activity API Classes
 """
 import json
 from trovebox.objects.activity import Activity
+from trovebox.activity_feed import ActivityFeed
 from .api_base import ApiBase
 
 class ApiActivities(ApiBase):
@@ -21,6 +22,29 @@ class ApiActivities(ApiBase):
         activities = self._result_to_list(activities)
         return [Activity(self._client, activity) for activity in activities]
 
+    def list_pages(self, options=None, page_size=None, **kwds):
+        """
+        Endpoint: /activities[/<options>]/list.json
+
+        Generator that requests every page of the activity list in turn,
+        yielding a list of raw activity dicts for each page.
+        The options parameter can be used to narrow down the activities.
+        Eg: options={"type": "photo-upload"}
+        """
+        option_string = self._build_option_string(options)
+        return self._list_pages("/activities%s/list.json" % option_string,
+                                page_size=page_size, **kwds)
+
+    def feed(self, options=None, cursor_file=None, page_size=None, **kwds):
+        """
+        Returns an ActivityFeed, which can be polled for the activities
+        created since the previous poll.
+        If cursor_file is specified, the feed's position is persisted
+        to this file between polls.
+        """
+        return ActivityFeed(self._client, options, cursor_file,
+                            page_size, **kwds)
+
     def purge(self, **kwds):
         """
         Endpoint: /activities/purge.json
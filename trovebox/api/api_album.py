@@ -1,12 +1,19 @@
 """
 api_album.py : Trovebox Album API Classes
 """
-import collections
+import sys
+import itertools
 
 from trovebox.objects.trovebox_object import TroveboxObject
 from trovebox.objects.album import Album
+from trovebox.parallel import DEFAULT_WORKERS
 from .api_base import ApiBase
 
+if sys.version < '3':
+    STRING_TYPES = basestring
+else: # pragma: no cover
+    STRING_TYPES = str
+
 class ApiAlbums(ApiBase):
     """ Definitions of /albums/ API endpoints """
     def list(self, **kwds):
@@ -19,14 +26,27 @@ class ApiAlbums(ApiBase):
         albums = self._result_to_list(albums)
         return [Album(self._client, album) for album in albums]
 
+    def list_pages(self, page_size=None, **kwds):
+        """
+        Endpoint: /albums/list.json
+
+        Generator that requests every page of the album list in turn,
+        yielding a list of raw album dicts for each page.
+        """
+        return self._list_pages("/albums/list.json", page_size=page_size,
+                                **kwds)
+
 class ApiAlbum(ApiBase):
     """ Definitions of /album/ API endpoints """
-    def cover_update(self, album, photo, **kwds):
+    def cover_update(self, album, photo, fallback=None, **kwds):
         """
         Endpoint: /album/<album_id>/cover/<photo_id>/update.json
 
         Update the cover photo of an album.
         Returns the updated album object.
+        If the server doesn't return the album, the fallback mode
+        determines what is returned (see Http.configure's
+        mutation_fallback option).
         """
         result = self._client.post("/album/%s/cover/%s/update.json" %
                                    (self._extract_id(album),
@@ -36,8 +56,7 @@ class ApiAlbum(ApiBase):
         # API currently doesn't return the updated album
         # (frontend issue #1369)
         if isinstance(result, bool): # pragma: no cover
-            result = self._client.get("/album/%s/view.json" %
-                                      self._extract_id(album))["result"]
+            return self._album_fallback(album, fallback)
 
         return Album(self._client, result)
 
@@ -63,70 +82,152 @@ class ApiAlbum(ApiBase):
                                  self._extract_id(album),
                                  **kwds)["result"]
 
-    def add(self, album, objects, object_type=None, **kwds):
+    def add(self, album, objects, object_type=None, chunk_size=None,
+            max_bytes=None, workers=DEFAULT_WORKERS, fallback=None, **kwds):
         """
         Endpoint: /album/<id>/<type>/add.json
 
         Add objects (eg. Photos) to an album.
-        The objects are a list of either IDs or Trovebox objects.
+        The objects are an iterable of either IDs or Trovebox objects.
         If Trovebox objects are used, the object type is inferred
         automatically.
-        Returns the updated album object.
+        Long iterables are split into chunks (see trovebox.bulk.chunk_ids),
+        up to "workers" of which are submitted concurrently.
+        Returns the updated album object (see cover_update for
+        the fallback mode).
         """
         return self._add_remove("add", album, objects, object_type,
+                                chunk_size, max_bytes, workers, fallback,
                                 **kwds)
 
-    def remove(self, album, objects, object_type=None, **kwds):
+    def remove(self, album, objects, object_type=None, chunk_size=None,
+               max_bytes=None, workers=DEFAULT_WORKERS, fallback=None,
+               **kwds):
         """
         Endpoint: /album/<id>/<type>/remove.json
 
         Remove objects (eg. Photos) to an album.
-        The objects are a list of either IDs or Trovebox objects.
+        The objects are an iterable of either IDs or Trovebox objects.
         If Trovebox objects are used, the object type is inferred
         automatically.
-        Returns the updated album object.
+        Long iterables are split into chunks (see trovebox.bulk.chunk_ids),
+        up to "workers" of which are submitted concurrently.
+        Returns the updated album object (see cover_update for
+        the fallback mode).
         """
         return self._add_remove("remove", album, objects, object_type,
+                                chunk_size, max_bytes, workers, fallback,
                                 **kwds)
 
     def _add_remove(self, action, album, objects, object_type=None,
-                    **kwds):
-        """Common code for the add and remove endpoints."""
+                    chunk_size=None, max_bytes=None,
+                    workers=DEFAULT_WORKERS, fallback=None, **kwds):
+        """
+        Common code for the add and remove endpoints.
+        The objects are consumed lazily, and aren't modified.
+        If more than one chunk is submitted and any of them fail,
+        a TroveboxBulkError is raised.
+        """
+        endpoint, chunks = self._add_remove_chunks(action, album, objects,
+                                                   object_type, chunk_size,
+                                                   max_bytes)
+        first_chunk = next(chunks, [])
+        second_chunk = next(chunks, None)
+        if second_chunk is None:
+            # A single request
+            result = self._client.post(endpoint, ids=first_chunk,
+                                       **kwds)["result"]
+        else:
+            chunks = itertools.chain([first_chunk, second_chunk], chunks)
+            bulk_result = self._post_chunks(endpoint, chunks, workers, **kwds)
+            bulk_result.raise_for_errors("Album %s" % action)
+            # The chunks were submitted concurrently, so none of their
+            # results is guaranteed to include all the changes
+            result = True
+
+        # API currently doesn't return the updated album
+        # (frontend issue #1369)
+        if isinstance(result, bool):
+            return self._album_fallback(album, fallback)
+        return Album(self._client, result)
+
+    def plan_add(self, album, objects, object_type=None, chunk_size=None,
+                 max_bytes=None, workers=DEFAULT_WORKERS, **kwds):
+        """
+        Endpoint: /album/<id>/<type>/add.json (not requested)
+
+        Returns a trovebox.bulk.BulkPlan describing the requests that
+        add() would make for these arguments (excluding any request
+        for the updated album). No objects are added.
+        """
+        endpoint, chunks = self._add_remove_chunks("add", album, objects,
+                                                   object_type, chunk_size,
+                                                   max_bytes)
+        return self._plan_chunks(endpoint, chunks, workers, **kwds)
+
+    def plan_remove(self, album, objects, object_type=None, chunk_size=None,
+                    max_bytes=None, workers=DEFAULT_WORKERS, **kwds):
+        """
+        Endpoint: /album/<id>/<type>/remove.json (not requested)
+
+        Returns a trovebox.bulk.BulkPlan describing the requests that
+        remove() would make for these arguments (excluding any request
+        for the updated album). No objects are removed.
+        """
+        endpoint, chunks = self._add_remove_chunks("remove", album, objects,
+                                                   object_type, chunk_size,
+                                                   max_bytes)
+        return self._plan_chunks(endpoint, chunks, workers, **kwds)
+
+    def _add_remove_chunks(self, action, album, objects, object_type,
+                           chunk_size, max_bytes):
+        """
+        Returns the add/remove endpoint, and a generator of the chunks
+        of object ids to submit to it
+        """
         # Ensure we have an iterable of objects
-        if not isinstance(objects, collections.Iterable):
+        if (isinstance(objects, (TroveboxObject, STRING_TYPES)) or
+                not hasattr(objects, "__iter__")):
             objects = [objects]
+        objects = iter(objects)
 
         # Extract the type of the objects
         if object_type is None:
-            object_type = objects[0].get_type()
+            try:
+                first = next(objects)
+            except StopIteration:
+                raise ValueError("No objects specified")
+            object_type = first.get_type()
+            objects = itertools.chain([first], objects)
+
+        endpoint = "/album/%s/%s/%s.json" % (self._extract_id(album),
+                                             object_type, action)
+        chunks = self._chunk_ids(self._check_types(objects, object_type),
+                                 chunk_size, max_bytes)
+        return endpoint, chunks
 
-        for i, obj in enumerate(objects):
+    @staticmethod
+    def _check_types(objects, object_type):
+        """
+        Generator which yields the id of each object,
+        ensuring that all Trovebox objects are of the same type
+        """
+        for obj in objects:
             if isinstance(obj, TroveboxObject):
-                # Ensure all objects are the same type
                 if obj.get_type() != object_type:
                     raise ValueError("Not all objects are of type '%s'"
                                      % object_type)
-                # Extract the ids of the objects
-                objects[i] = obj.id
+                yield obj.id
+            else:
+                yield obj
 
-        result = self._client.post("/album/%s/%s/%s.json" %
-                                   (self._extract_id(album),
-                                    object_type, action),
-                                   ids=objects, **kwds)["result"]
-
-        # API currently doesn't return the updated album
-        # (frontend issue #1369)
-        if isinstance(result, bool): # pragma: no cover
-            result = self._client.get("/album/%s/view.json" %
-                                      self._extract_id(album))["result"]
-        return Album(self._client, result)
-
-    def update(self, album, **kwds):
+    def update(self, album, fallback=None, **kwds):
         """
         Endpoint: /album/<id>/update.json
 
         Updates an album with the specified parameters.
-        Returns the updated album object.
+        Returns the updated album object (see cover_update for
+        the fallback mode).
         """
         result = self._client.post("/album/%s/update.json" %
                                    self._extract_id(album),
@@ -134,11 +235,16 @@ class ApiAlbum(ApiBase):
 
         # APIv1 doesn't return the updated album (frontend issue #937)
         if isinstance(result, bool): # pragma: no cover
-            result = self._client.get("/album/%s/view.json" %
-                                      self._extract_id(album))["result"]
+            return self._album_fallback(album, fallback)
 
         return Album(self._client, result)
 
+    def _album_fallback(self, album, fallback):
+        """ Returns the album after a mutation that didn't return it """
+        album_id = self._extract_id(album)
+        return self._fallback_view(Album, "/album/%s/view.json" % album_id,
+                                   album_id, fallback)
+
     def view(self, album, **kwds):
         """
         Endpoint: /album/<id>/view.json
@@ -2,10 +2,18 @@
 api_base.py: Base class for all API classes
 """
 try:
-    from urllib.parse import quote # Python3
+    from urllib.parse import quote, urlencode # Python3
 except ImportError:
-    from urllib import quote # Python2
+    from urllib import quote, urlencode # Python2
 
+from trovebox.errors import TroveboxError
+from trovebox.bulk import chunk_ids, ChunkResult, BulkResult, BulkPlan
+from trovebox.parallel import run_parallel, DEFAULT_WORKERS
+from trovebox.retry import is_transient
+
+# Memoized option strings, keyed by the sorted option items
+_OPTION_STRINGS = {}
+_MAX_OPTION_STRINGS = 1024
 
 class ApiBase(object):
     """ Base class for all API objects """
@@ -16,13 +24,141 @@ class ApiBase(object):
         """
         :param options: dictionary containing the options
         :returns: option_string formatted for an API endpoint
+        The options are sorted by key, so that equal option dicts
+        always produce the same endpoint (and cache key).
         """
+        if not options:
+            return ""
+        items = tuple(sorted(options.items()))
+        # Include the value types, since equal values (eg. True and 1)
+        # can be formatted differently
+        key = tuple((name, type(value), value) for name, value in items)
+        try:
+            return _OPTION_STRINGS[key]
+        except KeyError:
+            pass
+        except TypeError: # Unhashable option value
+            return self._format_options(items)
+
+        option_string = self._format_options(items)
+        if len(_OPTION_STRINGS) >= _MAX_OPTION_STRINGS:
+            _OPTION_STRINGS.clear()
+        _OPTION_STRINGS[key] = option_string
+        return option_string
+
+    def _format_options(self, items):
+        """ Returns the quoted option string for (key, value) pairs """
         option_string = ""
-        if options is not None:
-            for key in options:
-                option_string += "/%s-%s" % (key, options[key])
+        for key, value in items:
+            option_string += "/%s-%s" % (key, value)
         return self._quote_url(option_string)
 
+    def _list_pages(self, endpoint, page_size=None, **kwds):
+        """
+        Generator that GETs each page of a paginated list endpoint in turn,
+        yielding the list of result dicts contained in each page.
+        Stops after the last page reported by the "totalPages" field.
+        """
+        if page_size is not None:
+            kwds["pageSize"] = page_size
+        page = int(kwds.pop("page", 1))
+        while True:
+            result = self._client.get(endpoint, page=page, **kwds)["result"]
+            result = self._result_to_list(result)
+            if not result:
+                return
+            yield result
+
+            total_pages = result[0].get("totalPages")
+            if total_pages is None or page >= int(total_pages):
+                return
+            page += 1
+
+    def _chunk_ids(self, objects, chunk_size=None, max_bytes=None):
+        """
+        Generator which extracts the ids from an iterable of objects/ids,
+        yielding lists of ids that are small enough to submit in a
+        single request (see trovebox.bulk.chunk_ids)
+        """
+        ids = (self._extract_id(obj) for obj in objects)
+        return chunk_ids(ids, self._client._process_param_value,
+                         chunk_size, max_bytes)
+
+    def _post_chunks(self, endpoint, chunks, workers=DEFAULT_WORKERS,
+                     split_failed=False, **kwds):
+        """
+        POSTs each chunk of ids to the endpoint, submitting up to
+        "workers" chunks concurrently.
+        Returns a BulkResult containing the outcome of each chunk.
+        A chunk fails if the POST raises an exception or returns a
+        false result.
+        If split_failed is True, failed chunks are split in half and
+        resubmitted, until the ids that fail have been isolated.
+        Chunks that fail with a transient error (see
+        trovebox.retry.is_transient) aren't split, since the failure
+        isn't caused by their ids.
+        """
+        def post_chunk(chunk):
+            """ Submit a single chunk, returning a list of ChunkResults """
+            try:
+                result = self._client.post(endpoint, ids=chunk,
+                                           **kwds)["result"]
+                if not result:
+                    raise TroveboxError("%s returned %r" % (endpoint, result))
+                return [ChunkResult(chunk, result)]
+            except Exception as error:
+                if (not split_failed or len(chunk) == 1 or
+                        is_transient(error)):
+                    return [ChunkResult(chunk, error=error)]
+            middle = len(chunk) // 2
+            return post_chunk(chunk[:middle]) + post_chunk(chunk[middle:])
+
+        bulk_result = BulkResult()
+        for _, results, error in run_parallel(post_chunk, chunks, workers):
+            if error is not None:
+                raise error
+            for chunk_result in results:
+                bulk_result.add(chunk_result)
+        return bulk_result
+
+    def _plan_chunks(self, endpoint, chunks, workers=DEFAULT_WORKERS,
+                     **kwds):
+        """
+        Returns a BulkPlan for POSTing each chunk of ids to the endpoint
+        (see _post_chunks), without making any requests
+        """
+        plan = BulkPlan(endpoint, workers,
+                        self._client.recent_latency("POST"))
+        for chunk in chunks:
+            plan.add(len(chunk), self._payload_bytes(ids=chunk, **kwds))
+        return plan
+
+    def _payload_bytes(self, **params):
+        """ Returns the size of the form-encoded POST parameters """
+        params = self._client._process_params(params)
+        return len(urlencode(sorted(params.items())))
+
+    def _fallback_view(self, cls, endpoint, obj_id, fallback=None):
+        """
+        Returns the object for a mutation whose response didn't include it,
+        according to the fallback mode (or the client's mutation_fallback
+        option, if fallback is None):
+          "view": GET the object from the view endpoint
+          "lazy": return an object that GETs its fields when first accessed
+          "none": return None
+        """
+        if fallback is None:
+            fallback = self._client.config["mutation_fallback"]
+        if fallback == "view":
+            return cls(self._client, self._client.get(endpoint)["result"])
+        if fallback == "lazy":
+            obj = cls(self._client, {"id": obj_id})
+            obj._set_loader(lambda: self._client.get(endpoint)["result"])
+            return obj
+        if fallback == "none":
+            return None
+        raise ValueError("Invalid fallback mode: %r" % fallback)
+
     @staticmethod
     def _extract_id(obj):
         """ Return obj.id, or obj if the object doesn't have an ID """
@@ -1,9 +1,13 @@
 """
 api_photo.py : Trovebox Photo API Classes
 """
+import os
 import base64
 
 from trovebox.objects.photo import Photo
+from trovebox.bulk import ChunkResult, BulkResult, BulkPlan
+from trovebox.parallel import run_parallel, DEFAULT_WORKERS
+from trovebox.hydrate import Hydrator, DEFAULT_BATCH_SIZE
 from .api_base import ApiBase
 
 class ApiPhotos(ApiBase):
@@ -22,6 +26,33 @@ class ApiPhotos(ApiBase):
         photos = self._result_to_list(photos)
         return [Photo(self._client, photo) for photo in photos]
 
+    def list_pages(self, options=None, page_size=None, **kwds):
+        """
+        Endpoint: /photos[/<options>]/list.json
+
+        Generator that requests every page of the photo list in turn,
+        yielding a list of raw photo dicts for each page.
+        No Photo objects are created.
+        The options parameter can be used to narrow down the list.
+        Eg: options={"album": <album_id>}
+        """
+        option_string = self._build_option_string(options)
+        return self._list_pages("/photos%s/list.json" % option_string,
+                                page_size=page_size, **kwds)
+
+    def iterate(self, options=None, page_size=None, **kwds):
+        """
+        Endpoint: /photos[/<options>]/list.json
+
+        Generator that requests every page of the photo list in turn,
+        yielding a Photo object for each photo.
+        The options parameter can be used to narrow down the list.
+        Eg: options={"album": <album_id>}
+        """
+        for page in self.list_pages(options, page_size, **kwds):
+            for photo in page:
+                yield Photo(self._client, photo)
+
     def share(self, options=None, **kwds):
         """
         Endpoint: /photos[/<options>/share.json
@@ -32,29 +63,119 @@ class ApiPhotos(ApiBase):
         return self._client.post("/photos%s/share.json" % option_string,
                                  **kwds)["result"]
 
-    def delete(self, photos, **kwds):
+    def delete(self, photos, chunk_size=None, max_bytes=None,
+               workers=DEFAULT_WORKERS, **kwds):
         """
         Endpoint: /photos/delete.json
 
         Deletes a list of photos.
+        Long lists are split into chunks of at most chunk_size ids,
+        and max_bytes of encoded ids, which are submitted concurrently
+        (see delete_chunked).
         Returns True if successful.
-        Raises a TroveboxError if not.
+        Raises a TroveboxError if not, or TroveboxBulkError if only some
+        of the chunks failed.
+        """
+        chunks = list(self._chunk_ids(photos, chunk_size, max_bytes))
+        if len(chunks) <= 1:
+            ids = chunks[0] if chunks else []
+            return self._client.post("/photos/delete.json", ids=ids,
+                                     **kwds)["result"]
+        result = self._post_chunks("/photos/delete.json", chunks, workers,
+                                   **kwds)
+        result.raise_for_errors("Photo delete")
+        return True
+
+    def delete_chunked(self, photos, chunk_size=None, max_bytes=None,
+                       workers=DEFAULT_WORKERS, split_failed=True, **kwds):
         """
-        ids = [self._extract_id(photo) for photo in photos]
-        return self._client.post("/photos/delete.json", ids=ids,
-                                 **kwds)["result"]
+        Endpoint: /photos/delete.json
 
-    def update(self, photos, **kwds):
+        Deletes any number of photos, splitting them into chunks of at
+        most chunk_size ids and max_bytes of encoded ids, and submitting
+        up to "workers" chunks concurrently. The photos can be any
+        iterable of ids/Photos, which is consumed lazily.
+        If split_failed is True, failed chunks are split up and retried,
+        so that only the ids that can't be deleted are reported as failed.
+        Returns a trovebox.bulk.BulkResult: its succeeded attribute lists
+        the deleted ids, and its failed attribute the ids that weren't
+        deleted. Failed chunks don't raise an exception.
+        To resume a partially completed delete, save() the result and
+        call delete_chunked() again with its failed ids.
+        """
+        return self._post_chunks("/photos/delete.json",
+                                 self._chunk_ids(photos, chunk_size,
+                                                 max_bytes),
+                                 workers, split_failed, **kwds)
+
+    def update(self, photos, chunk_size=None, max_bytes=None,
+               workers=DEFAULT_WORKERS, **kwds):
         """
         Endpoint: /photos/<id>/update.json
 
         Updates a list of photos with the specified parameters.
+        Long lists are split into chunks of at most chunk_size ids,
+        and max_bytes of encoded ids, which are submitted concurrently
+        (see update_chunked).
         Returns True if successful.
-        Raises TroveboxError if not.
+        Raises TroveboxError if not, or TroveboxBulkError if only some
+        of the chunks failed.
+        """
+        chunks = list(self._chunk_ids(photos, chunk_size, max_bytes))
+        if len(chunks) <= 1:
+            ids = chunks[0] if chunks else []
+            return self._client.post("/photos/update.json", ids=ids,
+                                     **kwds)["result"]
+        result = self._post_chunks("/photos/update.json", chunks, workers,
+                                   **kwds)
+        result.raise_for_errors("Photo update")
+        return True
+
+    def update_chunked(self, photos, chunk_size=None, max_bytes=None,
+                       workers=DEFAULT_WORKERS, **kwds):
         """
-        ids = [self._extract_id(photo) for photo in photos]
-        return self._client.post("/photos/update.json", ids=ids,
-                                 **kwds)["result"]
+        Endpoint: /photos/<id>/update.json
+
+        Updates any number of photos with the specified parameters,
+        splitting them into chunks of at most chunk_size ids and
+        max_bytes of encoded ids, and submitting up to "workers" chunks
+        concurrently. The photos can be any iterable of ids/Photos,
+        which is consumed lazily.
+        Returns a trovebox.bulk.BulkResult, reporting the outcome of
+        each chunk. Failed chunks don't raise an exception.
+        """
+        return self._post_chunks("/photos/update.json",
+                                 self._chunk_ids(photos, chunk_size,
+                                                 max_bytes),
+                                 workers, **kwds)
+
+    def plan_delete(self, photos, chunk_size=None, max_bytes=None,
+                    workers=DEFAULT_WORKERS, **kwds):
+        """
+        Endpoint: /photos/delete.json (not requested)
+
+        Returns a trovebox.bulk.BulkPlan describing the requests that
+        delete/delete_chunked would make for these arguments (without
+        retrying failed chunks). No photos are deleted.
+        """
+        return self._plan_chunks("/photos/delete.json",
+                                 self._chunk_ids(photos, chunk_size,
+                                                 max_bytes),
+                                 workers, **kwds)
+
+    def plan_update(self, photos, chunk_size=None, max_bytes=None,
+                    workers=DEFAULT_WORKERS, **kwds):
+        """
+        Endpoint: /photos/update.json (not requested)
+
+        Returns a trovebox.bulk.BulkPlan describing the requests that
+        update/update_chunked would make for these arguments.
+        No photos are updated.
+        """
+        return self._plan_chunks("/photos/update.json",
+                                 self._chunk_ids(photos, chunk_size,
+                                                 max_bytes),
+                                 workers, **kwds)
 
 class ApiPhoto(ApiBase):
     """ Definitions of /photo/ API endpoints """
@@ -153,6 +274,30 @@ class ApiPhoto(ApiBase):
                                   **kwds)["result"]
         return Photo(self._client, result)
 
+    def hydrate(self, photos, options=None, batch_size=DEFAULT_BATCH_SIZE,
+                workers=DEFAULT_WORKERS, **kwds):
+        """
+        Endpoint: /photo/<id>[/<options>]/view.json
+
+        Hydrate partial Photo objects (eg. from a list) lazily:
+        when a photo is asked for a field that it doesn't have, it is
+        requested using the view endpoint (with the specified options
+        and parameters, eg. returnSizes), along with a batch of up to
+        batch_size other photos that are still pending.
+        Up to "workers" photos are requested concurrently.
+        See trovebox.hydrate.Hydrator.
+        Returns a list of the photos.
+        """
+        option_string = self._build_option_string(options)
+
+        def fetch(photo_id):
+            """ Request the fields of a single photo """
+            return self._client.get("/photo/%s%s/view.json" %
+                                    (photo_id, option_string),
+                                    **kwds)["result"]
+
+        return Hydrator(fetch, batch_size, workers).add(photos)
+
     def upload(self, photo_file, **kwds):
         """
         Endpoint: /photo/upload.json
@@ -165,6 +310,23 @@ class ApiPhoto(ApiBase):
                                        **kwds)["result"]
         return Photo(self._client, result)
 
+    def plan_upload(self, photo_files, workers=DEFAULT_WORKERS, **kwds):
+        """
+        Endpoint: /photo/upload.json (not requested)
+
+        Returns a trovebox.bulk.BulkPlan describing the requests needed
+        to upload each of the photo filenames with upload(), running up
+        to "workers" uploads concurrently.
+        The payload size of each request is the size of the file,
+        plus its parameters. Nothing is uploaded.
+        """
+        plan = BulkPlan("/photo/upload.json", workers,
+                        self._client.recent_latency("POST"))
+        params_bytes = self._payload_bytes(**kwds)
+        for photo_file in photo_files:
+            plan.add(1, os.path.getsize(photo_file) + params_bytes)
+        return plan
+
     def upload_encoded(self, photo_file, **kwds):
         """
         Endpoint: /photo/upload.json
@@ -221,21 +383,64 @@ class ApiPhoto(ApiBase):
 
         return value
 
-    def transform(self, photo, **kwds):
+    def transform(self, photo, fallback=None, **kwds):
         """
         Endpoint: /photo/<id>/transform.json
 
         Performs the specified transformations.
           eg. transform(photo, rotate=90)
         Returns the transformed photo.
+        If the server doesn't return the photo, the fallback mode
+        determines what is returned (see Http.configure's
+        mutation_fallback option).
+        """
+        return self._transform(photo, True, fallback, **kwds)
+
+    def transform_many(self, photos, workers=DEFAULT_WORKERS,
+                       fetch_view=True, fallback=None, **kwds):
+        """
+        Endpoint: /photo/<id>/transform.json
+
+        Performs the specified transformations on each photo
+        (eg. transform_many(photos, rotate=90)), transforming up to
+        "workers" photos concurrently.
+        The photos can be any iterable of ids/Photos, which is
+        consumed lazily.
+        APIv1 servers don't return the transformed photo, so it is
+        requested separately (according to the fallback mode, see
+        transform), unless fetch_view is False.
+        Returns a trovebox.bulk.BulkResult, with a ChunkResult for each
+        photo. Each result is the transformed Photo (or True, if the
+        photo wasn't fetched). Failed transforms don't raise an exception.
+        """
+        def transform(photo_id):
+            """ Transform a single photo """
+            return self._transform(photo_id, fetch_view, fallback, **kwds)
+
+        bulk_result = BulkResult()
+        photo_ids = (self._extract_id(photo) for photo in photos)
+        for photo_id, result, error in run_parallel(transform, photo_ids,
+                                                    workers):
+            bulk_result.add(ChunkResult([photo_id], result, error))
+        return bulk_result
+
+    def _transform(self, photo, fetch_view, fallback=None, **kwds):
+        """
+        Transform a photo, returning the transformed Photo.
+        Returns True if the server didn't return the photo, and
+        fetch_view is False.
         """
         result = self._client.post("/photo/%s/transform.json" %
                                    self._extract_id(photo),
                                    **kwds)["result"]
 
         # APIv1 doesn't return the transformed photo (frontend issue #955)
-        if isinstance(result, bool): # pragma: no cover
-            result = self._client.get("/photo/%s/view.json" %
-                                      self._extract_id(photo))["result"]
+        if isinstance(result, bool):
+            if not fetch_view:
+                return result
+            photo_id = self._extract_id(photo)
+            return self._fallback_view(Photo,
+                                       "/photo/%s/view.json" % photo_id,
+                                       photo_id, fallback)
 
         return Photo(self._client, result)
@@ -0,0 +1,206 @@
+"""
+bulk.py : Helpers for splitting bulk operations into chunks of ids,
+          and reporting the outcome of each chunk
+"""
+import math
+
+from .errors import TroveboxError, TroveboxBulkError
+from .persist import save_json, load_json
+
+# Maximum number of ids in each chunk
+DEFAULT_CHUNK_SIZE = 1000
+# Maximum size of each chunk's encoded ids parameter, in bytes
+DEFAULT_MAX_BYTES = 64 * 1024
+
+def chunk_ids(ids, encode, chunk_size=None, max_bytes=None):
+    """
+    Generator which splits an iterable of ids into lists, each containing
+    at most chunk_size ids, and encoding to at most max_bytes when
+    joined into a comma-separated parameter.
+    encode(id) returns the encoded parameter value for a single id
+    (eg. Http._process_param_value).
+    The ids are consumed lazily, so any iterable can be used.
+    An id that is longer than max_bytes on its own gets its own chunk.
+    """
+    if chunk_size is None:
+        chunk_size = DEFAULT_CHUNK_SIZE
+    if max_bytes is None:
+        max_bytes = DEFAULT_MAX_BYTES
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+
+    chunk = []
+    size = 0
+    for item in ids:
+        # Allow for the comma separator
+        item_size = len(encode(item)) + (1 if chunk else 0)
+        if chunk and (len(chunk) >= chunk_size or
+                      size + item_size > max_bytes):
+            yield chunk
+            chunk = []
+            size = 0
+            item_size -= 1
+        chunk.append(item)
+        size += item_size
+    if chunk:
+        yield chunk
+
+class BulkPlan(object):
+    """
+    The requests that a bulk operation would make, calculated without
+    contacting the server (see eg. ApiPhotos.plan_update).
+    Each request is recorded with the number of items it contains,
+    and the size of its payload.
+    The estimated duration assumes that "workers" requests run
+    concurrently, each taking the client's recent mean POST latency.
+    It is None if no requests have been made recently.
+    """
+    def __init__(self, endpoint, workers=1, latency=None):
+        self.endpoint = endpoint
+        self.workers = workers
+        self.latency = latency
+        self.chunk_sizes = []
+        self.payload_bytes = 0
+
+    def add(self, items, payload_bytes):
+        """ Record a request containing the items """
+        self.chunk_sizes.append(items)
+        self.payload_bytes += payload_bytes
+
+    @property
+    def requests(self):
+        """ The number of requests """
+        return len(self.chunk_sizes)
+
+    @property
+    def items(self):
+        """ The total number of items (eg. ids) """
+        return sum(self.chunk_sizes)
+
+    @property
+    def estimated_seconds(self):
+        """ The estimated duration of the requests, or None """
+        if self.latency is None:
+            return None
+        rounds = int(math.ceil(self.requests / float(max(self.workers, 1))))
+        return rounds * self.latency
+
+    def to_dict(self):
+        """ Returns a JSON-serialisable summary of the plan """
+        return {"endpoint": self.endpoint,
+                "requests": self.requests,
+                "items": self.items,
+                "chunk_sizes": self.chunk_sizes,
+                "payload_bytes": self.payload_bytes,
+                "workers": self.workers,
+                "estimated_seconds": self.estimated_seconds}
+
+    def __repr__(self):
+        return "<BulkPlan requests=%d items=%d bytes=%d>" % (
+            self.requests, self.items, self.payload_bytes)
+
+class ChunkResult(object):
+    """
+    The outcome of submitting a single chunk of ids:
+    the ids, the API result, and the exception raised (or None)
+    """
+    def __init__(self, ids, result=None, error=None):
+        self.ids = ids
+        self.result = result
+        self.error = error
+
+    @property
+    def ok(self):
+        """ True if the chunk succeeded """
+        return self.error is None
+
+    def __repr__(self):
+        if self.ok:
+            return "<ChunkResult ids=%d ok>" % len(self.ids)
+        return "<ChunkResult ids=%d error=%r>" % (len(self.ids), self.error)
+
+class BulkResult(object):
+    """
+    Aggregate outcome of a chunked bulk operation.
+    The chunks are listed in the order in which they completed.
+    The failed ids can be passed to another bulk call, to resume
+    an operation that was partially successful.
+    """
+    def __init__(self, chunks=None):
+        self.chunks = list(chunks or [])
+
+    def add(self, chunk):
+        """ Record the outcome of a chunk """
+        self.chunks.append(chunk)
+
+    @property
+    def ok(self):
+        """ True if every chunk succeeded """
+        return all(chunk.ok for chunk in self.chunks)
+
+    @property
+    def succeeded(self):
+        """ List of the ids in chunks that succeeded """
+        return [item for chunk in self.chunks if chunk.ok
+                for item in chunk.ids]
+
+    @property
+    def failed(self):
+        """ List of the ids in chunks that failed """
+        return [item for chunk in self.chunks if not chunk.ok
+                for item in chunk.ids]
+
+    @property
+    def errors(self):
+        """ List of the exceptions raised by the failed chunks """
+        return [chunk.error for chunk in self.chunks if not chunk.ok]
+
+    def raise_for_errors(self, message="Bulk operation"):
+        """ Raise a TroveboxBulkError if any chunk failed """
+        if not self.ok:
+            raise TroveboxBulkError(
+                "%s failed for %d of %d ids: %s" %
+                (message, len(self.failed),
+                 len(self.failed) + len(self.succeeded), self.errors[0]),
+                self)
+
+    def to_dict(self):
+        """
+        Returns a JSON-serialisable report of the succeeded/failed ids
+        and the error messages
+        """
+        return {"succeeded": self.succeeded,
+                "failed": self.failed,
+                "errors": ["%s" % error for error in self.errors]}
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Returns a BulkResult from a report created by to_dict().
+        The per-chunk structure isn't retained: the succeeded ids form
+        one chunk, and the failed ids another.
+        """
+        result = cls()
+        if data["succeeded"]:
+            result.add(ChunkResult(list(data["succeeded"]), True))
+        if data["failed"]:
+            result.add(ChunkResult(list(data["failed"]),
+                                   error=TroveboxError(
+                                       "; ".join(data["errors"]))))
+        return result
+
+    def save(self, path):
+        """
+        Save the report to a JSON file, so that the operation can be
+        resumed later using the failed ids
+        """
+        save_json(path, self.to_dict())
+
+    @classmethod
+    def load(cls, path):
+        """ Load a report saved by save() """
+        return cls.from_dict(load_json(path))
+
+    def __repr__(self):
+        return "<BulkResult succeeded=%d failed=%d>" % (len(self.succeeded),
+                                                        len(self.failed))
@@ -0,0 +1,333 @@
+"""
+cache.py : In-memory cache of Trovebox GET responses
+"""
+import re
+import time
+import heapq
+import threading
+
+from .invalidation import ALL
+
+_OBJECT_ENDPOINT = re.compile(r"^/(photo|album|tag|action|activity)/([^/]+)/")
+
+# Counters recorded by CacheStats
+EVENTS = ("hits", "negative_hits", "misses", "revalidations", "bypasses",
+          "stores", "evictions", "expirations", "invalidations")
+
+def endpoint_object(endpoint):
+    """
+    Returns the (object_type, object_id) that an endpoint refers to,
+    eg. "/photo/1a/view.json" -> ("photo", "1a")
+    Returns (None, None) for endpoints that don't refer to an object.
+    """
+    match = _OBJECT_ENDPOINT.match(endpoint)
+    if match is None:
+        return None, None
+    return match.group(1), match.group(2)
+
+def endpoint_group(endpoint):
+    """
+    Returns the endpoint with any object id and options replaced by "*",
+    so that statistics can be grouped by endpoint,
+    eg. "/photo/1a/view.json" -> "/photo/*/view.json"
+        "/photos/album-1/tags-a/list.json" -> "/photos/*/list.json"
+    """
+    object_type, _ = endpoint_object(endpoint)
+    segments = endpoint.split("/")
+    group = []
+    for i, segment in enumerate(segments):
+        if ((i == 2 and object_type is not None) or
+                (0 < i < len(segments) - 1 and "-" in segment)):
+            segment = "*"
+            if group and group[-1] == "*":
+                continue
+        group.append(segment)
+    return "/".join(group)
+
+class CacheStats(object):
+    """
+    Thread-safe counters of cache events (see EVENTS),
+    grouped by endpoint (see endpoint_group)
+    """
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, event, endpoint, count=1):
+        """ Add count to the event counter for the endpoint """
+        if event not in EVENTS:
+            raise ValueError("Unknown cache event: %s" % event)
+        if count <= 0:
+            return
+        key = (endpoint_group(endpoint), event)
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + count
+
+    def counts(self):
+        """ Returns a dict mapping (endpoint group, event) to a count """
+        with self._lock:
+            return dict(self._counts)
+
+    def pop_counts(self):
+        """ Returns the counts, and resets them to zero """
+        with self._lock:
+            counts = self._counts
+            self._counts = {}
+            return counts
+
+    def clear(self):
+        """ Reset all counters to zero """
+        with self._lock:
+            self._counts = {}
+
+def summarise(counts, sizes):
+    """
+    Returns a statistics dict from a dict of event counts
+    (see CacheStats.counts) and an iterable of (endpoint, size in bytes)
+    pairs for the stored entries:
+      {"entries": ..., "bytes": ..., "hits": ..., ..., "hit_ratio": ...,
+       "endpoints": {"/photo/*/view.json": {"entries": ..., ...}, ...}}
+    The hit ratio is the proportion of lookups answered without a full
+    response from the server (hits and revalidations).
+    """
+    def new_group():
+        """ Returns an empty set of statistics """
+        group = dict((event, 0) for event in EVENTS)
+        group.update(entries=0, bytes=0)
+        return group
+
+    total = new_group()
+    endpoints = {}
+    for endpoint, size in sizes:
+        group = endpoints.setdefault(endpoint_group(endpoint), new_group())
+        for stats in (total, group):
+            stats["entries"] += 1
+            stats["bytes"] += size
+    for (endpoint, event), count in counts.items():
+        group = endpoints.setdefault(endpoint, new_group())
+        group[event] += count
+        total[event] += count
+
+    for stats in [total] + list(endpoints.values()):
+        lookups = stats["hits"] + stats["misses"] + stats["revalidations"]
+        if lookups:
+            stats["hit_ratio"] = ((stats["hits"] + stats["revalidations"]) /
+                                  float(lookups))
+        else:
+            stats["hit_ratio"] = None
+    total["endpoints"] = endpoints
+    return total
+
+class CacheEntry(object):
+    """
+    A cached response body, the time at which it expires,
+    the validators (ETag/Last-Modified) that can be used to revalidate it,
+    and the dependency tags used to invalidate it
+    (see trovebox.invalidation).
+    Negatively cached responses have a status of 404.
+    """
+    def __init__(self, endpoint, body, expires,
+                 etag=None, last_modified=None, tags=(), status=200):
+        self.endpoint = endpoint
+        self.body = body
+        self.expires = expires
+        self.etag = etag
+        self.last_modified = last_modified
+        self.tags = frozenset(tags)
+        self.status = status
+
+    @property
+    def size(self):
+        """ The size of the response body, in bytes """
+        return len(self.body.encode("utf-8"))
+
+    def is_fresh(self, now=None):
+        """ Returns True if the entry hasn't expired """
+        if now is None:
+            now = time.time()
+        return now < self.expires
+
+    def can_revalidate(self):
+        """ Returns True if the entry has any validators """
+        return self.etag is not None or self.last_modified is not None
+
+    def conditional_headers(self):
+        """ Returns the HTTP headers for a conditional request """
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class ResponseCache(object):
+    """
+    Size-bounded, in-memory cache of GET response bodies,
+    with least-recently-used eviction.
+
+    :param max_entries: Maximum number of responses to store
+    :param ttl: Default time-to-live for cached responses, in seconds
+    :param endpoint_ttls: List of (regex, ttl) pairs, overriding the
+        default ttl for endpoints matching the regex (first match wins).
+        A ttl of 0 disables caching for those endpoints.
+        Eg: [(r"^/photo/[^/]+/view\\.json$", 300), (r"^/system/", 0)]
+    :param negative_ttl: Time-to-live for 404 responses from photo, album
+        and tag view endpoints, in seconds. These are discarded when an
+        object of the same type is created/uploaded through the client.
+        [default: 0 (404 responses aren't cached)]
+    """
+    def __init__(self, max_entries=1000, ttl=60, endpoint_ttls=None,
+                 negative_ttl=0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.endpoint_ttls = [(re.compile(pattern), endpoint_ttl)
+                              for pattern, endpoint_ttl
+                              in (endpoint_ttls or [])]
+        self._entries = {}
+        # LRU order: each key's last use, and a heap of (use, key) pairs
+        # that may include stale uses (OrderedDict requires Python 2.7)
+        self._uses = {}
+        self._use_heap = []
+        self._use_count = 0
+        self._tag_keys = {}
+        self._lock = threading.Lock()
+        self._stats = CacheStats()
+
+    def ttl_for(self, endpoint):
+        """ Returns the time-to-live for responses from the endpoint """
+        for pattern, endpoint_ttl in self.endpoint_ttls:
+            if pattern.search(endpoint):
+                return endpoint_ttl
+        return self.ttl
+
+    def get(self, key):
+        """
+        Returns the entry stored under key, or None.
+        Expired entries are removed, unless they have validators
+        (in which case the caller can revalidate them with the server).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if not entry.is_fresh() and not entry.can_revalidate():
+                self._remove(key)
+                self._stats.record("expirations", entry.endpoint)
+                return None
+            self._touch(key)
+            return entry
+
+    def set(self, key, entry):
+        """ Store an entry, evicting the least recently used if full """
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            self._touch(key)
+            for tag in entry.tags:
+                self._tag_keys.setdefault(tag, set()).add(key)
+            self._stats.record("stores", entry.endpoint)
+            while len(self._entries) > self.max_entries:
+                evicted_key = self._least_recently_used()
+                evicted = self._entries[evicted_key]
+                self._remove(evicted_key)
+                self._stats.record("evictions", evicted.endpoint)
+
+    def delete(self, key):
+        """ Remove the entry stored under key, if any """
+        with self._lock:
+            self._remove(key)
+
+    def delete_object(self, object_type, object_id):
+        """ Remove all entries for endpoints referring to the object """
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if (endpoint_object(entry.endpoint) ==
+                        (object_type, str(object_id))):
+                    self._remove(key)
+
+    def invalidate(self, tags):
+        """
+        Remove all entries with any of the specified dependency tags.
+        The trovebox.invalidation.ALL tag removes every entry.
+        """
+        with self._lock:
+            if ALL in tags:
+                keys = list(self._entries)
+            else:
+                keys = set()
+                for tag in tags:
+                    keys.update(self._tag_keys.get(tag, ()))
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._stats.record("invalidations", entry.endpoint)
+                    self._remove(key)
+
+    def clear(self):
+        """ Remove all entries """
+        with self._lock:
+            self._entries.clear()
+            self._uses.clear()
+            self._use_heap = []
+            self._tag_keys.clear()
+
+    def _remove(self, key):
+        """ Remove an entry and its tags (the lock must be held) """
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            del self._uses[key]
+            self._untag(key, entry)
+
+    def _touch(self, key):
+        """ Mark an entry as most recently used (the lock must be held) """
+        self._use_count += 1
+        self._uses[key] = self._use_count
+        heapq.heappush(self._use_heap, (self._use_count, key))
+        # Drop the stale uses once they outnumber the entries
+        if len(self._use_heap) > 2 * len(self._uses) + 16:
+            self._use_heap = [(use, item_key) for item_key, use
+                              in self._uses.items()]
+            heapq.heapify(self._use_heap)
+
+    def _least_recently_used(self):
+        """
+        Returns the key of the least recently used entry
+        (the lock must be held)
+        """
+        while True:
+            use, key = self._use_heap[0]
+            if self._uses.get(key) == use:
+                return key
+            heapq.heappop(self._use_heap)
+
+    def _untag(self, key, entry):
+        """ Remove a key from the tag index (the lock must be held) """
+        for tag in entry.tags:
+            keys = self._tag_keys.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_keys[tag]
+
+    def record(self, event, endpoint):
+        """ Count a cache event (see EVENTS) for the endpoint """
+        self._stats.record(event, endpoint)
+
+    def statistics(self):
+        """
+        Returns a dict of the number of entries, their total size,
+        and the event counters, with a breakdown by endpoint
+        (see trovebox.cache.summarise)
+        """
+        with self._lock:
+            sizes = [(entry.endpoint, entry.size)
+                     for entry in self._entries.values()]
+        return summarise(self._stats.counts(), sizes)
+
+    def reset_statistics(self):
+        """ Reset the event counters to zero """
+        self._stats.clear()
+
+    def __len__(self):
+        return len(self._entries)
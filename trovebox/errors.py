@@ -9,6 +9,23 @@ class TroveboxDuplicateError(TroveboxError):
     """ Indicates that an upload operation failed due to a duplicate photo """
     pass
 
+class TroveboxBulkError(TroveboxError):
+    """
+    Indicates that some chunks of a bulk operation failed.
+    The result attribute contains the trovebox.bulk.BulkResult,
+    listing the ids that succeeded and failed.
+    """
+    def __init__(self, message, result):
+        TroveboxError.__init__(self, message)
+        self.result = result
+
+class TroveboxOfflineError(TroveboxError):
+    """
+    Indicates that an operation isn't available while the client
+    is in offline mode
+    """
+    pass
+
 class Trovebox404Error(Exception):
     """
     Indicates that an Http 404 error code was received
@@ -0,0 +1,47 @@
+"""
+fields.py : Helpers for interpreting API field and parameter values
+"""
+
+def extract_id(obj):
+    """ Return obj.id, or obj if the object doesn't have an ID """
+    try:
+        return obj.id
+    except AttributeError:
+        return obj
+
+def to_list(value):
+    """
+    Returns a list from a list/tuple/set (replacing any Trovebox objects
+    with their ids), or from a comma-separated string
+    """
+    if value is None or value == "":
+        return []
+    if isinstance(value, (list, tuple, set)):
+        return [extract_id(item) for item in value]
+    return [item for item in ("%s" % value).split(",") if item]
+
+def split_ids(ids):
+    """
+    Returns a list of id strings from a list of ids/objects, or a
+    comma-separated string of ids
+    """
+    return ["%s" % item for item in to_list(ids)]
+
+def to_int(value, default=None):
+    """
+    Convert an API field value (eg. a timestamp) to an integer.
+    Missing values are 0, and float strings are truncated.
+    Other invalid values raise ValueError, unless a default is specified.
+    """
+    if value is None or value == "":
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        if default is None:
+            raise ValueError("Invalid integer value: %r" % (value,))
+        return default
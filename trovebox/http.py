@@ -3,17 +3,27 @@ http.py : Trovebox HTTP Access
 """
 from __future__ import unicode_literals
 import sys
+import json
+import time
+import weakref
+import hashlib
+import collections
 import requests
 import requests_oauthlib
 import logging
 try:
-    from urllib.parse import urlparse, urlunparse # Python3
+    from urllib.parse import urlparse, urlunparse, urlencode # Python3
 except ImportError:
     from urlparse import urlparse, urlunparse # Python2
+    from urllib import urlencode # Python2
 
 from trovebox.objects.trovebox_object import TroveboxObject
 from .errors import TroveboxError, Trovebox404Error, TroveboxDuplicateError
+from .errors import TroveboxOfflineError
 from .auth import Auth
+from .cache import CacheEntry
+from .invalidation import dependency_tags, dirtied_tags, negative_tags
+from .single_flight import SingleFlight
 
 if sys.version < '3':
     TEXT_TYPE = unicode
@@ -23,6 +33,9 @@ else: # pragma: no cover
 DUPLICATE_RESPONSE = {"code": 409,
                       "message": "This photo already exists"}
 
+# Number of recent requests used to calculate the typical latency
+LATENCY_SAMPLES = 100
+
 class Http(object):
     """
     Base class to handle HTTP requests to a Trovebox server.
@@ -35,6 +48,11 @@ class Http(object):
 
     _CONFIG_DEFAULTS = {"api_version" : None,
                         "ssl_verify" : True,
+                        "cache" : None,
+                        "identity_map" : False,
+                        "coalesce_requests" : False,
+                        "offline" : None,
+                        "mutation_fallback" : "view",
                         }
 
     def __init__(self, config_file=None, host=None,
@@ -61,6 +79,26 @@ class Http(object):
         self.last_params = None
         self.last_response = None
 
+        # Callables notified after each successful POST
+        self._mutation_listeners = []
+
+        # Maps (object type, id) to the live TroveboxObject, if enabled
+        self._identity_map = None
+
+        # ((host, api_version), URL prefix), calculated on first use
+        self._cached_url_prefix = None
+
+        # In-flight GET requests, if coalesce_requests is enabled
+        self._single_flight = SingleFlight()
+
+        # Incremented after each successful POST, so that GET responses
+        # requested before a mutation aren't shared or cached after it
+        self._mutation_generation = 0
+
+        # Durations of the most recent HTTP requests, in seconds
+        self._latencies = {"GET": collections.deque(maxlen=LATENCY_SAMPLES),
+                           "POST": collections.deque(maxlen=LATENCY_SAMPLES)}
+
     def configure(self, **kwds):
         """
         Update Trovebox HTTP client configuration.
@@ -71,11 +109,38 @@ class Http(object):
             [default: None]
         :param ssl_verify: If true, HTTPS SSL certificates will always be
             verified [default: True]
+        :param cache: A trovebox.cache.ResponseCache, used to cache the
+            responses to GET requests [default: None]
+        :param identity_map: If true, each object id maps to a single live
+            Trovebox object. Constructing an object for an id that is
+            already in memory refreshes and returns the existing instance.
+            [default: False]
+        :param coalesce_requests: If true, concurrent identical GET requests
+            share a single HTTP request. Each caller receives its own copy
+            of the decoded response (or the same exception).
+            [default: False]
+        :param offline: A synced trovebox.mirror.Mirror. If specified,
+            photo/album/tag list and view requests are answered from the
+            mirror without contacting the server, and all other requests
+            raise TroveboxOfflineError. [default: None]
+        :param mutation_fallback: What album/photo mutations return when
+            the server doesn't include the updated object in its response
+            (eg. APIv1). "view" requests the object immediately, "lazy"
+            returns an object that is requested when one of its fields
+            is first accessed, and "none" returns None.
+            Can be overridden for each call using the "fallback" parameter.
+            [default: "view"]
         """
         for item in kwds:
             self.config[item] = kwds[item]
 
-    def get(self, endpoint, process_response=True, **params):
+        if not self.config["identity_map"]:
+            self._identity_map = None
+        elif self._identity_map is None:
+            self._identity_map = weakref.WeakValueDictionary()
+
+    def get(self, endpoint, process_response=True, use_cache=True,
+            **params):
         """
         Performs an HTTP GET from the specified endpoint (API path),
             passing parameters if given.
@@ -85,9 +150,51 @@ class Http(object):
         Returns the decoded JSON dictionary, and raises exceptions if an
             error code is received.
         Returns the raw response if process_response=False
+
+        If a response cache has been configured, processed responses are
+        served from the cache while they are fresh.
+        Expired responses with an ETag/Last-Modified validator are
+        revalidated using a conditional request (a 304 response is
+        treated as a cache hit).
+        Set use_cache=False to bypass the cache lookup (the fresh
+        response is still stored in the cache).
+        If the cache has a negative_ttl, 404 responses from view endpoints
+        are also cached, and a cache hit raises Trovebox404Error.
+
+        If coalesce_requests is configured, concurrent identical requests
+        share a single HTTP request.
+        In offline mode, the response is served from the offline mirror.
         """
+        if self.config["offline"] is not None:
+            return self._offline_get(endpoint, process_response, params)
+
         params = self._process_params(params)
         url = self._construct_url(endpoint)
+        generation = self._mutation_generation
+
+        cache = self.config["cache"]
+        entry_endpoint = self._normalise_endpoint(endpoint)
+        cache_key = None
+        entry = None
+        headers = None
+        if cache is not None and process_response:
+            ttl = cache.ttl_for(entry_endpoint)
+            if ttl > 0:
+                cache_key = self._cache_key(url, params)
+                if use_cache:
+                    entry = cache.get(cache_key)
+                    if entry is None:
+                        cache.record("misses", entry_endpoint)
+                else:
+                    cache.record("bypasses", entry_endpoint)
+                if entry is not None:
+                    if entry.is_fresh():
+                        cache.record("hits", entry_endpoint)
+                        if entry.status == 404:
+                            cache.record("negative_hits", entry_endpoint)
+                        return self._cached_result(url, params, entry)
+                    # Stale, but can be revalidated by the server
+                    headers = entry.conditional_headers()
 
         if self.auth.consumer_key:
             auth = requests_oauthlib.OAuth1(self.auth.consumer_key,
@@ -97,9 +204,22 @@ class Http(object):
         else:
             auth = None
 
-        with requests.Session() as session:
-            session.verify = self.config["ssl_verify"]
-            response = session.get(url, params=params, auth=auth)
+        def send():
+            """ Perform the HTTP request """
+            start = time.time()
+            with requests.Session() as session:
+                session.verify = self.config["ssl_verify"]
+                response = session.get(url, params=params, auth=auth,
+                                       headers=headers)
+            self._latencies["GET"].append(time.time() - start)
+            return response
+
+        if self.config["coalesce_requests"]:
+            key = (cache_key or self._cache_key(url, params),
+                   tuple(sorted((headers or {}).items())), generation)
+            response = self._single_flight.call(key, send)
+        else:
+            response = send()
 
         self._logger.info("============================")
         self._logger.info("GET %s" % url)
@@ -112,8 +232,37 @@ class Http(object):
         self.last_params = params
         self.last_response = response
 
+        if cache_key is not None and generation != self._mutation_generation:
+            # A mutation completed while the request was in flight,
+            # so the response may be out of date - don't cache it
+            cache_key = None
+
         if process_response:
-            return self._process_response(response)
+            if response.status_code == 304 and entry is not None:
+                # Not modified: the stale cached response is still valid
+                cache.record("revalidations", entry_endpoint)
+                if cache_key is not None:
+                    entry.expires = time.time() + ttl
+                    entry.tags = frozenset(dependency_tags(entry_endpoint))
+                    cache.set(cache_key, entry)
+                return self._cached_result(url, params, entry)
+            if entry is not None:
+                # Stale, and modified on the server
+                cache.record("misses", entry_endpoint)
+
+            if response.status_code == 404 and cache_key is not None:
+                self._cache_not_found(cache_key, endpoint, response)
+
+            result = self._process_response(response)
+            if cache_key is not None:
+                cache.set(cache_key,
+                          CacheEntry(entry_endpoint, response.text,
+                                     time.time() + ttl,
+                                     etag=response.headers.get("ETag"),
+                                     last_modified=response.headers.get(
+                                         "Last-Modified"),
+                                     tags=dependency_tags(entry_endpoint)))
+            return result
         else:
             if 200 <= response.status_code < 300:
                 return response.text
@@ -131,8 +280,13 @@ class Http(object):
         Returns the decoded JSON dictionary, and raises exceptions if an
             error code is received.
         Returns the raw response if process_response=False
+        Raises TroveboxOfflineError in offline mode.
         """
-        params = self._process_params(params)
+        if self.config["offline"] is not None:
+            raise TroveboxOfflineError("Cannot issue POST to %s in offline "
+                                       "mode" % endpoint)
+
+        processed_params = self._process_params(params)
         url = self._construct_url(endpoint)
 
         if not self.auth.consumer_key:
@@ -142,21 +296,24 @@ class Http(object):
                                         self.auth.consumer_secret,
                                         self.auth.token,
                                         self.auth.token_secret)
+        start = time.time()
         with requests.Session() as session:
             session.verify = self.config["ssl_verify"]
             if files:
                 # Need to pass parameters as URL query, so they get OAuth signed
-                response = session.post(url, params=params,
+                response = session.post(url, params=processed_params,
                                         files=files, auth=auth)
             else:
                 # Passing parameters as URL query doesn't work
                 # if there are no files to send.
                 # Send them as form data instead.
-                response = session.post(url, data=params, auth=auth)
+                response = session.post(url, data=processed_params,
+                                        auth=auth)
+        self._latencies["POST"].append(time.time() - start)
 
         self._logger.info("============================")
         self._logger.info("POST %s" % url)
-        self._logger.info("params: %s" % repr(params))
+        self._logger.info("params: %s" % repr(processed_params))
         if files:
             self._logger.info("files:  %s" % repr(files))
         self._logger.info("---")
@@ -165,33 +322,163 @@ class Http(object):
             self._logger.info("[Response truncated to 1000 characters]")
 
         self.last_url = url
-        self.last_params = params
+        self.last_params = processed_params
         self.last_response = response
 
         if process_response:
-            return self._process_response(response)
+            result = self._process_response(response)
         else:
             if 200 <= response.status_code < 300:
-                return response.text
+                result = response.text
             else:
                 raise TroveboxError("HTTP Error %d: %s" %
                                     (response.status_code, response.reason))
 
+        self._notify_mutation(endpoint, params)
+        return result
+
+    def _offline_get(self, endpoint, process_response, params):
+        """ Answer a GET request from the offline mirror """
+        endpoint = self._normalise_endpoint(endpoint)
+        url = self._construct_url(endpoint)
+        self._logger.info("============================")
+        self._logger.info("GET %s (offline)" % url)
+        result = self.config["offline"].get(endpoint, params)
+        self.last_url = url
+        self.last_params = params
+        if process_response:
+            return result
+        return json.dumps(result)
+
+    def cache_stats(self):
+        """
+        Returns a dict of statistics for each of the client's caches:
+          responses:          the response cache statistics, including
+                              hit/miss/eviction/revalidation counts, size
+                              in bytes and a breakdown by endpoint
+                              (see trovebox.cache.summarise)
+          identity_map:       the number of live objects in the
+                              identity map
+          coalesced_requests: the number of GET requests that shared
+                              another request's response
+        Caches that aren't enabled are reported as None.
+        """
+        cache = self.config["cache"]
+        identity_map = self._identity_map
+        return {"responses": (cache.statistics()
+                              if cache is not None else None),
+                "identity_map": ({"objects": len(identity_map)}
+                                 if identity_map is not None else None),
+                "coalesced_requests": self._single_flight.coalesced}
+
+    def recent_latency(self, method="POST"):
+        """
+        Returns the mean duration (in seconds) of the most recent
+        HTTP requests made using the method ("GET" or "POST"),
+        or None if there haven't been any.
+        Requests answered from a cache aren't included.
+        """
+        samples = list(self._latencies[method])
+        if not samples:
+            return None
+        return sum(samples) / len(samples)
+
+    def add_mutation_listener(self, listener):
+        """
+        Register a callable to be notified after each successful POST,
+        as listener(endpoint, params).
+        The endpoint excludes the api_version, and the params are the
+        unprocessed keyword parameters that were passed to post().
+        """
+        self._mutation_listeners.append(listener)
+
+    def remove_mutation_listener(self, listener):
+        """ Unregister a callable added by add_mutation_listener """
+        self._mutation_listeners.remove(listener)
+
+    def _notify_mutation(self, endpoint, params):
+        """
+        Invalidate the cached responses affected by a successful POST,
+        then call each of the mutation listeners
+        """
+        endpoint = self._normalise_endpoint(endpoint)
+        self._mutation_generation += 1
+        cache = self.config["cache"]
+        if cache is not None:
+            cache.invalidate(dirtied_tags(endpoint, params))
+        for listener in list(self._mutation_listeners):
+            listener(endpoint, params)
+
+    @staticmethod
+    def _normalise_endpoint(endpoint):
+        """ Ensure the endpoint starts with a slash """
+        if not endpoint.startswith("/"):
+            endpoint = "/" + endpoint
+        return endpoint
+
+    def _cached_result(self, url, params, entry):
+        """
+        Returns the decoded JSON response stored in a cache entry.
+        Raises Trovebox404Error for a negatively cached response.
+        """
+        self._logger.info("============================")
+        self._logger.info("GET %s (cached)" % url)
+        self.last_url = url
+        self.last_params = params
+        if entry.status == 404:
+            raise Trovebox404Error("HTTP Error 404: Not Found (cached)")
+        return json.loads(entry.body)
+
+    def _cache_not_found(self, cache_key, endpoint, response):
+        """ Negatively cache a 404 response from a view endpoint """
+        cache = self.config["cache"]
+        endpoint = self._normalise_endpoint(endpoint)
+        tags = negative_tags(endpoint)
+        if cache.negative_ttl > 0 and tags is not None:
+            cache.set(cache_key,
+                      CacheEntry(endpoint, response.text,
+                                 time.time() + cache.negative_ttl,
+                                 tags=tags, status=404))
+
+    def _cache_key(self, url, params):
+        """
+        Returns the cache key for a GET request.
+        The key includes the full URL, the parameters (in a canonical
+        order) and the identity of the OAuth credentials.
+        """
+        identity = "%s:%s" % (self.auth.consumer_key, self.auth.token)
+        identity = hashlib.sha1(identity.encode("utf-8")).hexdigest()[:16]
+        query = urlencode(sorted(params.items()))
+        return "%s %s?%s" % (identity, url, query)
+
     def _construct_url(self, endpoint):
         """Return the full URL to the specified endpoint"""
-        parsed_url = urlparse(self.host)
-        scheme = parsed_url[0]
-        host = parsed_url[1]
-        # Handle host without a scheme specified (eg. www.example.com)
-        if scheme == "":
-            scheme = "http"
-            host = self.host
-
         if not endpoint.startswith("/"):
             endpoint = "/" + endpoint
-        if self.config["api_version"] is not None:
-            endpoint = "/v%d%s" % (self.config["api_version"], endpoint)
-        return urlunparse((scheme, host, endpoint, '', '', ''))
+        return self._url_prefix() + endpoint
+
+    def _url_prefix(self):
+        """
+        Return the URL prefix (scheme, host and API version) for all
+        endpoints. This is only recalculated if the host or API version
+        has changed.
+        """
+        key = (self.host, self.config["api_version"])
+        cached = self._cached_url_prefix
+        if cached is None or cached[0] != key:
+            parsed_url = urlparse(self.host)
+            scheme = parsed_url[0]
+            host = parsed_url[1]
+            # Handle host without a scheme specified (eg. www.example.com)
+            if scheme == "":
+                scheme = "http"
+                host = self.host
+
+            prefix = urlunparse((scheme, host, '', '', '', ''))
+            if self.config["api_version"] is not None:
+                prefix += "/v%d" % self.config["api_version"]
+            self._cached_url_prefix = (key, prefix)
+        return self._cached_url_prefix[1]
 
     def _process_params(self, params):
         """ Converts Unicode/lists/booleans inside HTTP parameters """
@@ -0,0 +1,97 @@
+"""
+hydrate.py : Lazily fill in the missing fields of partial objects,
+             fetching them in concurrent batches
+"""
+import threading
+
+from trovebox.parallel import run_parallel, DEFAULT_WORKERS
+
+# Maximum number of objects fetched by each batch
+DEFAULT_BATCH_SIZE = 50
+
+class Hydrator(object):
+    """
+    Lazy, batched hydration of partial objects (eg. Photos from a list).
+
+    add() gives each object a loader (see TroveboxObject._set_loader),
+    keeping its current fields. The first time one of the objects is
+    asked for a field that it doesn't have, the full fields of that
+    object, and of up to batch_size - 1 other objects that are still
+    pending, are fetched concurrently using fetch(id) (up to "workers"
+    at a time). The other objects keep the fetched fields until
+    they're accessed, so they don't make a request of their own.
+    If fetching one of the other objects fails, it is retried when that
+    object is accessed.
+    """
+    def __init__(self, fetch, batch_size=DEFAULT_BATCH_SIZE,
+                 workers=DEFAULT_WORKERS):
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        self._fetch = fetch
+        self.batch_size = batch_size
+        self.workers = workers
+        self.requests_sent = 0
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def add(self, objects):
+        """
+        Hydrate the objects lazily.
+        Returns a list of the objects.
+        """
+        objects = list(objects)
+        for obj in objects:
+            if obj.id is None:
+                raise ValueError("Objects must have an id to be hydrated")
+        with self._lock:
+            for obj in objects:
+                obj._set_loader(self._loader(obj), keep_fields=True)
+                self._pending.append(obj)
+        return objects
+
+    def pending(self):
+        """ Returns the number of objects that haven't been fetched """
+        return len(self._pending)
+
+    def _loader(self, obj):
+        """ Returns the loader for a single object """
+        return lambda: self._hydrate(obj)
+
+    def _hydrate(self, obj):
+        """
+        Fetch the object's fields, along with those of a batch of
+        other pending objects
+        """
+        with self._lock:
+            batch = [obj] + [other for other in self._pending
+                             if other is not obj][:self.batch_size - 1]
+            batch_ids = set(id(item) for item in batch)
+            self._pending = [other for other in self._pending
+                             if id(other) not in batch_ids]
+            self.requests_sent += len(batch)
+
+        fields = failure = None
+        for item, result, error in run_parallel(self._fetch_fields, batch,
+                                                self.workers):
+            if error is not None:
+                # Fetch it again when it is next accessed
+                with self._lock:
+                    self._pending.append(item)
+                if item is obj:
+                    failure = error
+            elif item is obj:
+                fields = result
+            else:
+                # Serve the fetched fields when the object is accessed
+                item._set_loader(_fields_loader(result), keep_fields=True)
+        if failure is not None:
+            raise failure
+        return fields
+
+    def _fetch_fields(self, obj):
+        """ Fetch the fields of a single object """
+        return self._fetch(obj.id)
+
+def _fields_loader(fields):
+    """ Returns a loader that returns the already fetched fields """
+    return lambda: fields
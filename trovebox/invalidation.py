@@ -0,0 +1,130 @@
+"""
+invalidation.py : Maps endpoints to the cache dependency tags they
+                  read (GET) or dirty (POST)
+
+Each cached response is tagged with the resources it depends on,
+eg. "photo:1a" for a photo view, or "photos" for anything that contains
+photo data. Each mutating endpoint dirties a set of tags, and all cached
+responses with any of those tags are invalidated.
+Responses from individual photo endpoints are also tagged with
+"photo-views", which is dirtied by mutations that can change the tags
+or albums listed in any number of photos.
+"""
+import re
+
+from trovebox.fields import split_ids
+
+# Invalidates every cached response
+ALL = "*"
+
+_OBJECT = re.compile(r"^/(photo|album|tag|action|activity)/([^/]+)/(.*)$")
+_LIST = re.compile(r"^/(photos|albums|tags|activities)[/.]")
+_ACTION_CREATE = re.compile(r"^/action/([^/]+)/([^/]+)/create\.json$")
+_VIEW = re.compile(r"^/(photo|album|tag)/([^/]+)/view\.json$")
+
+# Fields which can create new tags when a photo is uploaded or updated
+_TAG_FIELDS = ("tags", "tagsAdd")
+
+def dependency_tags(endpoint):
+    """ Returns the set of tags that a GET endpoint's response depends on """
+    match = _OBJECT.match(endpoint)
+    if match:
+        object_type, object_id, rest = match.groups()
+        tags = set(["%s:%s" % (object_type, object_id)])
+        if object_type == "photo":
+            tags.add("photo-views")
+            if rest.startswith("nextprevious"):
+                # Depends on the order of the photo list
+                tags.add("photos")
+        elif object_type == "album":
+            # Album views contain the album's photos and cover
+            tags.update(["albums", "photos"])
+        elif object_type == "tag":
+            tags.add("tags")
+        elif object_type == "activity":
+            tags.add("activities")
+        return tags
+
+    match = _LIST.match(endpoint)
+    if match:
+        tags = set([match.group(1)])
+        if match.group(1) == "albums":
+            # Album lists contain cover photos
+            tags.add("photos")
+        return tags
+
+    return set()
+
+def negative_tags(endpoint):
+    """
+    Returns the set of tags for a cached 404 response from a view
+    endpoint, or None if 404 responses from the endpoint aren't cached.
+    Eg: "/photo/1a/view.json" -> set(["photo:1a", "404:photo"])
+    The "404:<type>" tag is dirtied by anything that could create an
+    object of that type.
+    """
+    match = _VIEW.match(endpoint)
+    if match is None:
+        return None
+    object_type, object_id = match.groups()
+    return set(["%s:%s" % (object_type, object_id), "404:%s" % object_type])
+
+def dirtied_tags(endpoint, params):
+    """
+    Returns the set of tags invalidated by a successful POST to the
+    endpoint with the given parameters.
+    Unrecognised endpoints invalidate everything.
+    """
+    match = _ACTION_CREATE.match(endpoint)
+    if match:
+        target_id, target_type = match.groups()
+        return set(["%s:%s" % (target_type, target_id), "activities"])
+
+    if endpoint == "/photo/upload.json":
+        return set(["photos", "albums", "tags", "activities",
+                    "404:photo", "404:tag"])
+    if endpoint == "/album/create.json":
+        return set(["albums", "404:album"])
+    if endpoint == "/tag/create.json":
+        return set(["tags", "404:tag"])
+    if endpoint == "/activities/purge.json":
+        return set(["activities"])
+    if endpoint.startswith("/photos/"):
+        tags = set(["photos", "albums", "tags", "activities"])
+        tags.update("photo:%s" % photo_id
+                    for photo_id in split_ids(params.get("ids")))
+        if _creates_tags(params):
+            tags.add("404:tag")
+        return tags
+
+    match = _OBJECT.match(endpoint)
+    if match:
+        object_type, object_id, rest = match.groups()
+        tags = set(["%s:%s" % (object_type, object_id)])
+        if object_type == "photo":
+            tags.update(["photos", "tags", "activities"])
+            if _creates_tags(params):
+                tags.add("404:tag")
+        elif object_type == "album":
+            tags.update(["albums", "photos"])
+            if rest == "delete.json":
+                # Removed from the albums listed in its photos' views
+                tags.add("photo-views")
+            elif rest.startswith("photo/"):
+                # Photo views list the albums they're in
+                tags.update("photo:%s" % photo_id
+                            for photo_id in split_ids(params.get("ids")))
+        elif object_type == "tag":
+            tags.update(["tags", "photos"])
+            if rest in ("update.json", "delete.json"):
+                # Renamed/removed in the tags listed in its photos' views
+                tags.add("photo-views")
+        elif object_type == "action":
+            tags.add("activities")
+        return tags
+
+    return set([ALL])
+
+def _creates_tags(params):
+    """ Returns True if a photo upload/update can create new tags """
+    return any(params.get(field) for field in _TAG_FIELDS)
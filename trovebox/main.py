@@ -48,6 +48,9 @@ def main(args=sys.argv[1:]):
                       action="store_true", dest="pretty", default=False)
     parser.add_option('-v', help="Verbose output",
                       action="store_true", dest="verbose", default=False)
+    parser.add_option('--cache-stats',
+                      help="Display the statistics of an SQLite cache file",
+                      action='store', type='string', dest='cache_stats')
     parser.add_option('--version', help="Display the current version",
                       action="store_true")
     parser.add_option('--help', help='show this help message',
@@ -66,6 +69,15 @@ def main(args=sys.argv[1:]):
     if args:
         parser.error("Unknown argument: %s" % args)
 
+    if options.cache_stats:
+        if not os.path.exists(options.cache_stats):
+            parser.error("Cache file not found: %s" % options.cache_stats)
+        from trovebox.sqlite_cache import read_statistics
+        stats = read_statistics(options.cache_stats)
+        print(json.dumps(stats, sort_keys=True,
+                         indent=4, separators=(',',':')))
+        return
+
     params = {}
     if options.fields:
         for field in options.fields:
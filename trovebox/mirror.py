@@ -0,0 +1,214 @@
+"""
+mirror.py : Local mirror of photo, album and tag metadata,
+            used to answer read requests in offline mode
+"""
+from __future__ import unicode_literals
+import re
+import math
+import time
+import threading
+try:
+    from urllib.parse import unquote # Python3
+except ImportError:
+    from urllib import unquote # Python2
+
+from trovebox.errors import TroveboxOfflineError, Trovebox404Error
+from trovebox.persist import save_json, load_json
+from trovebox.fields import to_list
+
+_PHOTO_LIST = re.compile(r"^/photos((?:/[^/]+)*)/list\.json$")
+_PHOTO_VIEW = re.compile(r"^/photo/([^/]+)(?:/[^/]+)*/view\.json$")
+_ALBUM_VIEW = re.compile(r"^/album/([^/]+)/view\.json$")
+
+# Pagination fields added to each item of a list response
+_PAGINATION_FIELDS = ("totalRows", "totalPages", "currentPage",
+                      "currentRows", "pageSize")
+
+class Mirror(object):
+    """
+    Local copy of the photo, album and tag metadata.
+
+    sync() downloads the photo, album and tag lists from the server.
+    Once synced, a client configured with offline=<mirror> answers
+    the list/view requests for photos, albums and tags from the mirror,
+    so that the usual Photo/Album/Tag objects are returned without
+    contacting the server.
+    Photo lists can be filtered by the "album" and "tags" options,
+    sorted with the sortBy parameter, and paginated with the
+    page/pageSize parameters. Other options are ignored.
+    If path is specified, the mirror can be saved to/loaded from
+    this file.
+    """
+    def __init__(self, client=None, path=None, page_size=None):
+        self._client = client
+        self.path = path
+        self.page_size = page_size
+        self.synced = None
+        self._photos = []
+        self._albums = []
+        self._tags = []
+        self._by_id = {"photo": {}, "album": {}}
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """
+        Endpoints: /photos/list.json, /albums/list.json, /tags/list.json
+
+        Replace the mirror contents with the current server data.
+        The client must not be in offline mode.
+        """
+        photos = [photo for page
+                  in self._client.photos.list_pages(page_size=self.page_size)
+                  for photo in page]
+        albums = [album for page
+                  in self._client.albums.list_pages(page_size=self.page_size)
+                  for album in page]
+        tags = self._client.get("/tags/list.json")["result"]
+        if tags and tags[0].get("totalRows") == 0:
+            tags = []
+        with self._lock:
+            self._set(photos, albums, tags, time.time())
+
+    def _set(self, photos, albums, tags, synced):
+        """ Replace the mirror contents """
+        self._photos = [_strip(photo) for photo in photos]
+        self._albums = [_strip(album) for album in albums]
+        self._tags = [_strip(tag) for tag in tags]
+        self._by_id = {
+            "photo": dict((photo["id"], photo) for photo in self._photos),
+            "album": dict((album["id"], album) for album in self._albums)}
+        self.synced = synced
+
+    def __len__(self):
+        return len(self._photos)
+
+    def get(self, endpoint, params):
+        """
+        Returns the response to a GET request, in the same format as the
+        Trovebox server's responses.
+        Raises Trovebox404Error if the requested object isn't in the
+        mirror, and TroveboxOfflineError if the endpoint is unsupported.
+        """
+        with self._lock:
+            result = self._result(endpoint, dict(params))
+        return {"code": 200, "message": "Served from the offline mirror",
+                "result": result}
+
+    def _result(self, endpoint, params):
+        """ Returns the result for an endpoint """
+        match = _PHOTO_LIST.match(endpoint)
+        if match:
+            options = _parse_options(match.group(1))
+            photos = self._filter_photos(options)
+            photos = _sort(photos, params.get("sortBy"))
+            return _paginate(photos, params)
+
+        match = _PHOTO_VIEW.match(endpoint)
+        if match:
+            return self._view("photo", match.group(1))
+
+        match = _ALBUM_VIEW.match(endpoint)
+        if match:
+            album = self._view("album", match.group(1))
+            if _to_bool(params.get("includeElements")):
+                album["photos"] = [
+                    dict(photo) for photo
+                    in self._filter_photos({"album": album["id"]})]
+            return album
+
+        if endpoint == "/albums/list.json":
+            return _paginate(self._albums, params)
+        if endpoint == "/tags/list.json":
+            return [dict(tag) for tag in self._tags]
+
+        raise TroveboxOfflineError("Endpoint %s isn't available offline"
+                                   % endpoint)
+
+    def _view(self, object_type, object_id):
+        """ Returns a copy of an object, or raises Trovebox404Error """
+        try:
+            return dict(self._by_id[object_type][unquote(object_id)])
+        except KeyError:
+            raise Trovebox404Error("HTTP Error 404: %s %s isn't in the "
+                                   "offline mirror" % (object_type, object_id))
+
+    def _filter_photos(self, options):
+        """ Returns the photos matching the album/tags options """
+        photos = self._photos
+        album = options.get("album")
+        if album is not None:
+            photos = [photo for photo in photos
+                      if album in to_list(photo.get("albums"))]
+        tags = options.get("tags")
+        if tags is not None:
+            tags = set(to_list(tags))
+            photos = [photo for photo in photos
+                      if tags.issubset(to_list(photo.get("tags")))]
+        return photos
+
+    def save(self, path=None):
+        """ Save the mirror to a JSON file """
+        with self._lock:
+            data = {"synced": self.synced, "photos": self._photos,
+                    "albums": self._albums, "tags": self._tags}
+        save_json(path or self.path, data)
+
+    def load(self, path=None):
+        """ Load the mirror from a JSON file """
+        data = load_json(path or self.path)
+        with self._lock:
+            self._set(data["photos"], data["albums"], data["tags"],
+                      data["synced"])
+
+def _strip(item):
+    """ Returns a copy of a list item, without the pagination fields """
+    return dict((key, value) for key, value in item.items()
+                if key not in _PAGINATION_FIELDS)
+
+def _parse_options(option_string):
+    """ Returns a dict from an endpoint option string (/key-value/...) """
+    options = {}
+    for option in option_string.split("/"):
+        if "-" in option:
+            key, value = unquote(option).split("-", 1)
+            options[key] = value
+    return options
+
+def _sort(items, sort_by):
+    """ Sort a list of dicts by a "field,asc|desc" specification """
+    if not sort_by:
+        return items
+    field, _, direction = sort_by.partition(",")
+    return sorted(items, key=lambda item: _sort_key(item.get(field)),
+                  reverse=(direction.lower() == "desc"))
+
+def _sort_key(value):
+    """ Sort numeric strings numerically, and missing values first """
+    if value is None:
+        return (0, 0, "")
+    try:
+        return (1, float(value), "")
+    except (TypeError, ValueError):
+        return (2, 0, "%s" % value)
+
+def _paginate(items, params):
+    """
+    Returns the requested page of a list, with the pagination fields
+    added to each item (as the server does)
+    """
+    total = len(items)
+    if not items:
+        return [{"totalRows": 0}]
+    page_size = int(params.get("pageSize") or total)
+    page = int(params.get("page") or 1)
+    page_items = items[(page - 1) * page_size:page * page_size]
+    pagination = {"totalRows": total,
+                  "totalPages": int(math.ceil(total / float(page_size))),
+                  "currentPage": page,
+                  "currentRows": len(page_items),
+                  "pageSize": page_size}
+    return [dict(item, **pagination) for item in page_items]
+
+def _to_bool(value):
+    """ Interpret a boolean request parameter """
+    return value not in (None, False, 0, "0", "", "false")
@@ -7,10 +7,9 @@ from .photo import Photo
 class Action(TroveboxObject):
     """ Representation of an Action object """
     _type = "action"
+    _defaults = dict(TroveboxObject._defaults, target=None, target_type=None)
 
     def __init__(self, client, json_dict):
-        self.target = None
-        self.target_type = None
         TroveboxObject.__init__(self, client, json_dict)
         self._update_fields_with_objects()
 
@@ -19,7 +18,7 @@ class Action(TroveboxObject):
         # Update the photo target with photo objects
         if self.target is not None:
             if self.target_type == "photo":
-                self.target = Photo(self._client, self.target)
+                self._set_override("target", Photo(self._client, self.target))
             else:
                 raise NotImplementedError("Actions can only be assigned to "
                                           "Photos")
@@ -7,10 +7,9 @@ from .photo import Photo
 class Activity(TroveboxObject):
     """ Representation of an Activity object """
     _type = "activity"
+    _defaults = dict(TroveboxObject._defaults, data=None, type=None)
 
     def __init__(self, client, json_dict):
-        self.data = None
-        self.type = None
         TroveboxObject.__init__(self, client, json_dict)
         self._update_fields_with_objects()
 
@@ -19,7 +18,7 @@ class Activity(TroveboxObject):
         # Update the data with photo objects
         if self.type is not None:
             if self.type.startswith("photo"):
-                self.data = Photo(self._client, self.data)
+                self._set_override("data", Photo(self._client, self.data))
             else:
                 raise NotImplementedError("Unrecognised activity type: %s"
                                           % self.type)
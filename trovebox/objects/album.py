@@ -7,18 +7,21 @@ from .photo import Photo
 class Album(TroveboxObject):
     """ Representation of an Album object """
     _type = "album"
+    _defaults = dict(TroveboxObject._defaults, photos=None, cover=None)
 
     def __init__(self, client, json_dict):
-        self.photos = None
-        self.cover = None
         TroveboxObject.__init__(self, client, json_dict)
         self._update_fields_with_objects()
 
+    def _replace_fields(self, json_dict):
+        TroveboxObject._replace_fields(self, json_dict)
+        self._update_fields_with_objects()
+
     def _update_fields_with_objects(self):
         """ Convert dict fields into objects, where appropriate """
         # Update the cover with a photo object
         if isinstance(self.cover, dict):
-            self.cover = Photo(self._client, self.cover)
+            self._set_override("cover", Photo(self._client, self.cover))
 
         # Update the photo list with photo objects
         try:
@@ -34,9 +37,7 @@ class Album(TroveboxObject):
 
         Update the cover photo of this album.
         """
-        result = self._client.album.cover_update(self, photo, **kwds)
-        self._replace_fields(result.get_fields())
-        self._update_fields_with_objects()
+        self._update_from(self._client.album.cover_update(self, photo, **kwds))
 
     def delete(self, **kwds):
         """
@@ -60,9 +61,8 @@ class Album(TroveboxObject):
         automatically.
         Updates the album's fields with the response.
         """
-        result = self._client.album.add(self, objects, object_type, **kwds)
-        self._replace_fields(result.get_fields())
-        self._update_fields_with_objects()
+        self._update_from(self._client.album.add(self, objects, object_type,
+                                                 **kwds))
 
     def remove(self, objects, object_type=None, **kwds):
         """
@@ -74,10 +74,8 @@ class Album(TroveboxObject):
         automatically.
         Updates the album's fields with the response.
         """
-        result = self._client.album.remove(self, objects, object_type,
-                                           **kwds)
-        self._replace_fields(result.get_fields())
-        self._update_fields_with_objects()
+        self._update_from(self._client.album.remove(self, objects, object_type,
+                                                    **kwds))
 
     def update(self, **kwds):
         """
@@ -86,8 +84,8 @@ class Album(TroveboxObject):
         Updates this album with the specified parameters.
         """
         result = self._client.album.update(self, **kwds)
-        self._replace_fields(result.get_fields())
-        self._update_fields_with_objects()
+        kwds.pop("fallback", None)
+        self._update_from(result, sent=kwds)
 
     def view(self, **kwds):
         """
@@ -98,4 +96,3 @@ class Album(TroveboxObject):
         """
         result = self._client.album.view(self, **kwds)
         self._replace_fields(result.get_fields())
-        self._update_fields_with_objects()
@@ -98,5 +98,4 @@ class Photo(TroveboxObject):
           eg. transform(photo, rotate=90)
         Updates the photo's fields with the response.
         """
-        result = self._client.photo.transform(self, **kwds)
-        self._replace_fields(result.get_fields())
+        self._update_from(self._client.photo.transform(self, **kwds))
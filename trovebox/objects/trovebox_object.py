@@ -4,50 +4,244 @@ Base object supporting the storage of custom fields as attributes
 
 from __future__ import unicode_literals
 import sys
+import threading
 
 class TroveboxObject(object):
-    """ Base object supporting the storage of custom fields as attributes """
+    """
+    Base object supporting the storage of custom fields as attributes.
+
+    Field values are not copied onto the instance - they are served
+    directly from the underlying JSON dictionary when accessed.
+    Attributes that are explicitly assigned take precedence over the
+    JSON fields, until the fields are next replaced.
+    Assignments are recorded as changes, which save() sends to the server.
+    An object can be given a loader (see _set_loader), which is called to
+    fetch its fields the first time a missing field is accessed.
+    """
     _type = "None"
+    # Values returned for fields that aren't present in the JSON dict
+    _defaults = {"id": None, "name": None}
+
+    def __new__(cls, client=None, json_dict=None):
+        # If the client has an identity map, reuse the existing instance
+        identity_map = getattr(client, "_identity_map", None)
+        if identity_map is not None and json_dict:
+            obj = identity_map.get((cls._type, json_dict.get("id")))
+            if obj is not None and type(obj) is cls:
+                return obj
+        return object.__new__(cls)
+
     def __init__(self, client, json_dict):
-        self.id = None
-        self.name = None
+        if "_json_dict" in self.__dict__:
+            # Existing instance from the identity map - refresh its fields,
+            # keeping any that aren't in the (possibly partial) new dict
+            merged = dict(self._json_dict)
+            merged.update(json_dict)
+            self._refresh_fields(merged)
+            return
         self._client = client
         self._json_dict = json_dict
-        self._set_fields(json_dict)
+        identity_map = getattr(client, "_identity_map", None)
+        if identity_map is not None and self.id is not None:
+            identity_map[(self._type, self.id)] = self
+
+    def __getattr__(self, name):
+        # Only called if normal attribute lookup fails
+        if name.startswith("_"):
+            raise AttributeError(name)
+        load_count = self.__dict__.get("_load_count", 0)
+        try:
+            return self._json_dict[name]
+        except KeyError:
+            pass
+        if self._load(load_count):
+            return getattr(self, name)
+        try:
+            return self._defaults[name]
+        except KeyError:
+            raise AttributeError("'%s' object has no attribute '%s'" %
+                                 (self.__class__.__name__, name))
+
+    def __setattr__(self, name, value):
+        object.__setattr__(self, name, value)
+        if not name.startswith("_"):
+            self.__dict__.setdefault("_changed", set()).add(name)
+
+    def __delattr__(self, name):
+        object.__delattr__(self, name)
+        self.__dict__.get("_changed", set()).discard(name)
+
+    def _set_override(self, name, value):
+        """
+        Set an attribute that shadows a JSON field, without recording it
+        as a change (eg. to convert a field into an object)
+        """
+        self.__dict__[name] = value
+
+    def _set_loader(self, loader, keep_fields=False):
+        """
+        Replace this object's fields with the JSON dict returned by
+        loader() when a missing field is first accessed.
+        Unless keep_fields is True, the current fields (apart from the id)
+        are discarded immediately.
+        """
+        if not keep_fields:
+            self._replace_fields({"id": self.id} if self.id is not None
+                                 else {})
+        self.__dict__.setdefault("_load_lock", threading.RLock())
+        self.__dict__["_loader"] = loader
+
+    def _load(self, load_count=None):
+        """
+        Call the pending loader (if any), replacing this object's fields.
+        Returns True if the fields were loaded.
+        If the loader raises an exception, it is kept for the next access.
+        Other threads wait for the loader to finish; if load_count
+        (the caller's snapshot of _load_count) is specified, returns True
+        if another thread has loaded the fields since the snapshot.
+        """
+        lock = self.__dict__.get("_load_lock")
+        if lock is None:
+            return False
+        with lock:
+            count = self.__dict__.get("_load_count", 0)
+            if load_count is not None and count != load_count:
+                return True
+            loader = self.__dict__.pop("_loader", None)
+            if loader is None:
+                return False
+            try:
+                self._refresh_fields(loader())
+            except Exception:
+                self.__dict__["_loader"] = loader
+                raise
+            self.__dict__["_load_count"] = count + 1
+        return True
+
+    def _update_from(self, result, sent=None):
+        """
+        Update this object's fields from the object returned by a mutation.
+        If the result is lazy, this object is reloaded lazily too.
+        If the result is None (see the mutation_fallback option), the
+        fields that were sent to the server (if specified) are applied
+        locally instead, and are no longer treated as changes.
+        """
+        if result is None:
+            if sent:
+                self._apply_sent_fields(sent)
+            return
+        if result is self:
+            return
+        loader = result.__dict__.get("_loader")
+        if loader is not None:
+            self._set_loader(loader)
+        else:
+            self._replace_fields(result.get_fields())
+
+    def _apply_sent_fields(self, sent):
+        """ Record fields that the server has accepted as saved """
+        json_dict = dict(self._json_dict)
+        changed = self.__dict__.get("_changed", set())
+        for name, value in sent.items():
+            json_dict[name] = value
+            self.__dict__.pop(name, None)
+            changed.discard(name)
+        self._json_dict = json_dict
 
-    def _set_fields(self, json_dict):
-        """ Set this object's attributes specified in json_dict """
-        for key, value in json_dict.items():
-            if not key.startswith("_"):
-                setattr(self, key, value)
+    def get_changes(self):
+        """
+        Returns a dict of the attributes that have been assigned since
+        the fields were last replaced, and differ from the original
+        JSON fields
+        """
+        changes = {}
+        for name in self.__dict__.get("_changed", ()):
+            try:
+                value = self.__dict__[name]
+            except KeyError:
+                continue
+            original = self._json_dict.get(name, self._defaults.get(name))
+            if value != original:
+                changes[name] = value
+        return changes
+
+    def discard_changes(self):
+        """ Revert all assigned attributes to their original values """
+        for name in list(self.__dict__.get("_changed", ())):
+            self.__dict__.pop(name, None)
+        self.__dict__.pop("_changed", None)
+
+    def save(self, **kwds):
+        """
+        Sends the changed attributes (see get_changes) to the server
+        using this object's update() method, along with any additional
+        parameters.
+        No request is made if nothing has changed.
+        Returns True if the object was updated, False otherwise.
+        """
+        changes = self.get_changes()
+        if not changes:
+            return False
+        changes.update(kwds)
+        self.update(**changes)
+        return True
+
+    def __dir__(self):
+        fields = [key for key in self._json_dict if not key.startswith("_")]
+        return sorted(set(dir(self.__class__)) | set(self.__dict__) |
+                      set(fields) | set(self._defaults))
 
     def _replace_fields(self, json_dict):
         """
         Delete this object's attributes, and replace with
         those in json_dict.
         """
-        for key in self._json_dict.keys():
-            if not key.startswith("_"):
-                delattr(self, key)
+        self._clear_overrides()
         self._json_dict = json_dict
-        self._set_fields(json_dict)
+
+    def _refresh_fields(self, json_dict):
+        """
+        Replace this object's fields with those in json_dict,
+        keeping any unsaved changes (see get_changes)
+        """
+        changed = self.__dict__.get("_changed", ())
+        changes = dict((name, self.__dict__[name]) for name in changed
+                       if name in self.__dict__)
+        self._replace_fields(json_dict)
+        if changes:
+            self.__dict__.update(changes)
+            self.__dict__["_changed"] = set(changes)
 
     def _delete_fields(self):
         """
         Delete this object's attributes, including name and id
         """
-        for key in self._json_dict.keys():
-            if not key.startswith("_"):
-                delattr(self, key)
+        identity_map = getattr(self._client, "_identity_map", None)
+        if identity_map is not None and self.id is not None:
+            identity_map.pop((self._type, self.id), None)
+        self._clear_overrides()
+        self.__dict__.pop("id", None)
+        self.__dict__.pop("name", None)
         self._json_dict = {}
-        self.id = None
-        self.name = None
+
+    def _clear_overrides(self):
+        """
+        Remove any assigned attributes that shadow the current JSON fields
+        """
+        instance_dict = self.__dict__
+        for key in self._json_dict:
+            instance_dict.pop(key, None)
+        for key in instance_dict.pop("_changed", ()):
+            instance_dict.pop(key, None)
 
     def __repr__(self):
-        if self.name is not None:
-            value = "<%s name='%s'>" % (self.__class__.__name__, self.name)
-        elif self.id is not None:
-            value = "<%s id='%s'>" % (self.__class__.__name__, self.id)
+        # Avoid loading a lazy object's fields
+        name = self.__dict__.get("name", self._json_dict.get("name"))
+        obj_id = self.__dict__.get("id", self._json_dict.get("id"))
+        if name is not None:
+            value = "<%s name='%s'>" % (self.__class__.__name__, name)
+        elif obj_id is not None:
+            value = "<%s id='%s'>" % (self.__class__.__name__, obj_id)
         else:
             value = "<%s>" % (self.__class__.__name__)
 
@@ -59,6 +253,7 @@ class TroveboxObject(object):
 
     def get_fields(self):
         """ Returns this object's attributes """
+        self._load()
         return self._json_dict
 
     def get_type(self):
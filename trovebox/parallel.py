@@ -0,0 +1,78 @@
+"""
+parallel.py : Run API calls concurrently, using a bounded pool of threads
+"""
+import threading
+try:
+    import queue # Python3
+except ImportError:
+    import Queue as queue # Python2
+
+DEFAULT_WORKERS = 8
+
+def run_parallel(func, items, workers=DEFAULT_WORKERS):
+    """
+    Generator which calls func(item) for each item, using up to
+    "workers" threads.
+    Yields an (item, result, error) tuple for each item as it completes,
+    where error is the exception raised by func (or None).
+    Items are consumed lazily, so any iterable (including a generator)
+    can be used without materialising it.
+    """
+    items = iter(items)
+    if workers <= 1:
+        for item in items:
+            try:
+                yield item, func(item), None
+            except Exception as error:
+                yield item, None, error
+        return
+
+    lock = threading.Lock()
+    stop = threading.Event()
+    # Bounded, so that workers don't run too far ahead of the consumer
+    results = queue.Queue(maxsize=workers)
+    iterator_errors = []
+    finished = object()
+
+    def worker():
+        """ Process items until there are none left """
+        try:
+            while not stop.is_set():
+                with lock:
+                    try:
+                        item = next(items)
+                    except StopIteration:
+                        return
+                    except Exception as error:
+                        iterator_errors.append(error)
+                        stop.set()
+                        return
+                try:
+                    results.put((item, func(item), None))
+                except Exception as error:
+                    results.put((item, None, error))
+        finally:
+            results.put(finished)
+
+    for _ in range(workers):
+        thread = threading.Thread(target=worker)
+        thread.daemon = True
+        thread.start()
+
+    running = workers
+    try:
+        while running:
+            result = results.get()
+            if result is finished:
+                running -= 1
+            else:
+                yield result
+    finally:
+        # If the consumer stopped early, let the workers finish
+        stop.set()
+        while running:
+            if results.get() is finished:
+                running -= 1
+
+    if iterator_errors:
+        raise iterator_errors[0]
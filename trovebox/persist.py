@@ -0,0 +1,36 @@
+"""
+persist.py : Helpers for saving local state to JSON files
+"""
+from __future__ import unicode_literals
+import io
+import os
+import json
+
+def save_json(path, data):
+    """
+    Write data to a JSON file.
+    The data is written to a temporary file first, so that the original
+    file isn't corrupted if the write fails.
+    """
+    temp_path = path + ".tmp"
+    # The default (ASCII-only) encoding is str on Python 2 and 3
+    with io.open(temp_path, "wb") as out_file:
+        out_file.write(json.dumps(data).encode("utf-8"))
+    _replace(temp_path, path)
+
+def load_json(path):
+    """ Read data from a JSON file """
+    with io.open(path, "r", encoding="utf-8") as in_file:
+        return json.load(in_file)
+
+def _replace(source, destination):
+    """ Rename source to destination, replacing any existing file """
+    try:
+        replace = os.replace # Python3.3+
+    except AttributeError: # pragma: no cover
+        # Not atomic: the destination briefly doesn't exist
+        if os.path.exists(destination):
+            os.remove(destination)
+        os.rename(source, destination)
+    else:
+        replace(source, destination)
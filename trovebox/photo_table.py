@@ -0,0 +1,198 @@
+"""
+photo_table.py : Columnar storage of photo metadata, for analytics
+"""
+from __future__ import unicode_literals
+import array
+
+from trovebox.fields import to_list, to_int
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Column types:
+#   "int"   : stored in an array of signed longs (missing values are 0)
+#   "float" : stored in an array of doubles (missing values are NaN)
+#   "str"   : stored in a list
+#   "list"  : stored in a list of tuples (eg. tags)
+_TYPECODES = {"int": "l", "float": "d"}
+
+DEFAULT_COLUMNS = {"id": "str",
+                   "title": "str",
+                   "size": "int",
+                   "width": "int",
+                   "height": "int",
+                   "dateTaken": "int",
+                   "dateUploaded": "int",
+                   "dateUpdated": "int",
+                   "tags": "list",
+                   "albums": "list",
+                   }
+
+class PhotoTable(object):
+    """
+    Stores selected photo fields column by column, in typed arrays.
+
+    Tables are populated from the raw photo dicts in each page of a
+    photo listing, so no Photo objects are created.
+    The columns parameter is a dict mapping field names to column types
+    ("int", "float", "str" or "list"). [default: DEFAULT_COLUMNS]
+    """
+    def __init__(self, columns=None):
+        if columns is None:
+            columns = DEFAULT_COLUMNS
+        for column_type in columns.values():
+            if column_type not in ("int", "float", "str", "list"):
+                raise ValueError("Unknown column type: %s" % column_type)
+        self.column_types = dict(columns)
+        self._columns = {}
+        for name, column_type in self.column_types.items():
+            self._columns[name] = self._new_column(column_type)
+
+    @classmethod
+    def from_pages(cls, pages, columns=None):
+        """
+        Create a table from an iterable of pages, each containing
+        a list of photo dicts.
+        """
+        table = cls(columns)
+        for page in pages:
+            table.append_page(page)
+        return table
+
+    @classmethod
+    def from_client(cls, client, options=None, columns=None,
+                    page_size=None, **kwds):
+        """
+        Endpoint: /photos[/<options>]/list.json
+
+        Create a table containing every photo in the photo list.
+        The options parameter can be used to narrow down the list.
+        Eg: options={"album": <album_id>}
+        """
+        return cls.from_pages(client.photos.list_pages(options, page_size,
+                                                       **kwds),
+                              columns)
+
+    @staticmethod
+    def _new_column(column_type):
+        """ Returns an empty column of the specified type """
+        if column_type in _TYPECODES:
+            return array.array(str(_TYPECODES[column_type]))
+        return []
+
+    def append_page(self, page):
+        """ Append a list of photo dicts to the table """
+        for name, column_type in self.column_types.items():
+            values = [photo.get(name) for photo in page]
+            column = self._columns[name]
+            if column_type == "int":
+                column.extend([to_int(value) for value in values])
+            elif column_type == "float":
+                column.extend([_to_float(value) for value in values])
+            elif column_type == "list":
+                column.extend([tuple(to_list(value)) for value in values])
+            else:
+                column.extend(values)
+
+    def __len__(self):
+        for column in self._columns.values():
+            return len(column)
+        return 0
+
+    def column(self, name, as_numpy=False):
+        """
+        Returns the named column.
+        Numeric columns are returned as arrays, other columns as lists.
+        If as_numpy is True, a NumPy array is returned instead
+        (requires NumPy).
+        """
+        column = self._columns[name]
+        if as_numpy:
+            if numpy is None:
+                raise ImportError("NumPy is required for as_numpy=True")
+            if self.column_types[name] in _TYPECODES:
+                return numpy.array(column)
+            return numpy.array(column, dtype=object)
+        return column
+
+    def mask(self, name, predicate):
+        """
+        Returns a list of booleans, indicating the rows where
+        predicate(value) is true for the named column.
+        """
+        return [bool(predicate(value)) for value in self._columns[name]]
+
+    def select(self, mask):
+        """
+        Returns a new table containing the rows where mask is true.
+        The mask is a sequence of booleans, eg. from mask() or
+        a comparison between NumPy columns.
+        """
+        if len(mask) != len(self):
+            raise ValueError("Mask length (%d) doesn't match table "
+                             "length (%d)" % (len(mask), len(self)))
+        return self.take([i for i, selected in enumerate(mask) if selected])
+
+    def take(self, rows):
+        """ Returns a new table containing the specified row indices """
+        table = PhotoTable(self.column_types)
+        for name, column in self._columns.items():
+            table._columns[name].extend([column[i] for i in rows])
+        return table
+
+    def filter(self, name, predicate):
+        """
+        Returns a new table containing the rows where
+        predicate(value) is true for the named column.
+        """
+        return self.select(self.mask(name, predicate))
+
+    def group_by(self, name):
+        """
+        Returns a dict mapping each value in the named column to
+        a list of the row indices containing that value.
+        For list columns (eg. tags), each row is included in the group
+        of every value it contains.
+        """
+        groups = {}
+        column = self._columns[name]
+        if self.column_types[name] == "list":
+            for i, values in enumerate(column):
+                for value in values:
+                    groups.setdefault(value, []).append(i)
+        else:
+            for i, value in enumerate(column):
+                groups.setdefault(value, []).append(i)
+        return groups
+
+    def count_by(self, name):
+        """
+        Returns a dict mapping each value in the named column to
+        the number of rows containing that value.
+        """
+        return dict((value, len(rows))
+                    for value, rows in self.group_by(name).items())
+
+    def lengths(self, name):
+        """
+        Returns an array containing the length of each row's value in
+        the named list column (eg. the number of tags per photo).
+        """
+        return array.array(str("l"),
+                           [len(values) for values in self._columns[name]])
+
+    def to_dict(self):
+        """
+        Returns a dict mapping each column name to a list of its values,
+        suitable for passing to pandas.DataFrame().
+        """
+        return dict((name, list(column))
+                    for name, column in self._columns.items())
+
+def _to_float(value):
+    """ Convert an API field value to a float (missing values are NaN) """
+    if value is None or value == "":
+        return float("nan")
+    return float(value)
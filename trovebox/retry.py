@@ -0,0 +1,46 @@
+"""
+retry.py : Retry API calls that fail with transient errors
+"""
+import re
+import time
+import requests
+
+from .errors import TroveboxError
+
+# HTTP/Trovebox error codes that are worth retrying
+_TRANSIENT_CODE = re.compile(r"^(?:HTTP Error|Code) (?:429|5\d\d)\b")
+
+DEFAULT_RETRIES = 3
+DEFAULT_RETRY_DELAY = 1.0
+
+def is_transient(error):
+    """
+    Returns True if the exception indicates a transient failure:
+    a connection error/timeout, or a server error (5xx) or
+    rate limiting (429) response
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError,
+                          requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, TroveboxError):
+        return _TRANSIENT_CODE.match("%s" % error) is not None
+    return False
+
+def call_with_retries(func, retries=DEFAULT_RETRIES,
+                      delay=DEFAULT_RETRY_DELAY):
+    """
+    Returns func(), retrying up to "retries" times if it raises a
+    transient error (see is_transient).
+    The delay between attempts starts at "delay" seconds, and doubles
+    after each attempt.
+    Other errors, and the final transient error, are raised.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except Exception as error:
+            if attempt >= retries or not is_transient(error):
+                raise
+        time.sleep(delay * (2 ** attempt))
+        attempt += 1
@@ -0,0 +1,273 @@
+"""
+search_index.py : Local search index for photo tags, titles and dates
+"""
+from __future__ import unicode_literals
+import re
+import bisect
+import threading
+
+from trovebox.objects.photo import Photo
+from trovebox.persist import save_json, load_json
+from trovebox.fields import extract_id, to_list, to_int
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_PHOTO_DELETE = re.compile(r"^/photo/([^/]+)/delete\.json$")
+
+# Fields retained for each indexed photo
+INDEXED_FIELDS = ("id", "title", "description", "tags", "albums",
+                  "dateTaken", "dateUploaded", "dateUpdated")
+DATE_FIELDS = ("dateTaken", "dateUploaded")
+
+class SearchIndex(object):
+    """
+    Local inverted index over the photo library.
+
+    Indexes tags, words in the title/description, and the date fields,
+    so that searches can be answered without any server requests.
+    build() pages through the entire photo list; refresh() only fetches
+    photos that have been updated since the last build/refresh
+    (sorted by dateUpdated), so it is cheap to run periodically.
+    Photos deleted on the server are only removed by build(), or by
+    attaching the index to the client that deletes them.
+    The options parameter can be used to narrow down the indexed photos.
+    Eg: options={"album": <album_id>}
+    """
+    def __init__(self, client, options=None, path=None, page_size=None):
+        self._client = client
+        self.options = options
+        self.path = path
+        self.page_size = page_size
+        self.high_water = None
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        """ Empty the index """
+        self._photos = {}
+        self._tags = {}
+        self._words = {}
+        self._sorted_words = None
+        self._dates = dict((field, None) for field in DATE_FIELDS)
+
+    def build(self):
+        """
+        Endpoint: /photos[/<options>]/list.json
+
+        (Re)build the index from the full photo list.
+        Searches continue to use the existing index until the new one
+        is complete.
+        """
+        # Index the pages as they're fetched into a separate index,
+        # so that the lock isn't held during the requests
+        index = SearchIndex(self._client, self.options)
+        for page in self._client.photos.list_pages(self.options,
+                                                   self.page_size):
+            for photo in page:
+                index._add(photo)
+
+        with self._lock:
+            self._photos = index._photos
+            self._tags = index._tags
+            self._words = index._words
+            self._sorted_words = index._sorted_words
+            self._dates = index._dates
+            self.high_water = index.high_water
+
+    def refresh(self):
+        """
+        Endpoint: /photos[/<options>]/list.json
+
+        Re-index the photos updated since the last build/refresh.
+        Returns the number of photos that were re-indexed.
+        """
+        if self.high_water is None:
+            self.build()
+            return len(self._photos)
+
+        updated = []
+        pages = self._client.photos.list_pages(self.options, self.page_size,
+                                               sortBy="dateUpdated,desc")
+        for page in pages:
+            older = False
+            for photo in page:
+                date_updated = to_int(photo.get("dateUpdated"), default=0)
+                if date_updated >= self.high_water:
+                    updated.append(photo)
+                else:
+                    older = True
+            # The list is sorted by dateUpdated, so there's no need to
+            # fetch any more pages once an older photo has been found
+            if older:
+                break
+
+        with self._lock:
+            for photo in updated:
+                self._add(photo)
+        return len(updated)
+
+    def _add(self, photo):
+        """ Add (or replace) a photo in the index """
+        photo = dict((field, photo[field])
+                     for field in INDEXED_FIELDS if field in photo)
+        photo_id = photo["id"]
+        if photo_id in self._photos:
+            self._remove(photo_id)
+        self._photos[photo_id] = photo
+
+        for tag in to_list(photo.get("tags")):
+            self._tags.setdefault(tag.lower(), set()).add(photo_id)
+        for word in _words(photo):
+            if word not in self._words:
+                self._words[word] = set()
+                self._sorted_words = None
+            self._words[word].add(photo_id)
+        for field in DATE_FIELDS:
+            self._dates[field] = None
+
+        date_updated = to_int(photo.get("dateUpdated"), default=0)
+        if self.high_water is None or date_updated > self.high_water:
+            self.high_water = date_updated
+
+    def _remove(self, photo_id):
+        """ Remove a photo from the index """
+        photo = self._photos.pop(photo_id, None)
+        if photo is None:
+            return
+        for tag in to_list(photo.get("tags")):
+            _discard(self._tags, tag.lower(), photo_id)
+        for word in _words(photo):
+            if _discard(self._words, word, photo_id):
+                self._sorted_words = None
+        for field in DATE_FIELDS:
+            self._dates[field] = None
+
+    def remove(self, photo):
+        """ Remove a photo (or photo id) from the index """
+        with self._lock:
+            self._remove(extract_id(photo))
+
+    def __len__(self):
+        return len(self._photos)
+
+    def search(self, tags=None, any_tags=None, text=None,
+               date_field="dateTaken", date_from=None, date_to=None,
+               as_objects=False):
+        """
+        Returns the ids of the photos matching all of the criteria:
+          tags:     list of tags, which must all be present
+          any_tags: list of tags, at least one of which must be present
+          text:     words which must all appear in the title/description.
+                    The final word can be a prefix (eg. "beach hol").
+          date_from/date_to: inclusive range of date_field timestamps
+        If as_objects is True, a list of Photo objects is returned instead.
+        """
+        with self._lock:
+            candidates = []
+            for tag in tags or ():
+                candidates.append(self._tags.get(tag.lower(), set()))
+            if any_tags is not None:
+                matches = set()
+                for tag in any_tags:
+                    matches.update(self._tags.get(tag.lower(), ()))
+                candidates.append(matches)
+            if text is not None:
+                candidates.extend(self._text_matches(text))
+            if date_from is not None or date_to is not None:
+                candidates.append(self._date_matches(date_field,
+                                                     date_from, date_to))
+
+            if candidates:
+                # Intersect the smallest sets first
+                candidates.sort(key=len)
+                result = candidates[0].intersection(*candidates[1:])
+            else:
+                result = set(self._photos)
+            if as_objects:
+                return [Photo(self._client, dict(self._photos[photo_id]))
+                        for photo_id in sorted(result)]
+        return sorted(result)
+
+    def _text_matches(self, text):
+        """ Returns a set of matching photo ids for each query word """
+        words = _WORD.findall(text.lower())
+        matches = [self._words.get(word, set()) for word in words[:-1]]
+        if words:
+            # Treat the final word as a prefix
+            if self._sorted_words is None:
+                self._sorted_words = sorted(self._words)
+            prefix = words[-1]
+            last = set()
+            i = bisect.bisect_left(self._sorted_words, prefix)
+            while (i < len(self._sorted_words) and
+                   self._sorted_words[i].startswith(prefix)):
+                last.update(self._words[self._sorted_words[i]])
+                i += 1
+            matches.append(last)
+        return matches
+
+    def _date_matches(self, field, date_from, date_to):
+        """ Returns the set of photo ids within the date range """
+        if field not in self._dates:
+            raise ValueError("Unindexed date field: %s" % field)
+        if self._dates[field] is None:
+            dates = sorted((to_int(photo.get(field), default=0), photo_id)
+                           for photo_id, photo in self._photos.items()
+                           if photo.get(field))
+            self._dates[field] = ([date for date, _ in dates],
+                                  [photo_id for _, photo_id in dates])
+        keys, photo_ids = self._dates[field]
+        start = 0 if date_from is None else bisect.bisect_left(keys, date_from)
+        end = (len(keys) if date_to is None
+               else bisect.bisect_right(keys, date_to))
+        return set(photo_ids[start:end])
+
+    def attach(self):
+        """ Remove photos from the index when deleted through the client """
+        self._client.add_mutation_listener(self._on_mutation)
+
+    def detach(self):
+        """ Stop tracking deletes made through the client """
+        self._client.remove_mutation_listener(self._on_mutation)
+
+    def _on_mutation(self, endpoint, params):
+        """ Mutation listener: remove deleted photos """
+        match = _PHOTO_DELETE.match(endpoint)
+        if match:
+            self.remove(match.group(1))
+        elif endpoint == "/photos/delete.json":
+            for photo_id in to_list(params.get("ids")):
+                self.remove(photo_id)
+
+    def save(self, path=None):
+        """ Save the index to a JSON file """
+        with self._lock:
+            data = {"high_water": self.high_water,
+                    "photos": list(self._photos.values())}
+        save_json(path or self.path, data)
+
+    def load(self, path=None):
+        """ Load the index from a JSON file """
+        data = load_json(path or self.path)
+        with self._lock:
+            self._clear()
+            for photo in data["photos"]:
+                self._add(photo)
+            self.high_water = data["high_water"]
+
+def _words(photo):
+    """ Returns the set of words in the photo's title and description """
+    text = "%s %s" % (photo.get("title") or "", photo.get("description") or "")
+    return set(_WORD.findall(text.lower()))
+
+def _discard(postings, key, photo_id):
+    """
+    Remove photo_id from the postings set for key.
+    Returns True if the set is now empty (and has been deleted).
+    """
+    ids = postings.get(key)
+    if ids is not None:
+        ids.discard(photo_id)
+        if not ids:
+            del postings[key]
+            return True
+    return False
@@ -0,0 +1,59 @@
+"""
+single_flight.py : Coalesce concurrent identical calls into one
+"""
+import threading
+
+class _Call(object):
+    """ An in-flight call, and its eventual result or exception """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight(object):
+    """
+    Ensures that only one call for each key is in flight at a time.
+    Callers that arrive while a call with the same key is in progress
+    wait for it to finish, and receive the same result (or exception).
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        # Number of calls that shared another call's result
+        self.coalesced = 0
+
+    def call(self, key, func):
+        """
+        Returns func(), sharing the result with any concurrent callers
+        using the same key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def in_flight(self):
+        """ Returns the number of calls currently in flight """
+        with self._lock:
+            return len(self._calls)
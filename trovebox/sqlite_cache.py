@@ -0,0 +1,295 @@
+"""
+sqlite_cache.py : Persistent cache of Trovebox GET responses, using SQLite
+"""
+import os
+import time
+import sqlite3
+import threading
+try:
+    from urllib.request import pathname2url # Python3
+except ImportError:
+    from urllib import pathname2url # Python2
+
+from .cache import ResponseCache, CacheEntry, endpoint_object, summarise
+from .invalidation import ALL
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    object_type TEXT,
+    object_id TEXT,
+    body TEXT NOT NULL,
+    expires REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    stored REAL NOT NULL,
+    status INTEGER NOT NULL DEFAULT 200
+);
+CREATE INDEX IF NOT EXISTS responses_object
+    ON responses (object_type, object_id);
+CREATE INDEX IF NOT EXISTS responses_stored ON responses (stored);
+CREATE TABLE IF NOT EXISTS response_tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+);
+CREATE INDEX IF NOT EXISTS response_tags_key ON response_tags (key);
+CREATE TABLE IF NOT EXISTS statistics (
+    endpoint TEXT NOT NULL,
+    event TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (endpoint, event)
+);
+"""
+
+class SQLiteCache(ResponseCache):
+    """
+    Response cache stored in an SQLite database, so that it persists
+    across restarts and can be shared by multiple processes.
+
+    The database uses write-ahead logging, so readers in other processes
+    aren't blocked by writers. Each thread uses its own connection.
+    Entries are indexed by the type and id of the object their
+    endpoint refers to (eg. "photo", "1a").
+    When there are more than max_entries responses, the entries that
+    were stored longest ago are evicted.
+    Cache statistics are also stored in the database, so they include
+    the events from every process using it. They're written every
+    EVICTION_INTERVAL events, and when statistics() or close() is called.
+
+    :param path: Filename of the SQLite database
+    The other parameters are the same as for ResponseCache.
+    """
+    # Check the number of entries after this many writes
+    EVICTION_INTERVAL = 100
+
+    def __init__(self, path, max_entries=100000, ttl=60,
+                 endpoint_ttls=None, timeout=30, negative_ttl=0):
+        ResponseCache.__init__(self, max_entries, ttl, endpoint_ttls,
+                               negative_ttl)
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._writes = 0
+        self._events = 0
+        connection = self._connection()
+        connection.executescript(_SCHEMA)
+        columns = [row[1] for row in
+                   connection.execute("PRAGMA table_info(responses)")]
+        if "status" not in columns:
+            # Upgrade a database created before negative caching
+            with connection:
+                connection.execute("ALTER TABLE responses ADD COLUMN "
+                                   "status INTEGER NOT NULL DEFAULT 200")
+
+    def _connection(self):
+        """ Returns this thread's database connection """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def close(self):
+        """ Close this thread's database connection """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            self._flush_statistics()
+            connection.close()
+            self._local.connection = None
+
+    def get(self, key):
+        """
+        Returns the entry stored under key, or None.
+        Expired entries are removed, unless they have validators
+        (in which case the caller can revalidate them with the server).
+        """
+        row = self._connection().execute(
+            "SELECT endpoint, body, expires, etag, last_modified, status "
+            "FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        entry = CacheEntry(*row[:5], status=row[5])
+        if not entry.is_fresh() and not entry.can_revalidate():
+            self.delete(key)
+            self.record("expirations", entry.endpoint)
+            return None
+        return entry
+
+    def set(self, key, entry):
+        """ Store an entry, evicting the oldest entries if full """
+        object_type, object_id = endpoint_object(entry.endpoint)
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, "
+                "object_type, object_id, body, expires, etag, "
+                "last_modified, stored, status) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, entry.endpoint, object_type, object_id, entry.body,
+                 entry.expires, entry.etag, entry.last_modified,
+                 time.time(), entry.status))
+            connection.execute("DELETE FROM response_tags WHERE key = ?",
+                               (key,))
+            connection.executemany(
+                "INSERT INTO response_tags (tag, key) VALUES (?, ?)",
+                [(tag, key) for tag in entry.tags])
+        self.record("stores", entry.endpoint)
+
+        with self._lock:
+            self._writes += 1
+            evict = (self._writes % self.EVICTION_INTERVAL == 0)
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove expired entries that can't be revalidated, and the oldest
+        entries beyond max_entries.
+        """
+        connection = self._connection()
+        expired = ("FROM responses WHERE expires <= ? AND "
+                   "etag IS NULL AND last_modified IS NULL")
+        oldest = ("FROM responses WHERE key IN (SELECT key FROM "
+                  "responses ORDER BY stored DESC LIMIT -1 OFFSET ?)")
+        with connection:
+            self._record_removals(connection, "expirations", expired,
+                                  (time.time(),))
+            self._record_removals(connection, "evictions", oldest,
+                                  (self.max_entries,))
+            connection.execute(
+                "DELETE FROM response_tags WHERE key NOT IN "
+                "(SELECT key FROM responses)")
+
+    def delete(self, key):
+        """ Remove the entry stored under key, if any """
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            connection.execute("DELETE FROM response_tags WHERE key = ?",
+                               (key,))
+
+    def delete_object(self, object_type, object_id):
+        """ Remove all entries for endpoints referring to the object """
+        connection = self._connection()
+        args = (object_type, str(object_id))
+        with connection:
+            connection.execute("DELETE FROM response_tags WHERE key IN "
+                               "(SELECT key FROM responses WHERE "
+                               "object_type = ? AND object_id = ?)", args)
+            connection.execute("DELETE FROM responses WHERE "
+                               "object_type = ? AND object_id = ?", args)
+
+    def invalidate(self, tags):
+        """
+        Remove all entries with any of the specified dependency tags.
+        The trovebox.invalidation.ALL tag removes every entry.
+        """
+        if ALL in tags:
+            where, tags = "FROM responses", []
+        else:
+            tags = list(tags)
+            if not tags:
+                return
+            where = ("FROM responses WHERE key IN (SELECT key FROM "
+                     "response_tags WHERE tag IN (%s))" %
+                     ", ".join("?" * len(tags)))
+        connection = self._connection()
+        with connection:
+            self._record_removals(connection, "invalidations", where, tags)
+            connection.execute(
+                "DELETE FROM response_tags WHERE key NOT IN "
+                "(SELECT key FROM responses)")
+
+    def _record_removals(self, connection, event, where, args):
+        """
+        Delete the responses selected by the "FROM ... WHERE ..." clause,
+        counting them as the specified event
+        """
+        for endpoint, count in connection.execute(
+                "SELECT endpoint, COUNT(*) %s GROUP BY endpoint" % where,
+                args).fetchall():
+            self._stats.record(event, endpoint, count)
+        connection.execute("DELETE %s" % where, args)
+
+    def record(self, event, endpoint):
+        """
+        Count a cache event (see trovebox.cache.EVENTS) for the endpoint
+        """
+        ResponseCache.record(self, event, endpoint)
+        with self._lock:
+            self._events += 1
+            flush = (self._events % self.EVICTION_INTERVAL == 0)
+        if flush:
+            self._flush_statistics()
+
+    def _flush_statistics(self):
+        """ Add the event counts recorded by this process to the database """
+        counts = self._stats.pop_counts()
+        if not counts:
+            return
+        connection = self._connection()
+        with connection:
+            for (endpoint, event), count in counts.items():
+                connection.execute(
+                    "INSERT OR IGNORE INTO statistics (endpoint, event, "
+                    "count) VALUES (?, ?, 0)", (endpoint, event))
+                connection.execute(
+                    "UPDATE statistics SET count = count + ? "
+                    "WHERE endpoint = ? AND event = ?",
+                    (count, endpoint, event))
+
+    def statistics(self):
+        """
+        Returns a dict of the number of entries, their total size,
+        and the event counters of all processes using the database,
+        with a breakdown by endpoint (see trovebox.cache.summarise)
+        """
+        self._flush_statistics()
+        return _statistics(self._connection())
+
+    def reset_statistics(self):
+        """ Reset the event counters to zero """
+        self._stats.clear()
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM statistics")
+
+    def clear(self):
+        """ Remove all entries """
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM responses")
+            connection.execute("DELETE FROM response_tags")
+
+    def __len__(self):
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM responses").fetchone()[0]
+
+def read_statistics(path):
+    """
+    Returns the statistics of the SQLite cache database at path
+    (see SQLiteCache.statistics), without modifying it.
+    The database is opened read-only where supported (Python 3.4+).
+    """
+    uri = "file:%s?mode=ro" % pathname2url(os.path.abspath(path))
+    try:
+        connection = sqlite3.connect(uri, uri=True)
+    except TypeError: # Python2, Python3 < 3.4
+        connection = sqlite3.connect(path)
+    try:
+        return _statistics(connection)
+    finally:
+        connection.close()
+
+def _statistics(connection):
+    """ Read the cache statistics from a database connection """
+    counts = dict(((endpoint, event), count) for endpoint, event, count
+                  in connection.execute(
+                      "SELECT endpoint, event, count FROM statistics"))
+    sizes = connection.execute(
+        "SELECT endpoint, LENGTH(CAST(body AS BLOB)) FROM responses")
+    return summarise(counts, sizes)
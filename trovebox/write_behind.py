@@ -0,0 +1,229 @@
+"""
+write_behind.py : Buffer photo updates, and send them to the server in bulk
+"""
+from __future__ import unicode_literals
+import logging
+import threading
+
+from trovebox.bulk import BulkResult
+from trovebox.parallel import run_parallel, DEFAULT_WORKERS
+from trovebox.fields import extract_id, to_list
+
+# Fields that add/remove individual tags, rather than replacing them
+_TAG_OPERATIONS = {"tagsAdd": "tagsRemove", "tagsRemove": "tagsAdd"}
+
+class UpdateQueue(object):
+    """
+    Write-behind queue of photo updates.
+
+    update() buffers the fields for each photo, instead of sending them
+    immediately. Repeated updates to the same photo are merged:
+    the last value written to each field wins, while tags added
+    (tagsAdd) or removed (tagsRemove) are accumulated.
+    flush() groups the photos whose pending fields are identical,
+    and updates each group with /photos/update.json (in chunks, see
+    ApiPhotos.update_chunked).
+
+    The queue is flushed automatically every "interval" seconds
+    (if interval isn't None) once start() has been called, and whenever
+    more than max_pending photos have pending updates.
+    It can be used as a context manager, which starts the queue,
+    and stops it (flushing any pending updates) on exit.
+    If on_flush is specified, it is called with the BulkResult of
+    each flush. Failed updates are logged, and requeued (beneath any
+    newer updates to the same photos) until they have been attempted
+    max_attempts times.
+    """
+    def __init__(self, client, interval=5.0, max_pending=1000,
+                 workers=DEFAULT_WORKERS, on_flush=None, max_attempts=3):
+        self._client = client
+        self.interval = interval
+        self.max_pending = max_pending
+        self.workers = workers
+        self.on_flush = on_flush
+        self.max_attempts = max_attempts
+        self.updates_received = 0
+        self.requests_sent = 0
+        self._pending = {}
+        # Number of failed attempts for each pending photo id
+        self._attempts = {}
+        self._logger = logging.getLogger("trovebox")
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def update(self, photo, **fields):
+        """
+        Endpoint: /photos/update.json (when flushed)
+
+        Queue an update of the photo (or photo id) with the specified
+        fields.
+        """
+        photo_id = extract_id(photo)
+        with self._lock:
+            _merge(self._pending.setdefault(photo_id, {}), fields)
+            self.updates_received += 1
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self.flush()
+
+    def pending(self):
+        """ Returns a dict mapping photo ids to their pending fields """
+        with self._lock:
+            return dict((photo_id, dict(fields))
+                        for photo_id, fields in self._pending.items())
+
+    def __len__(self):
+        return len(self._pending)
+
+    def flush(self):
+        """
+        Endpoint: /photos/update.json
+
+        Send all pending updates to the server.
+        Returns a BulkResult, containing the outcome of every chunk.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {}
+
+            groups = {}
+            for photo_id, fields in pending.items():
+                if fields:
+                    group = groups.setdefault(_fields_key(fields),
+                                              (fields, []))
+                    group[1].append(photo_id)
+
+            result = BulkResult()
+            for _, chunks, error in run_parallel(self._update_group,
+                                                 groups.values(),
+                                                 self.workers):
+                if error is not None: # pragma: no cover
+                    raise error
+                for chunk in chunks:
+                    result.add(chunk)
+            self.requests_sent += len(result.chunks)
+            self._requeue_failed(result, pending)
+
+        if self.on_flush is not None:
+            self.on_flush(result)
+        return result
+
+    def _requeue_failed(self, result, sent):
+        """
+        Log failed updates, and requeue their fields beneath any updates
+        that have been queued since
+        """
+        with self._lock:
+            for photo_id in result.succeeded:
+                self._attempts.pop(photo_id, None)
+            for chunk in result.chunks:
+                if chunk.ok:
+                    continue
+                for photo_id in chunk.ids:
+                    attempts = self._attempts.pop(photo_id, 0) + 1
+                    if attempts >= self.max_attempts:
+                        self._logger.error("Giving up updating photo %s "
+                                           "after %d attempts: %s" %
+                                           (photo_id, attempts, chunk.error))
+                        continue
+                    self._logger.warning("Failed to update photo %s, "
+                                         "requeued: %s" %
+                                         (photo_id, chunk.error))
+                    fields = dict(sent[photo_id])
+                    _merge(fields, self._pending.get(photo_id, {}))
+                    self._pending[photo_id] = fields
+                    self._attempts[photo_id] = attempts
+
+    def _update_group(self, group):
+        """ Update a group of photos with the same fields """
+        fields, photo_ids = group
+        return self._client.photos.update_chunked(photo_ids, workers=1,
+                                                  **fields).chunks
+
+    def start(self):
+        """ Start flushing the queue every "interval" seconds """
+        if self.interval is None or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stop the periodic flushing, and flush any pending updates """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        return self.flush()
+
+    def _run(self):
+        """ Periodically flush the queue, until stopped """
+        # Event.wait() only returns the flag on Python 2.7+
+        while not self._stop.is_set():
+            self._stop.wait(self.interval)
+            if self._stop.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                self._logger.exception("Write-behind flush failed")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+def _merge(pending, fields):
+    """ Merge updated fields into a photo's pending fields """
+    for field, value in fields.items():
+        if field in _TAG_OPERATIONS:
+            tags = to_list(value)
+            if "tags" in pending:
+                # Apply the operation to the pending tag list
+                current = to_list(pending["tags"])
+                if field == "tagsAdd":
+                    pending["tags"] = _union(current, tags)
+                else:
+                    pending["tags"] = [tag for tag in current
+                                       if tag not in tags]
+                continue
+            pending[field] = _union(to_list(pending.get(field)), tags)
+            # A later operation overrides an earlier opposite operation
+            opposite = _TAG_OPERATIONS[field]
+            if opposite in pending:
+                remaining = [tag for tag in pending[opposite]
+                             if tag not in tags]
+                if remaining:
+                    pending[opposite] = remaining
+                else:
+                    del pending[opposite]
+        elif field == "tags":
+            pending["tags"] = to_list(value)
+            for operation in _TAG_OPERATIONS:
+                pending.pop(operation, None)
+        else:
+            pending[field] = value
+
+def _fields_key(fields):
+    """ Returns a hashable key, equal for identical sets of fields """
+    return tuple(sorted((field, _freeze(value))
+                        for field, value in fields.items()))
+
+def _freeze(value):
+    """ Returns a hashable equivalent of a field value """
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item))
+                            for key, item in value.items()))
+    return extract_id(value)
+
+def _union(first, second):
+    """ Returns the items in either list, preserving their order """
+    return first + [item for item in second if item not in first]